@@ -0,0 +1,220 @@
+"""
+Benchmarks best competitor selection of CompetitorBook against the loop the
+improver used before, which filtered every offer of the market and scanned
+the relevant ones twice, and checks that both select the same offer. Book
+times include building the book, its first lookup scans the offers and the
+second one sorts them.
+
+    python -m benchmarks.competitor_book --offers 10000 50000
+"""
+import argparse
+import decimal
+import random
+import sys
+import typing
+
+from benchmarks import utils as benchmark_utils
+
+benchmark_utils.setup_django()
+
+from src import enums  # noqa: E402
+from src.integrations.providers import messages as provider_messages  # noqa: E402
+from src.services import competitor_book as competitor_book_services  # noqa: E402
+
+_MARKET_PRICE = decimal.Decimal("100000")
+_NOW_TIMESTAMP = decimal.Decimal("1700000000")
+_OWNER_LAST_SEEN_MAX_TIME = decimal.Decimal("10")  # minutes
+_BANK_PAYMENT_METHODS = frozenset(
+    [
+        enums.PaymentMethod.BANK_TRANSFER,
+        enums.PaymentMethod.OTHER_BANK_TRANSFER,
+        enums.PaymentMethod.DOMESTIC_WIRE_TRANSFER,
+    ]
+)
+
+
+def get_best_competitor_offer_loop(
+    offers: typing.List[provider_messages.Offer],
+    excluded_offer_id: str,
+    market_price: decimal.Decimal,
+    payment_methods: typing.Optional[typing.FrozenSet[enums.PaymentMethod]],
+) -> typing.Optional[provider_messages.Offer]:
+    """
+    Selection loop of `_get_best_competitor_offer` before CompetitorBook. It
+    raised ValueError when no offer was relevant, None is returned instead.
+    """
+    relevant_offers_above_market_price = []
+    relevant_offers_below_market_price = []
+    for offer in offers:
+        if offer.offer_id == excluded_offer_id:
+            continue
+
+        if (
+            _NOW_TIMESTAMP - offer.owner_last_seen_timestamp
+        ) / 60 > _OWNER_LAST_SEEN_MAX_TIME:
+            continue
+
+        if payment_methods is not None and offer.payment_method not in payment_methods:
+            continue
+
+        if offer.price > market_price:
+            relevant_offers_above_market_price.append(offer)
+        else:
+            relevant_offers_below_market_price.append(offer)
+
+    if relevant_offers_below_market_price:
+        return max(relevant_offers_below_market_price, key=lambda offer: offer.price)
+
+    if not relevant_offers_above_market_price:
+        return None
+
+    return min(relevant_offers_above_market_price, key=lambda offer: offer.price)
+
+
+def get_best_competitor_offer_from_book(
+    competitor_book: competitor_book_services.CompetitorBook,
+    excluded_offer_id: str,
+    market_price: decimal.Decimal,
+    payment_methods: typing.Optional[typing.FrozenSet[enums.PaymentMethod]],
+) -> typing.Optional[provider_messages.Offer]:
+    return competitor_book.get_best_offer(
+        market_price=market_price,
+        excluded_offer_id=excluded_offer_id,
+        min_owner_last_seen_timestamp=_NOW_TIMESTAMP - _OWNER_LAST_SEEN_MAX_TIME * 60,
+        payment_methods=payment_methods,
+    )
+
+
+def get_market(
+    offers_count: int, rnd: random.Random, price_steps: int = 1000
+) -> typing.List[provider_messages.Offer]:
+    """
+    Offers within 5% of market price. Prices are drawn from `price_steps`
+    levels, so that deep markets have many offers with the same price.
+    """
+    payment_methods = list(enums.PaymentMethod)
+    offers = []
+    for index in range(offers_count):
+        price_step = rnd.randrange(-price_steps, price_steps + 1)
+        offers.append(
+            provider_messages.Offer(
+                offer_id=str(index),
+                currency=enums.CryptoCurrency.BTC,
+                conversion_currency=enums.FiatCurrency.USD,
+                price=_MARKET_PRICE
+                + _MARKET_PRICE * decimal.Decimal(price_step) / (20 * price_steps),
+                type=enums.OfferType.SELL,
+                payment_method=rnd.choice(payment_methods),
+                owner_last_seen_timestamp=_NOW_TIMESTAMP - rnd.randrange(0, 1200),
+            )
+        )
+
+    return offers
+
+
+def check_equivalence(markets_count: int, seed: int) -> int:
+    """
+    Compares both selections on random markets, from empty to a few hundred
+    offers with coarse prices, for the first lookup of a book which scans its
+    offers and for following ones which search them sorted. Returns the
+    number of mismatches.
+    """
+    rnd = random.Random(seed)
+    mismatches = 0
+    for _ in range(markets_count):
+        offers = get_market(
+            offers_count=rnd.randrange(0, 300),
+            rnd=rnd,
+            price_steps=rnd.choice([1, 5, 50, 1000]),
+        )
+        competitor_book = competitor_book_services.CompetitorBook(offers=offers)
+        for _ in range(3):
+            market_price = _MARKET_PRICE + rnd.randrange(-5000, 5001)
+            excluded_offer_id = str(rnd.randrange(0, 300))
+            payment_methods = rnd.choice([None, _BANK_PAYMENT_METHODS])
+
+            expected_offer = get_best_competitor_offer_loop(
+                offers=offers,
+                excluded_offer_id=excluded_offer_id,
+                market_price=market_price,
+                payment_methods=payment_methods,
+            )
+            offer = get_best_competitor_offer_from_book(
+                competitor_book=competitor_book,
+                excluded_offer_id=excluded_offer_id,
+                market_price=market_price,
+                payment_methods=payment_methods,
+            )
+            # Among offers with the same price both select the first one listed.
+            if offer is not expected_offer:
+                mismatches += 1
+
+    return mismatches
+
+
+def run_benchmark(offers_count: int, lookups: int, repeat: int, seed: int) -> None:
+    offers = get_market(offers_count=offers_count, rnd=random.Random(seed))
+    # Internal offers of a market search it at the same market price.
+    excluded_offer_ids = [str(index) for index in range(lookups)]
+
+    def _select_with_loop() -> None:
+        for excluded_offer_id in excluded_offer_ids:
+            get_best_competitor_offer_loop(
+                offers=offers,
+                excluded_offer_id=excluded_offer_id,
+                market_price=_MARKET_PRICE,
+                payment_methods=_BANK_PAYMENT_METHODS,
+            )
+
+    def _select_with_book() -> None:
+        # Every cycle builds a new book of the market.
+        competitor_book = competitor_book_services.CompetitorBook(offers=offers)
+        for excluded_offer_id in excluded_offer_ids:
+            get_best_competitor_offer_from_book(
+                competitor_book=competitor_book,
+                excluded_offer_id=excluded_offer_id,
+                market_price=_MARKET_PRICE,
+                payment_methods=_BANK_PAYMENT_METHODS,
+            )
+
+    loop_ms = benchmark_utils.measure_ms(func=_select_with_loop, repeat=repeat)
+    book_ms = benchmark_utils.measure_ms(func=_select_with_book, repeat=repeat)
+    print(
+        "offers={} lookups={} loop_ms={:.2f} book_ms={:.2f} speedup={:.2f}x".format(
+            offers_count, lookups, loop_ms, book_ms, loop_ms / book_ms
+        )
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--offers", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        nargs="+",
+        default=[1, 2, 10],
+        help="Internal offers searching the same market in a cycle.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--markets", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(markets_count=args.markets, seed=args.seed)
+    print("equivalence markets={} mismatches={}".format(args.markets, mismatches))
+
+    for offers_count in args.offers:
+        for lookups in args.lookups:
+            run_benchmark(
+                offers_count=offers_count,
+                lookups=lookups,
+                repeat=args.repeat,
+                seed=args.seed,
+            )
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Benchmarks memory and construction time of competitor offers: the slotted
+Offer message against the same dataclass without __slots__, and payment
+method lookup through the slug table against the PaymentMethod constructor
+it replaced, on markets of realistic size.
+
+    python -m benchmarks.offer_messages --offers 2000 10000 50000
+"""
+import argparse
+import dataclasses
+import decimal
+import random
+import sys
+import tracemalloc
+import typing
+
+from benchmarks import utils as benchmark_utils
+
+benchmark_utils.setup_django()
+
+from src import enums  # noqa: E402
+from src.integrations.providers import messages as provider_messages  # noqa: E402
+
+# Listings carry many payment methods the bot does not know.
+_PAYMENT_METHOD_SLUGS = [payment_method.value for payment_method in enums.PaymentMethod]
+_UNKNOWN_PAYMENT_METHOD_SLUGS = ["paypal", "skrill", "gift-card", "cash-in-person"]
+_UNKNOWN_PAYMENT_METHOD_SHARE = 0.3
+
+
+@dataclasses.dataclass
+class DictOffer:
+    """
+    Offer message before __slots__, every instance carries a __dict__.
+    """
+
+    offer_id: str
+    currency: enums.CryptoCurrency
+    conversion_currency: enums.FiatCurrency
+    price: decimal.Decimal
+    type: enums.OfferType
+    payment_method: typing.Optional[enums.PaymentMethod]
+    owner_last_seen_timestamp: typing.Optional[decimal.Decimal]
+
+
+def convert_from_payment_slug_with_constructor(
+    slug: str,
+) -> typing.Optional[enums.PaymentMethod]:
+    # PaymentMethod.convert_from_payment_slug before the slug table.
+    try:
+        payment_method = enums.PaymentMethod(slug)
+    except Exception:
+        return None
+
+    return payment_method
+
+
+def get_records(offers_count: int, seed: int) -> typing.List[typing.Dict]:
+    rnd = random.Random(seed)
+    records = []
+    for index in range(offers_count):
+        if rnd.random() < _UNKNOWN_PAYMENT_METHOD_SHARE:
+            payment_method_slug = rnd.choice(_UNKNOWN_PAYMENT_METHOD_SLUGS)
+        else:
+            payment_method_slug = rnd.choice(_PAYMENT_METHOD_SLUGS)
+
+        records.append(
+            {
+                "offer_id": "offer-{}".format(index),
+                "price": decimal.Decimal("100000") + rnd.randrange(-5000, 5000),
+                "payment_method_slug": payment_method_slug,
+                "owner_last_seen_timestamp": decimal.Decimal(
+                    1700000000 - rnd.randrange(0, 1200)
+                ),
+            }
+        )
+
+    return records
+
+
+def build_offers(
+    records: typing.List[typing.Dict],
+    offer_class: typing.Callable,
+    convert_from_payment_slug: typing.Callable[
+        [str], typing.Optional[enums.PaymentMethod]
+    ],
+) -> typing.List:
+    return [
+        offer_class(
+            offer_id=record["offer_id"],
+            currency=enums.CryptoCurrency.BTC,
+            conversion_currency=enums.FiatCurrency.USD,
+            price=record["price"],
+            type=enums.OfferType.SELL,
+            payment_method=convert_from_payment_slug(record["payment_method_slug"]),
+            owner_last_seen_timestamp=record["owner_last_seen_timestamp"],
+        )
+        for record in records
+    ]
+
+
+def measure_bytes_per_offer(
+    records: typing.List[typing.Dict], offer_class: typing.Callable
+) -> float:
+    """
+    Memory allocated by offer objects alone, field values are built before
+    tracing and shared by both offer classes.
+    """
+    tracemalloc.start()
+    offers = build_offers(
+        records=records,
+        offer_class=offer_class,
+        convert_from_payment_slug=enums.PaymentMethod.convert_from_payment_slug,
+    )
+    allocated_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # List holding the offers is not part of an offer.
+    return (allocated_bytes - sys.getsizeof(offers)) / len(records)
+
+
+def run_benchmark(offers_count: int, repeat: int, seed: int) -> None:
+    records = get_records(offers_count=offers_count, seed=seed)
+    dict_offer_bytes = measure_bytes_per_offer(records=records, offer_class=DictOffer)
+    slotted_offer_bytes = measure_bytes_per_offer(
+        records=records, offer_class=provider_messages.Offer
+    )
+
+    def _build_before() -> None:
+        build_offers(
+            records=records,
+            offer_class=DictOffer,
+            convert_from_payment_slug=convert_from_payment_slug_with_constructor,
+        )
+
+    def _build_after() -> None:
+        build_offers(
+            records=records,
+            offer_class=provider_messages.Offer,
+            convert_from_payment_slug=enums.PaymentMethod.convert_from_payment_slug,
+        )
+
+    slugs = [record["payment_method_slug"] for record in records]
+    constructor_lookup_ms = benchmark_utils.measure_ms(
+        func=lambda: [
+            convert_from_payment_slug_with_constructor(slug) for slug in slugs
+        ],
+        repeat=repeat,
+    )
+    table_lookup_ms = benchmark_utils.measure_ms(
+        func=lambda: [
+            enums.PaymentMethod.convert_from_payment_slug(slug=slug) for slug in slugs
+        ],
+        repeat=repeat,
+    )
+    build_before_ms = benchmark_utils.measure_ms(func=_build_before, repeat=repeat)
+    build_after_ms = benchmark_utils.measure_ms(func=_build_after, repeat=repeat)
+    print(
+        "offers={} bytes_per_offer dict={:.0f} slots={:.0f} | slug_lookup_ms constructor={:.2f} table={:.2f} | build_ms before={:.2f} after={:.2f}".format(
+            offers_count,
+            dict_offer_bytes,
+            slotted_offer_bytes,
+            constructor_lookup_ms,
+            table_lookup_ms,
+            build_before_ms,
+            build_after_ms,
+        )
+    )
+
+
+def check_equivalence() -> int:
+    """
+    Returns the number of slugs the table and the constructor map differently.
+    """
+    slugs = (
+        _PAYMENT_METHOD_SLUGS + _UNKNOWN_PAYMENT_METHOD_SLUGS + ["", "BANK-TRANSFER"]
+    )
+    return sum(
+        enums.PaymentMethod.convert_from_payment_slug(slug=slug)
+        is not convert_from_payment_slug_with_constructor(slug)
+        for slug in slugs
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--offers", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence()
+    print("equivalence slugs mismatches={}".format(mismatches))
+
+    for offers_count in args.offers:
+        run_benchmark(offers_count=offers_count, repeat=args.repeat, seed=args.seed)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
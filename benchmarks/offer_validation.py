@@ -0,0 +1,220 @@
+"""
+Benchmarks validation of offer listings with validators.validate_offer against
+the marshmallow path it replaced, loading each page through the Offers schema
+and constructing offers from it, and checks on fuzzed records that both accept
+and build the same offers.
+
+    python -m benchmarks.offer_validation --offers 10000 --records 20000
+"""
+import argparse
+import decimal
+import random
+import sys
+import typing
+
+from benchmarks import utils as benchmark_utils
+
+benchmark_utils.setup_django()
+
+from common import utils as common_utils  # noqa: E402
+from src.integrations.providers import messages as provider_messages  # noqa: E402
+from src.integrations.providers import validators as provider_validators  # noqa: E402
+from src.integrations.providers.noones import client as noones_provider  # noqa: E402
+from src.integrations.providers.noones import schemas  # noqa: E402
+
+_FIELDS = [
+    "offer_id",
+    "offer_type",
+    "crypto_currency_code",
+    "fiat_currency_code",
+    "fiat_price_per_crypto",
+    "payment_method_slug",
+    "last_seen_timestamp",
+]
+# Values of wrong types, unknown enum values and numbers marshmallow rejects.
+_FUZZED_VALUES = [
+    None,
+    True,
+    False,
+    0,
+    1,
+    1.5,
+    "1.5",
+    "abc",
+    "",
+    "NaN",
+    "Infinity",
+    "1e3",
+    decimal.Decimal("2.5"),
+    decimal.Decimal("NaN"),
+    "sell",
+    "buy",
+    "BTC",
+    "USDT",
+    "USD",
+    "XXX",
+    "bank-transfer",
+    "unknown-payment-method",
+    [],
+    {},
+]
+
+
+def get_record(index: int) -> typing.Dict:
+    # Listing JSON is parsed with decimals for floats.
+    return {
+        "offer_id": "offer-{}".format(index),
+        "offer_type": "sell",
+        "crypto_currency_code": "BTC",
+        "fiat_currency_code": "USD",
+        "fiat_price_per_crypto": decimal.Decimal("100000") + index,
+        "payment_method_slug": "bank-transfer",
+        "last_seen_timestamp": decimal.Decimal("1700000000") + index,
+        "offer_owner_username": "owner-{}".format(index),
+    }
+
+
+def get_fuzzed_record(index: int, rnd: random.Random) -> typing.Any:
+    if rnd.random() < 0.01:
+        return rnd.choice([None, [], "offer", 1])
+
+    record = get_record(index=index)
+    for field in rnd.sample(_FIELDS, rnd.randint(0, 3)):
+        if rnd.random() < 0.2:
+            record.pop(field)
+        else:
+            record[field] = rnd.choice(_FUZZED_VALUES)
+
+    return record
+
+
+def validate_offer_with_schema(
+    data: typing.Any,
+) -> typing.Optional[provider_messages.Offer]:
+    """
+    Validation of a listing record before validators.validate_offer. Invalid
+    records failed the whole page, None is returned for them instead.
+    """
+    validated_offers = common_utils.validate_data_schema(
+        data={"offers": [data]}, schema=schemas.Offers()
+    )
+    if not validated_offers:
+        return None
+
+    try:
+        return noones_provider.NoonesProvider._construct_offer_data(
+            data=validated_offers["offers"][0]
+        )
+    except ValueError:
+        # Unknown offer type or currency.
+        return None
+
+
+def validate_page_with_schema(
+    offers_data: typing.List[typing.Dict],
+) -> typing.List[provider_messages.Offer]:
+    validated_offers = common_utils.validate_data_schema(
+        data={"offers": offers_data}, schema=schemas.Offers()
+    )
+    return [
+        noones_provider.NoonesProvider._construct_offer_data(data=offer_data)
+        for offer_data in validated_offers["offers"]
+    ]
+
+
+def validate_page(
+    offers_data: typing.List[typing.Dict],
+) -> typing.List[provider_messages.Offer]:
+    return [
+        provider_validators.validate_offer(data=offer_data)
+        for offer_data in offers_data
+    ]
+
+
+def check_equivalence(records_count: int, seed: int) -> typing.Tuple[int, int]:
+    """
+    Returns the number of valid records and of records on which both paths
+    disagree.
+    """
+    rnd = random.Random(seed)
+    valid_records = 0
+    mismatches = 0
+    for index in range(records_count):
+        record = get_fuzzed_record(index=index, rnd=rnd)
+        expected_offer = validate_offer_with_schema(data=record)
+        offer = provider_validators.validate_offer(data=record)
+        if offer != expected_offer:
+            mismatches += 1
+            if mismatches <= 5:
+                print(
+                    "mismatch record={!r} schema={!r} validator={!r}".format(
+                        record, expected_offer, offer
+                    )
+                )
+        elif offer:
+            valid_records += 1
+
+    return valid_records, mismatches
+
+
+def run_benchmark(offers_count: int, page_size: int, repeat: int) -> None:
+    records = [get_record(index=index) for index in range(offers_count)]
+    pages = [
+        records[start:end]
+        for start, end in zip(
+            range(0, offers_count, page_size),
+            range(page_size, offers_count + page_size, page_size),
+        )
+    ]
+    if validate_page_with_schema(offers_data=records) != validate_page(
+        offers_data=records
+    ):
+        raise AssertionError("Listing offers differ")
+
+    schema_ms = benchmark_utils.measure_ms(
+        func=lambda: [validate_page_with_schema(offers_data=page) for page in pages],
+        repeat=repeat,
+    )
+    validator_ms = benchmark_utils.measure_ms(
+        func=lambda: [validate_page(offers_data=page) for page in pages],
+        repeat=repeat,
+    )
+    print(
+        "offers={} page_size={} schema_ms={:.1f} validator_ms={:.1f} speedup={:.1f}x".format(
+            offers_count,
+            page_size,
+            schema_ms,
+            validator_ms,
+            schema_ms / validator_ms,
+        )
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--offers", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--page-size", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    valid_records, mismatches = check_equivalence(
+        records_count=args.records, seed=args.seed
+    )
+    print(
+        "equivalence records={} valid={} mismatches={}".format(
+            args.records, valid_records, mismatches
+        )
+    )
+
+    for offers_count in args.offers:
+        run_benchmark(
+            offers_count=offers_count, page_size=args.page_size, repeat=args.repeat
+        )
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import time
+import typing
+
+import django
+
+
+def setup_django() -> None:
+    # Same settings module as manage.py.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+    django.setup()
+
+
+def measure_ms(func: typing.Callable[[], typing.Any], repeat: int) -> float:
+    """
+    Returns the best wall time of `repeat` calls of `func`, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    return min(timings)
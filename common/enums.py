@@ -3,4 +3,9 @@ import enum
 
 class HttpMethod(enum.Enum):
     GET = "get"
-    POST = "post"
\ No newline at end of file
+    POST = "post"
+
+
+class TracingExporter(enum.Enum):
+    JSON_FILE = "json_file"
+    OTLP_HTTP = "otlp_http"
@@ -0,0 +1,355 @@
+import abc
+import atexit
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import typing
+
+import requests
+from django.conf import settings
+
+from common import enums as common_enums
+from common import utils as common_utils
+
+logger = logging.getLogger(__name__)
+
+_LOG_PREFIX = "[TRACING]"
+
+T = typing.TypeVar("T")
+AttributeValue = typing.Union[str, int, float, bool]
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_processor: typing.Optional["_SpanProcessor"] = None
+_span_processor_lock = threading.Lock()
+_is_configured = False
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: typing.Optional[str]
+    attributes: typing.Dict[str, AttributeValue]
+    start_time_ns: int
+    end_time_ns: typing.Optional[int] = None
+    error: typing.Optional[str] = None
+
+    def set_attribute(self, key: str, value: typing.Optional[AttributeValue]) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+
+class _NoopSpan(object):
+    def set_attribute(self, key: str, value: typing.Optional[AttributeValue]) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextlib.contextmanager
+def span(
+        name: str, **attributes: typing.Optional[AttributeValue]
+) -> typing.Iterator[typing.Union[Span, _NoopSpan]]:
+    """
+    Times the block as a span, child of the span current in this context.
+    Attributes with None values are left out. Does nothing when tracing is
+    disabled. Must not be held across a `yield` of a generator, the span
+    would leak into the context of the consumer.
+    """
+    span_processor = _get_span_processor()
+    if not span_processor:
+        yield _NOOP_SPAN
+        return
+
+    parent_span = _current_span.get()
+    current_span = Span(
+        name=name,
+        trace_id=parent_span.trace_id if parent_span else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent_span.span_id if parent_span else None,
+        attributes={
+            key: value for key, value in attributes.items() if value is not None
+        },
+        start_time_ns=time.time_ns(),
+    )
+    token = _current_span.set(current_span)
+    try:
+        yield current_span
+    except BaseException as e:
+        current_span.error = "{}: {}".format(
+            type(e).__name__, common_utils.get_exception_message(exception=e)
+        )
+        raise
+    finally:
+        current_span.end_time_ns = time.time_ns()
+        _current_span.reset(token)
+        span_processor.add(span=current_span)
+
+
+def propagate(func: typing.Callable[..., T]) -> typing.Callable[..., T]:
+    """
+    Binds `func` to a copy of the current context, so that spans started by it
+    in other threads, e.g. of a thread pool, are children of the current span.
+    The wrapper may be called many times and concurrently.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def _run_in_context(*args: typing.Any, **kwargs: typing.Any) -> T:
+        return context.copy().run(func, *args, **kwargs)
+
+    return _run_in_context
+
+
+def flush() -> None:
+    if _span_processor:
+        _span_processor.flush()
+
+
+class SpanExporter(abc.ABC):
+    @abc.abstractmethod
+    def export(self, spans: typing.List[Span]) -> None:
+        raise NotImplementedError
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """
+    Appends spans to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str, service_name: str) -> None:
+        self._path = path
+        self._service_name = service_name
+
+    def export(self, spans: typing.List[Span]) -> None:
+        lines = "".join(
+            json.dumps(
+                {
+                    "service_name": self._service_name,
+                    "name": span.name,
+                    "trace_id": span.trace_id,
+                    "span_id": span.span_id,
+                    "parent_span_id": span.parent_span_id,
+                    "start_time_ns": span.start_time_ns,
+                    "end_time_ns": span.end_time_ns,
+                    "duration_ms": (span.end_time_ns - span.start_time_ns) / 1e6,
+                    "attributes": span.attributes,
+                    "error": span.error,
+                },
+                default=str,
+            )
+            + "\n"
+            for span in spans
+        )
+        # One write per batch, so lines of concurrent processes do not interleave.
+        with open(self._path, "a") as spans_file:
+            spans_file.write(lines)
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """
+    Sends spans to an OpenTelemetry collector with OTLP over HTTP, JSON encoded.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float) -> None:
+        self._endpoint = endpoint
+        self._service_name = service_name
+        self._timeout = timeout
+        self._session = requests.Session()
+
+    def export(self, spans: typing.List[Span]) -> None:
+        response = self._session.post(
+            url=self._endpoint,
+            json={
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": _get_otlp_attributes(
+                                attributes={"service.name": self._service_name}
+                            )
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": __name__},
+                                "spans": [_get_otlp_span(span=span) for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+
+
+class _SpanProcessor(object):
+    """
+    Queues finished spans and exports them in batches from a background
+    thread, so that exporting never blocks the traced code. Spans are dropped
+    when the queue is full.
+    """
+
+    def __init__(
+            self,
+            exporter: SpanExporter,
+            batch_size: int,
+            interval_seconds: float,
+            max_queue_size: int,
+    ) -> None:
+        self._exporter = exporter
+        self._batch_size = batch_size
+        self._interval_seconds = interval_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._export_lock = threading.Lock()
+        self._dropped_spans = 0
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name="tracing-span-processor", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pid(self) -> int:
+        return self._pid
+
+    def add(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._dropped_spans += 1
+
+    def flush(self) -> None:
+        while self._export_batch():
+            pass
+
+        if self._dropped_spans:
+            logger.warning(
+                "{} Dropped spans, export queue was full (dropped_spans={}).".format(
+                    _LOG_PREFIX, self._dropped_spans
+                )
+            )
+            self._dropped_spans = 0
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self._interval_seconds)
+            self.flush()
+
+    def _export_batch(self) -> bool:
+        with self._export_lock:
+            spans = []
+            while len(spans) < self._batch_size:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not spans:
+                return False
+
+            try:
+                self._exporter.export(spans=spans)
+            except Exception as e:
+                logger.warning(
+                    "{} Unable to export spans (spans={}). Error: {}.".format(
+                        _LOG_PREFIX,
+                        len(spans),
+                        common_utils.get_exception_message(exception=e),
+                    )
+                )
+
+            return True
+
+
+def _get_span_processor() -> typing.Optional[_SpanProcessor]:
+    global _span_processor, _is_configured
+    if _is_configured and (not _span_processor or _span_processor.pid == os.getpid()):
+        return _span_processor
+
+    with _span_processor_lock:
+        # Threads do not survive fork, forked workers start their own processor.
+        if not _is_configured or (
+                _span_processor and _span_processor.pid != os.getpid()
+        ):
+            _span_processor = _create_span_processor()
+            _is_configured = True
+
+    return _span_processor
+
+
+def _create_span_processor() -> typing.Optional[_SpanProcessor]:
+    if not settings.TRACING_EXPORTER:
+        return None
+
+    exporter_type = common_enums.TracingExporter[settings.TRACING_EXPORTER]
+    if exporter_type == common_enums.TracingExporter.OTLP_HTTP:
+        exporter = OtlpHttpSpanExporter(
+            endpoint=settings.TRACING_OTLP_ENDPOINT,
+            service_name=settings.TRACING_SERVICE_NAME,
+            timeout=settings.TRACING_OTLP_TIMEOUT_SECONDS,
+        )
+    else:
+        exporter = JsonFileSpanExporter(
+            path=str(settings.TRACING_JSON_FILE_PATH),
+            service_name=settings.TRACING_SERVICE_NAME,
+        )
+
+    logger.info(
+        "{} Exporting spans (exporter={}).".format(_LOG_PREFIX, exporter_type.name)
+    )
+    span_processor = _SpanProcessor(
+        exporter=exporter,
+        batch_size=settings.TRACING_EXPORT_BATCH_SIZE,
+        interval_seconds=settings.TRACING_EXPORT_INTERVAL_SECONDS,
+        max_queue_size=settings.TRACING_MAX_QUEUE_SIZE,
+    )
+    atexit.register(span_processor.flush)
+    return span_processor
+
+
+def _get_otlp_span(span: Span) -> typing.Dict:
+    otlp_span = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": _get_otlp_attributes(attributes=span.attributes),
+        # STATUS_CODE_OK and STATUS_CODE_ERROR
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_span_id:
+        otlp_span["parentSpanId"] = span.parent_span_id
+
+    return otlp_span
+
+
+def _get_otlp_attributes(
+        attributes: typing.Dict[str, AttributeValue]
+) -> typing.List[typing.Dict]:
+    otlp_attributes = []
+    for key, value in attributes.items():
+        # bool is an int, it must be checked first.
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+
+        otlp_attributes.append({"key": key, "value": otlp_value})
+
+    return otlp_attributes
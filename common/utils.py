@@ -1,6 +1,8 @@
 import typing
 
+import django_redis
 import marshmallow
+import redis
 
 
 def get_exception_message(exception: Exception) -> str:
@@ -22,3 +24,13 @@ def validate_data_schema(
         return None
 
     return validated_data
+
+
+def get_redis_connection() -> typing.Optional[redis.Redis]:
+    """
+    Returns connection of the default cache, None when the cache is not redis.
+    """
+    try:
+        return django_redis.get_redis_connection()
+    except NotImplementedError:
+        return None
@@ -162,6 +162,9 @@ CACHES = {
 COIN_MARKET_CAP_API_URL = "https://pro-api.coinmarketcap.com/"
 COIN_MARKET_CAP_API_VERSION = "v2/"
 COIN_MARKET_CAP_API_KEY = "<TAG>"
+COIN_MARKET_CAP_MAX_CONVERTS_PER_REQUEST = 120
+# Stale market prices are served while refreshed, older ones pause repricing.
+CMC_CURRENCY_MARKET_PRICE_MAX_STALENESS_SECONDS = 900
 
 NOONES_AUTH_API_URL = "https://auth.noones.com"
 NOONES_AUTH_CLIENT_ID = "<TAG>"
@@ -174,8 +177,91 @@ PAXFUL_AUTH_CLIENT_SECRET = "<TAG>"
 NOONES_API_URL = "https://api.noones.com"
 PAXFUL_API_URL = "https://api.paxful.com"
 
+GATEWAY_PAGINATION_MAX_WORKERS = 4
+
+GATEWAY_HTTP_POOL_CONNECTIONS = 4
+GATEWAY_HTTP_POOL_MAXSIZE = 16  # per host
+GATEWAY_HTTP_POOL_BLOCK = True
+GATEWAY_HTTP_KEEP_ALIVE = True
+GATEWAY_HTTP_CONNECT_TIMEOUT = 5
+GATEWAY_HTTP_READ_TIMEOUT = 30
+
+# Token buckets of gateway requests (requests per second and burst), shared by
+# all processes through redis. Gateways and classes not listed are not limited,
+# but all of them back off when throttled by the API.
+GATEWAY_RATE_LIMITS = {
+    "NOONES": {
+        "READ": {"rate": 5, "burst": 10},
+        "WRITE": {"rate": 1, "burst": 3},
+    },
+    "PAXFUL": {
+        "READ": {"rate": 5, "burst": 10},
+        "WRITE": {"rate": 1, "burst": 3},
+    },
+}
+GATEWAY_RATE_LIMIT_MAX_WAIT_SECONDS = 30
+GATEWAY_RATE_LIMIT_MAX_RETRIES = 3
+# Backoff when throttled without Retry-After, doubled on each consecutive 429.
+GATEWAY_RATE_LIMIT_BACKOFF_SECONDS = 1
+GATEWAY_RATE_LIMIT_MAX_BACKOFF_SECONDS = 60
+
 OFFER_SEARCH_ALL_BANK_PAYMENT_METHODS = True
 
+# Offer is not fetched nor repriced while neither market price nor its best
+# competitor offer moved since its last price decision, for up to this long.
+OFFER_PRICE_DECISION_MAX_AGE_SECONDS = 600
+# Internal offers are fetched from provider again at least this often, or
+# sooner when listed at other price than the improver last set.
+OFFER_STATE_RECONCILE_INTERVAL_SECONDS = 1800
+
+OFFER_IMPROVER_MAX_WORKERS = 8
+OFFER_IMPROVER_PROVIDER_MAX_WORKERS = {
+    "NOONES": 4,
+    "PAXFUL": 4,
+}
+
+OFFER_IMPROVER_DAEMON_INTERVAL_SECONDS = {
+    "NOONES": 60,
+    "PAXFUL": 60,
+}
+OFFER_IMPROVER_DAEMON_JITTER_SECONDS = 5
+OFFER_IMPROVER_DAEMON_MAX_BACKOFF_SECONDS = 600
+
+# Runs hold a lease on each offer they improve and, unless sharded, on the whole
+# cycle of a provider. Offers and cycles leased by another run are skipped.
+# Offer leases are renewed during the cycle and must not expire before the cycle
+# lease, their price updates are only dispatched at the end of the cycle.
+OFFER_LEASE_TTL_SECONDS = 900
+OFFER_CYCLE_LEASE_TTL_SECONDS = 900
+
+# Sharded improvers split internal offers of a provider into virtual shards by
+# OfferShardKey. Shards are assigned to live workers by consistent hashing and
+# held through leases renewed on every heartbeat, a dead worker's shards are
+# taken over once its leases expire.
+OFFER_SHARD_COUNT = 64
+OFFER_SHARD_KEY = "MARKET"
+OFFER_SHARD_MAX_WORKERS = 32
+OFFER_SHARD_LEASE_TTL_SECONDS = 15
+OFFER_SHARD_HEARTBEAT_INTERVAL_SECONDS = 5
+
+OFFER_SCHEDULER_MIN_INTERVAL_SECONDS = 15
+OFFER_SCHEDULER_MAX_INTERVAL_SECONDS = 300
+OFFER_SCHEDULER_DECREASE_FACTOR = 0.5
+OFFER_SCHEDULER_INCREASE_FACTOR = 1.5
+
+# Spans of improvement cycles, e.g. offer fetches, page fetches, price updates
+# and DB writes, are exported in batches by TracingExporter: "JSON_FILE" appends
+# JSON lines to a file, "OTLP_HTTP" sends them to an OpenTelemetry collector.
+# Tracing is disabled when no exporter is set.
+TRACING_EXPORTER = None
+TRACING_SERVICE_NAME = "p2p-offer-bot"
+TRACING_JSON_FILE_PATH = BASE_DIR / "logs/spans.jsonl"
+TRACING_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+TRACING_OTLP_TIMEOUT_SECONDS = 5
+TRACING_EXPORT_BATCH_SIZE = 512
+TRACING_EXPORT_INTERVAL_SECONDS = 5
+TRACING_MAX_QUEUE_SIZE = 10000
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_HOST_USER = "<TAG>"
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0012_alter_offer_offer_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='fencing_token',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
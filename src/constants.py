@@ -4,14 +4,19 @@ AUTHENTICATION_TOKEN_VALIDITY_TIMEDELTA_HRS = 24
 CMC_CURRENCY_MARKET_PRICE_CACHE_KEY = (
     "CMC_CURRENCY_MARKET_PRICE_{crypto_currency}_{conversion_fiat_currency}"
 )
-CMC_CURRENCY_MARKET_PRICE_CACHE_TTL = 180
+CMC_CURRENCY_MARKET_PRICE_CACHE_TTL = 180  # after this price is stale and refreshed
+CMC_CURRENCY_MARKET_PRICE_REFRESH_LOCK_CACHE_KEY = (
+    "CMC_CURRENCY_MARKET_PRICE_REFRESH_LOCK_{crypto_currency}_{conversion_fiat_currency}"
+)
+CMC_CURRENCY_MARKET_PRICE_REFRESH_LOCK_TTL = 30
+CMC_CURRENCY_MARKET_PRICE_REFRESH_WAIT_SECONDS = 10
 
 CURRENCY_CONFIG_AMOUNT_TO_INCREASE_OFFER = "amount_to_increase_offer"
 CURRENCY_CONFIG_SEARCH_PRICE_UPPER_MARGIN = "search_price_upper_margin"
 CURRENCY_CONFIG_SEARCH_PRICE_LOWER_MARGIN = "search_price_lower_margin"
 CURRENCY_CONFIG_OWNER_LAST_SEEN_MAX_TIME = "owner_last_seen_max_time"
 
-CURRENCY_CONFIG_CACHE_NAME = '{config_name}_{currency}_{provider}'
+CURRENCY_CONFIG_VERSION_CACHE_KEY = "CURRENCY_CONFIG_VERSION"
 
 CURRENCY_CONFIGS = [
     CURRENCY_CONFIG_AMOUNT_TO_INCREASE_OFFER,
@@ -20,3 +25,12 @@ CURRENCY_CONFIGS = [
     CURRENCY_CONFIG_OWNER_LAST_SEEN_MAX_TIME,
 ]
 CACHE_MAX_TTL = 3600  # 1h
+
+GATEWAY_RATE_LIMIT_CACHE_KEY = "GATEWAY_RATE_LIMIT_{gateway}_{rate_limit_class}"
+
+OFFER_SHARD_WORKER_SLOT_CACHE_KEY = "OFFER_SHARD_WORKER_SLOT_{provider}_{slot}"
+OFFER_SHARD_LEASE_CACHE_KEY = "OFFER_SHARD_LEASE_{provider}_{shard}"
+
+OFFER_LEASE_CACHE_KEY = "OFFER_LEASE_{provider}_{offer_id}"
+OFFER_CYCLE_LEASE_CACHE_KEY = "OFFER_CYCLE_LEASE_{provider}"
+OFFER_LEASE_FENCING_TOKEN_CACHE_KEY = "OFFER_LEASE_FENCING_TOKEN_{provider}"
@@ -31,12 +31,22 @@ class PaymentMethod(enum.Enum):
 
     @staticmethod
     def convert_from_payment_slug(slug: str) -> typing.Optional["PaymentMethod"]:
-        try:
-            payment_method = PaymentMethod(slug)
-        except Exception:
-            return None
+        return _PAYMENT_METHODS_BY_SLUG.get(slug)
 
-        return payment_method
+
+_PAYMENT_METHODS_BY_SLUG = {
+    payment_method.value: payment_method for payment_method in PaymentMethod
+}
+
+
+class OfferShardKey(enum.Enum):
+    OFFER = "OFFER"
+    MARKET = "MARKET"
+
+
+class RateLimitClass(enum.Enum):
+    READ = "READ"
+    WRITE = "WRITE"
 
 
 class UserCountry(enum.Enum):
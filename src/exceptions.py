@@ -26,9 +26,21 @@ class CMCClientError(CMCException):
     pass
 
 
+class CMCMarketPriceUnavailableError(CMCException):
+    pass
+
+
 class CurrencyConfigNotSupportedError(Exception):
     pass
 
 
 class CurrencyOfferConfigNotFoundError(Exception):
     pass
+
+
+class CurrencyOfferConfigInvalidError(Exception):
+    pass
+
+
+class OfferShardWorkerLimitError(Exception):
+    pass
@@ -1,4 +1,4 @@
-import decimal
+import functools
 import typing
 
 import requests
@@ -11,6 +11,9 @@ from django.conf import settings
 from common import enums as common_enums
 from common import utils as common_utils
 from src import enums as source_enums
+from src.integrations.gateways import rate_limits
+from src.integrations.gateways import responses
+from src.integrations.gateways import sessions
 from src.integrations.gateways.cmc import exceptions
 
 logger = logging.getLogger(__name__)
@@ -21,30 +24,31 @@ class CoinMarketCapClient(object):
     API_VERSION = settings.COIN_MARKET_CAP_API_VERSION
     API_SECRET_KEY = settings.COIN_MARKET_CAP_API_KEY
     VALID_STATUS_CODES = [200]
+    RATE_LIMIT_GATEWAY = "COIN_MARKET_CAP"
 
     LOG_PREFIX = "[COIN-MARKET-CAP-CLIENT]"
 
-    def get_market_price(
+    def get_market_prices(
             self,
-            currency: source_enums.CryptoCurrency,
-            convert_to: typing.Optional[source_enums.FiatCurrency] = None,
+            currencies: typing.List[source_enums.CryptoCurrency],
+            convert_to: typing.List[source_enums.FiatCurrency],
     ) -> typing.Dict:
-        params = {"symbol": currency.value}
-
-        if convert_to:
-            params["convert"] = convert_to.value
-
         return self._get_response_content(
             response=self._request(
                 endpoint="cryptocurrency/quotes/latest",
                 method=common_enums.HttpMethod.GET,
-                params=params,
+                params={
+                    "symbol": ",".join(currency.value for currency in currencies),
+                    "convert": ",".join(
+                        fiat_currency.value for fiat_currency in convert_to
+                    ),
+                },
             )
         )
 
     @staticmethod
-    def _get_response_content(response: requests.Response) -> typing.Dict:
-        return simplejson.loads(response.content, parse_float=decimal.Decimal)["data"]
+    def _get_response_content(response: responses.ParsedResponse) -> typing.Dict:
+        return response.data["data"]
 
     def _request(
             self,
@@ -52,17 +56,26 @@ class CoinMarketCapClient(object):
             method: common_enums.HttpMethod,
             params: typing.Optional[dict] = None,
             payload: typing.Optional[dict] = None,
-    ) -> requests.Response:
+            rate_limit_class: source_enums.RateLimitClass = source_enums.RateLimitClass.READ,
+    ) -> responses.ParsedResponse:
         url = url_parser.urljoin(
             base=self.API_BASE_URL, url=self.API_VERSION + endpoint
         )  # THIS CAN BE IMPROVED
         try:
-            response = requests.request(
-                url=url,
-                method=method.value,
-                params=params,
-                data=payload,
-                headers=self._get_request_headers(),
+            response = rate_limits.send_request(
+                rate_limiter=rate_limits.get_rate_limiter(
+                    gateway=self.RATE_LIMIT_GATEWAY, rate_limit_class=rate_limit_class
+                ),
+                send=functools.partial(
+                    sessions.get_session(base_url=self.API_BASE_URL).request,
+                    url=url,
+                    method=method.value,
+                    params=params,
+                    data=payload,
+                    headers=self._get_request_headers(),
+                    timeout=sessions.get_timeout(),
+                ),
+                log_prefix=self.LOG_PREFIX,
             )
 
             if response.status_code not in self.VALID_STATUS_CODES:
@@ -75,7 +88,30 @@ class CoinMarketCapClient(object):
                     message=msg, code=response.status_code
                 )
 
-            self._check_response_content(response=response)
+            parsed_response = responses.parse_response(response=response)
+            self._check_response_content(response_content=parsed_response.data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "{} Successful response (endpoint={}, status_code={}, params={}, raw_response={}).".format(
+                        self.LOG_PREFIX,
+                        endpoint,
+                        parsed_response.status_code,
+                        params,
+                        parsed_response.content.decode(encoding="utf-8"),
+                    )
+                )
+        except rate_limits.RateLimitWaitTimeoutError as e:
+            msg = "Rate limited. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
+            )
+            logger.error("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.CoinMarketCapException(msg)
+        except simplejson.JSONDecodeError as e:
+            msg = "Invalid JSON response. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
+            )
+            logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.CoinMarketCapException(msg)
         except requests.exceptions.ConnectTimeout as e:
             msg = "Connect timeout. Error: {}".format(
                 common_utils.get_exception_message(exception=e)
@@ -89,10 +125,9 @@ class CoinMarketCapClient(object):
             logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
             raise exceptions.CoinMarketCapException(msg)
 
-        return response
+        return parsed_response
 
-    def _check_response_content(self, response: requests.Response) -> None:
-        response_content = simplejson.loads(response.content)
+    def _check_response_content(self, response_content: typing.Dict) -> None:
         if response_content.get("status", {}).get("error_message"):
             logger.error(
                 "{} Invalid API client response. Error: {}. Error code: {}.".format(
@@ -1,4 +1,5 @@
 import decimal
+import functools
 import typing
 
 import requests
@@ -13,6 +14,10 @@ from common import enums as common_enums
 from common import utils as common_utils
 from src import constants as source_constants
 from src import enums as source_enums
+from src.integrations.gateways import pagination
+from src.integrations.gateways import rate_limits
+from src.integrations.gateways import responses
+from src.integrations.gateways import sessions
 from src.integrations.gateways.noones import enums
 from src.integrations.gateways.noones import exceptions
 
@@ -24,22 +29,20 @@ class NoonesAuthAPIClient(object):
     API_CLIENT_ID = settings.NOONES_AUTH_CLIENT_ID
     API_CLIENT_SECRET = settings.NOONES_AUTH_CLIENT_SECRET
     VALID_STATUS_CODES = [200]
+    RATE_LIMIT_GATEWAY = source_enums.OfferProvider.NOONES.name
 
     LOG_PREFIX = "[NOONES-AUTH-CLIENT]"
 
     def create_authentication_token(self) -> typing.Dict:
-        return simplejson.loads(
-            self._request(
-                endpoint="oauth2/token",
-                method=common_enums.HttpMethod.POST,
-                payload={
-                    "grant_type": enums.AuthenticationGrantType.CLIENT_CREDENTIALS.value,
-                    "client_id": self.API_CLIENT_ID,
-                    "client_secret": self.API_CLIENT_SECRET,
-                },
-            ).content,
-            parse_float=decimal.Decimal,
-        )
+        return self._request(
+            endpoint="oauth2/token",
+            method=common_enums.HttpMethod.POST,
+            payload={
+                "grant_type": enums.AuthenticationGrantType.CLIENT_CREDENTIALS.value,
+                "client_id": self.API_CLIENT_ID,
+                "client_secret": self.API_CLIENT_SECRET,
+            },
+        ).data
 
     def _request(
             self,
@@ -47,15 +50,24 @@ class NoonesAuthAPIClient(object):
             method: common_enums.HttpMethod,
             params: typing.Optional[dict] = None,
             payload: typing.Optional[dict] = None,
-    ) -> requests.Response:
+            rate_limit_class: source_enums.RateLimitClass = source_enums.RateLimitClass.READ,
+    ) -> responses.ParsedResponse:
         url = url_parser.urljoin(base=self.API_BASE_URL, url=endpoint)
         try:
-            response = requests.request(
-                url=url,
-                method=method.value,
-                params=params,
-                data=payload,
-                headers=self._get_request_headers(),
+            response = rate_limits.send_request(
+                rate_limiter=rate_limits.get_rate_limiter(
+                    gateway=self.RATE_LIMIT_GATEWAY, rate_limit_class=rate_limit_class
+                ),
+                send=functools.partial(
+                    sessions.get_session(base_url=self.API_BASE_URL).request,
+                    url=url,
+                    method=method.value,
+                    params=params,
+                    data=payload,
+                    headers=self._get_request_headers(),
+                    timeout=sessions.get_timeout(),
+                ),
+                log_prefix=self.LOG_PREFIX,
             )
 
             if response.status_code not in self.VALID_STATUS_CODES:
@@ -68,16 +80,30 @@ class NoonesAuthAPIClient(object):
                     message=msg, code=response.status_code
                 )
 
-            logger.debug(
-                "{} Successful response (endpoint={}, status_code={}, payload={}, params={}, raw_response={}).".format(
-                    self.LOG_PREFIX,
-                    endpoint,
-                    response.status_code,
-                    payload,
-                    params,
-                    response.content.decode(encoding="utf-8"),
+            parsed_response = responses.parse_response(response=response)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "{} Successful response (endpoint={}, status_code={}, payload={}, params={}, raw_response={}).".format(
+                        self.LOG_PREFIX,
+                        endpoint,
+                        parsed_response.status_code,
+                        payload,
+                        params,
+                        parsed_response.content.decode(encoding="utf-8"),
+                    )
                 )
+        except rate_limits.RateLimitWaitTimeoutError as e:
+            msg = "Rate limited. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
+            )
+            logger.error("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.NoonesAuthAPIException(msg)
+        except simplejson.JSONDecodeError as e:
+            msg = "Invalid JSON response. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
             )
+            logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.NoonesAuthAPIException(msg)
         except requests.exceptions.ConnectTimeout as e:
             msg = "Connect timeout. Error: {}".format(
                 common_utils.get_exception_message(exception=e)
@@ -91,7 +117,7 @@ class NoonesAuthAPIClient(object):
             logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
             raise exceptions.NoonesAuthAPIException(msg)
 
-        return response
+        return parsed_response
 
     @classmethod
     def _get_request_headers(cls) -> typing.Dict:
@@ -103,6 +129,7 @@ class NoonesAuthAPIClient(object):
 class NoonesApiClient(object):
     API_BASE_URL = settings.NOONES_API_URL
     VALID_STATUS_CODES = [200]
+    RATE_LIMIT_GATEWAY = source_enums.OfferProvider.NOONES.name
 
     LOG_PREFIX = "[NOONES-API-CLIENT]"
 
@@ -117,7 +144,7 @@ class NoonesApiClient(object):
             )
         )
 
-    def get_all_offers(
+    def iter_all_offers(
             self,
             offer_type: source_enums.OfferType,
             crypto_currency: source_enums.CryptoCurrency,
@@ -126,7 +153,7 @@ class NoonesApiClient(object):
             payment_method: typing.Optional[source_enums.PaymentMethod] = None,
             fiat_fixed_price_min: typing.Optional[decimal.Decimal] = None,
             fiat_fixed_price_max: typing.Optional[decimal.Decimal] = None,
-    ) -> typing.List[typing.Dict]:
+    ) -> typing.Iterator[typing.List[typing.Dict]]:
         payload = {
             "type": offer_type.value,
             "currency_code": conversion_currency.value,
@@ -143,7 +170,7 @@ class NoonesApiClient(object):
         if fiat_fixed_price_min:
             payload["fiat_fixed_price_min"] = fiat_fixed_price_min
 
-        return self._get_paginated_response(
+        return self._iter_paginated_response(
             endpoint="noones/v1/offer/all",
             method=common_enums.HttpMethod.POST,
             payload=payload,
@@ -158,6 +185,7 @@ class NoonesApiClient(object):
                 endpoint="noones/v1/offer/update-price",
                 method=common_enums.HttpMethod.POST,
                 payload={"offer_hash": offer_id, "fixed_price": price_to_update},
+                rate_limit_class=source_enums.RateLimitClass.WRITE,
             )
         )
 
@@ -167,15 +195,24 @@ class NoonesApiClient(object):
             method: common_enums.HttpMethod,
             params: typing.Optional[dict] = None,
             payload: typing.Optional[dict] = None,
-    ) -> requests.Response:
+            rate_limit_class: source_enums.RateLimitClass = source_enums.RateLimitClass.READ,
+    ) -> responses.ParsedResponse:
         url = url_parser.urljoin(base=self.API_BASE_URL, url=endpoint)
         try:
-            response = requests.request(
-                url=url,
-                method=method.value,
-                params=params,
-                data=payload,
-                headers=self._get_request_headers(),
+            response = rate_limits.send_request(
+                rate_limiter=rate_limits.get_rate_limiter(
+                    gateway=self.RATE_LIMIT_GATEWAY, rate_limit_class=rate_limit_class
+                ),
+                send=functools.partial(
+                    sessions.get_session(base_url=self.API_BASE_URL).request,
+                    url=url,
+                    method=method.value,
+                    params=params,
+                    data=payload,
+                    headers=self._get_request_headers(),
+                    timeout=sessions.get_timeout(),
+                ),
+                log_prefix=self.LOG_PREFIX,
             )
 
             if response.status_code not in self.VALID_STATUS_CODES:
@@ -188,17 +225,31 @@ class NoonesApiClient(object):
                     message=msg, code=response.status_code
                 )
 
-            self._check_response(response=response)
-            logger.debug(
-                "{} Successful response (endpoint={}, status_code={}, payload={}, params={}, raw_response={}).".format(
-                    self.LOG_PREFIX,
-                    endpoint,
-                    response.status_code,
-                    payload,
-                    params,
-                    response.content.decode(encoding="utf-8"),
+            parsed_response = responses.parse_response(response=response)
+            self._check_response(response_content=parsed_response.data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "{} Successful response (endpoint={}, status_code={}, payload={}, params={}, raw_response={}).".format(
+                        self.LOG_PREFIX,
+                        endpoint,
+                        parsed_response.status_code,
+                        payload,
+                        params,
+                        parsed_response.content.decode(encoding="utf-8"),
+                    )
                 )
+        except rate_limits.RateLimitWaitTimeoutError as e:
+            msg = "Rate limited. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
+            )
+            logger.error("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.NoonesAPIException(msg)
+        except simplejson.JSONDecodeError as e:
+            msg = "Invalid JSON response. Error: {}".format(
+                common_utils.get_exception_message(exception=e)
             )
+            logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
+            raise exceptions.NoonesAPIException(msg)
         except requests.exceptions.ConnectTimeout as e:
             msg = "Connect timeout. Error: {}".format(
                 common_utils.get_exception_message(exception=e)
@@ -212,43 +263,38 @@ class NoonesApiClient(object):
             logger.exception("{} {}.".format(self.LOG_PREFIX, msg))
             raise exceptions.NoonesAPIException(msg)
 
-        return response
+        return parsed_response
 
     @staticmethod
-    def _get_response_content(response: requests.Response) -> typing.Dict:
-        return simplejson.loads(
-            response.content,
-            parse_float=decimal.Decimal,
-        )["data"]
+    def _get_response_content(response: responses.ParsedResponse) -> typing.Dict:
+        return response.data["data"]
 
-    def _get_paginated_response(
+    def _iter_paginated_response(
             self,
             endpoint: str,
             method: common_enums.HttpMethod,
             payload: typing.Dict,
             data_field: str,
             limit: int = 300,
-    ) -> typing.List:
-        payload.update({"limit": limit, "offset": 0})
-        offers = []
-        while True:
-            data = self._get_response_content(
+    ) -> typing.Iterator[typing.List]:
+        def _fetch_page(offset: int, page_limit: int) -> typing.Dict:
+            return self._get_response_content(
                 response=self._request(
                     endpoint=endpoint,
                     method=method,
-                    payload=payload,
+                    payload=dict(payload, limit=page_limit, offset=offset),
                 )
             )
-            offers.extend(data[data_field])
-            payload["offset"] += limit
-
-            if not data["count"]:
-                break
 
-        return offers
+        return pagination.iter_paginated_data(
+            fetch_page=_fetch_page,
+            data_field=data_field,
+            limit=limit,
+            max_workers=settings.GATEWAY_PAGINATION_MAX_WORKERS,
+            log_prefix=self.LOG_PREFIX,
+        )
 
-    def _check_response(self, response: requests.Response) -> None:
-        response_content = simplejson.loads(response.content)
+    def _check_response(self, response_content: typing.Dict) -> None:
         if response_content["status"] != enums.NoonesAPIStatus.SUCCESS.value:
             msg = "Response content error (response_content={}, error_message={}, error_code={})".format(
                 response_content,
@@ -0,0 +1,107 @@
+import collections
+import logging
+import time
+import typing
+from concurrent import futures
+
+from common import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def iter_paginated_data(
+        fetch_page: typing.Callable[[int, int], typing.Dict],
+        data_field: str,
+        limit: int,
+        max_workers: int,
+        log_prefix: str,
+) -> typing.Iterator[typing.List]:
+    """
+    Yields items of a listing page by page, in offset order. `fetch_page` is
+    called with (offset, limit) and returns the response data containing
+    `data_field`, `count` and optionally `totalCount`. When the total is known,
+    listing is paged by it and up to `max_workers` following pages are fetched
+    ahead concurrently, otherwise pages are fetched one by one until an empty
+    page. Pages are not accumulated, so memory is bounded by page size rather
+    than listing size.
+    """
+    started_at = time.monotonic()
+    page_latencies = []
+    items_count = 0
+
+    def _fetch_page(offset: int) -> typing.Dict:
+        page_started_at = time.monotonic()
+        with tracing.span(
+                "gateway.fetch_page", offset=offset, limit=limit
+        ) as page_span:
+            data = fetch_page(offset, limit)
+            page_span.set_attribute("count", data["count"])
+        latency_ms = (time.monotonic() - page_started_at) * 1000
+        page_latencies.append(latency_ms)
+        logger.debug(
+            "{} Fetched page (offset={}, count={}, latency_ms={:.1f}).".format(
+                log_prefix, offset, data["count"], latency_ms
+            )
+        )
+        return data
+
+    try:
+        data = _fetch_page(offset=0)
+        total_count = data.get("totalCount")
+        if total_count is not None:
+            page_size = limit
+            # API may serve shorter pages than requested, page by what it served.
+            if 0 < data["count"] < limit:
+                page_size = data["count"]
+            is_last_page = data["count"] == 0 or page_size >= total_count
+            next_offset = page_size
+        else:
+            # Pages may be shorter than requested, only an empty page ends it.
+            is_last_page = data["count"] == 0
+            next_offset = data["count"]
+        items_count += len(data[data_field])
+        yield data[data_field]
+
+        if not is_last_page and total_count:
+            offsets = collections.deque(range(next_offset, total_count, page_size))
+            executor = futures.ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(offsets)))
+            )
+            pending_pages = collections.deque()
+            try:
+                while offsets or pending_pages:
+                    # Keep a bounded window of pages in flight, oldest first.
+                    while offsets and len(pending_pages) < max_workers:
+                        pending_pages.append(
+                            executor.submit(
+                                tracing.propagate(_fetch_page), offsets.popleft()
+                            )
+                        )
+
+                    data = pending_pages.popleft().result()
+                    items_count += len(data[data_field])
+                    yield data[data_field]
+            finally:
+                # Consumer may stop early, pages not started yet are not fetched.
+                for pending_page in pending_pages:
+                    pending_page.cancel()
+                executor.shutdown(wait=True)
+            is_last_page = True
+
+        # Total is unknown, continue one by one until an empty page.
+        while not is_last_page:
+            data = _fetch_page(offset=next_offset)
+            next_offset += data["count"]
+            is_last_page = data["count"] == 0
+            items_count += len(data[data_field])
+            yield data[data_field]
+    finally:
+        logger.info(
+            "{} Fetched paginated response (pages={}, items={}, latency_ms={:.1f}, max_page_latency_ms={:.1f}).".format(
+                log_prefix,
+                len(page_latencies),
+                items_count,
+                (time.monotonic() - started_at) * 1000,
+                max(page_latencies, default=0.0),
+            )
+        )
@@ -0,0 +1,335 @@
+import dataclasses
+import datetime
+import logging
+import threading
+import time
+import typing
+from email import utils as email_utils
+
+import redis
+import requests
+
+from django.conf import settings
+
+from common import utils as common_utils
+from src import constants
+from src import enums
+
+logger = logging.getLogger(__name__)
+_LOG_PREFIX = "[GATEWAY-RATE-LIMITS]"
+
+_TOO_MANY_REQUESTS_STATUS_CODE = 429
+
+# Returns seconds to wait before the next attempt, 0 if a token was taken.
+# Redis time is used, so that buckets do not depend on clocks of processes.
+_RESERVE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at', 'blocked_until')
+local blocked_until = tonumber(bucket[3]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+if rate <= 0 then
+    return '0'
+end
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+if tokens < 1 then
+    return tostring((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'updated_at', tostring(now))
+local ttl = math.ceil(burst / rate * 1000) + 60000
+if redis.call('PTTL', KEYS[1]) < ttl then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return '0'
+"""
+_BLOCK_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local blocked_until = now + tonumber(ARGV[1])
+local current_blocked_until = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if blocked_until > current_blocked_until then
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(blocked_until))
+end
+local ttl = math.ceil(tonumber(ARGV[1]) * 1000) + 60000
+if redis.call('PTTL', KEYS[1]) < ttl then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+_rate_limiters: typing.Dict[typing.Tuple[str, enums.RateLimitClass], "RateLimiter"] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class RateLimitWaitTimeoutError(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class RateLimitStats:
+    tokens_consumed: int = 0
+    throttled: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class RateLimiter(object):
+    """
+    Token bucket of a gateway and rate limit class. The bucket lives in redis,
+    so that all processes calling the gateway share one budget. Without redis
+    cache, e.g. in development, the bucket is local to the process.
+    """
+
+    def __init__(self, gateway: str, rate_limit_class: enums.RateLimitClass) -> None:
+        self._gateway = gateway
+        self._rate_limit_class = rate_limit_class
+        rate_limit = settings.GATEWAY_RATE_LIMITS.get(gateway, {}).get(
+            rate_limit_class.name, {}
+        )
+        self._rate = float(rate_limit.get("rate", 0))
+        self._burst = float(rate_limit.get("burst", max(1.0, self._rate)))
+        self._cache_key = constants.GATEWAY_RATE_LIMIT_CACHE_KEY.format(
+            gateway=gateway, rate_limit_class=rate_limit_class.name
+        )
+        self._redis_connection = common_utils.get_redis_connection()
+        self._reserve_script = None
+        self._block_script = None
+        if self._redis_connection is None:
+            logger.warning(
+                "{} Cache is not redis, rate limits are not shared between processes.".format(
+                    _LOG_PREFIX
+                )
+            )
+        else:
+            self._reserve_script = self._redis_connection.register_script(
+                _RESERVE_SCRIPT
+            )
+            self._block_script = self._redis_connection.register_script(_BLOCK_SCRIPT)
+
+        self._tokens = self._burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_throttles = 0
+        self._stats = RateLimitStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> RateLimitStats:
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def acquire(self) -> None:
+        """
+        Takes a token, waiting for one as long as the bucket is empty or the
+        gateway is backing off, up to max wait seconds.
+        """
+        started_at = time.monotonic()
+        deadline = started_at + settings.GATEWAY_RATE_LIMIT_MAX_WAIT_SECONDS
+        while True:
+            wait_seconds = self._reserve()
+            if wait_seconds <= 0:
+                break
+
+            if time.monotonic() + wait_seconds > deadline:
+                self._record_wait(
+                    wait_seconds=time.monotonic() - started_at, acquired=False
+                )
+                raise RateLimitWaitTimeoutError(
+                    "Rate limit wait exceeds {} seconds (gateway={}, rate_limit_class={}, wait_seconds={:.3f})".format(
+                        settings.GATEWAY_RATE_LIMIT_MAX_WAIT_SECONDS,
+                        self._gateway,
+                        self._rate_limit_class.name,
+                        wait_seconds,
+                    )
+                )
+
+            time.sleep(wait_seconds)
+
+        self._record_wait(wait_seconds=time.monotonic() - started_at, acquired=True)
+
+    def throttle(self, retry_after_seconds: typing.Optional[float]) -> float:
+        """
+        Blocks the bucket after the API throttled a request, for Retry-After
+        seconds if given, otherwise for a backoff doubled on each consecutive
+        throttle. Returns seconds blocked.
+        """
+        with self._lock:
+            self._consecutive_throttles += 1
+            self._stats.throttled += 1
+            consecutive_throttles = self._consecutive_throttles
+
+        if retry_after_seconds is None:
+            block_seconds = min(
+                settings.GATEWAY_RATE_LIMIT_MAX_BACKOFF_SECONDS,
+                settings.GATEWAY_RATE_LIMIT_BACKOFF_SECONDS
+                * 2 ** (consecutive_throttles - 1),
+            )
+        else:
+            block_seconds = max(0.0, retry_after_seconds)
+
+        self._block(block_seconds=block_seconds)
+        return block_seconds
+
+    def reset_backoff(self) -> None:
+        if self._consecutive_throttles:
+            with self._lock:
+                self._consecutive_throttles = 0
+
+    def _reserve(self) -> float:
+        if self._reserve_script is None:
+            return self._reserve_locally()
+
+        try:
+            return float(
+                self._reserve_script(
+                    keys=[self._cache_key], args=[self._rate, self._burst]
+                )
+            )
+        except redis.RedisError as e:
+            # Requests are not stopped when redis is unavailable.
+            logger.warning(
+                "{} Unable to reserve rate limit token, not limiting (cache_key={}). Error: {}.".format(
+                    _LOG_PREFIX, self._cache_key, e
+                )
+            )
+            return 0.0
+
+    def _reserve_locally(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return self._blocked_until - now
+
+            if self._rate <= 0:
+                return 0.0
+
+            tokens = min(
+                self._burst, self._tokens + (now - self._updated_at) * self._rate
+            )
+            if tokens < 1:
+                return (1 - tokens) / self._rate
+
+            self._tokens = tokens - 1
+            self._updated_at = now
+            return 0.0
+
+    def _block(self, block_seconds: float) -> None:
+        if self._block_script is None:
+            with self._lock:
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + block_seconds
+                )
+            return
+
+        try:
+            self._block_script(keys=[self._cache_key], args=[block_seconds])
+        except redis.RedisError as e:
+            logger.warning(
+                "{} Unable to block rate limit bucket (cache_key={}). Error: {}.".format(
+                    _LOG_PREFIX, self._cache_key, e
+                )
+            )
+
+    def _record_wait(self, wait_seconds: float, acquired: bool) -> None:
+        with self._lock:
+            if acquired:
+                self._stats.tokens_consumed += 1
+            self._stats.wait_seconds += wait_seconds
+            self._stats.max_wait_seconds = max(
+                self._stats.max_wait_seconds, wait_seconds
+            )
+
+
+def get_rate_limiter(
+        gateway: str, rate_limit_class: enums.RateLimitClass
+) -> RateLimiter:
+    """
+    Returns process wide rate limiter of the gateway and rate limit class.
+    """
+    rate_limiter = _rate_limiters.get((gateway, rate_limit_class))
+    if rate_limiter:
+        return rate_limiter
+
+    with _rate_limiters_lock:
+        if (gateway, rate_limit_class) not in _rate_limiters:
+            _rate_limiters[(gateway, rate_limit_class)] = RateLimiter(
+                gateway=gateway, rate_limit_class=rate_limit_class
+            )
+
+        return _rate_limiters[(gateway, rate_limit_class)]
+
+
+def send_request(
+        rate_limiter: RateLimiter,
+        send: typing.Callable[[], requests.Response],
+        log_prefix: str,
+) -> requests.Response:
+    """
+    Sends the request once a rate limit token is taken. When the API throttles
+    it, the whole gateway backs off and the request is retried up to max
+    retries; the last throttled response is returned as is.
+    """
+    retries = 0
+    while True:
+        rate_limiter.acquire()
+        response = send()
+        if response.status_code != _TOO_MANY_REQUESTS_STATUS_CODE:
+            rate_limiter.reset_backoff()
+            return response
+
+        retry_after_seconds = get_retry_after_seconds(response=response)
+        block_seconds = rate_limiter.throttle(retry_after_seconds=retry_after_seconds)
+        logger.warning(
+            "{} Request throttled, backing off (url={}, retry_after={}, backoff_seconds={:.3f}, retry={}).".format(
+                log_prefix,
+                response.url,
+                response.headers.get("Retry-After"),
+                block_seconds,
+                retries,
+            )
+        )
+        if retries >= settings.GATEWAY_RATE_LIMIT_MAX_RETRIES:
+            return response
+
+        retries += 1
+
+
+def get_retry_after_seconds(response: requests.Response) -> typing.Optional[float]:
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email_utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+
+    return (retry_at - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds()
+
+
+def get_stats() -> typing.Dict[str, typing.Dict[str, typing.Union[int, float]]]:
+    stats = {}
+    for (gateway, rate_limit_class), rate_limiter in list(_rate_limiters.items()):
+        rate_limiter_stats = rate_limiter.stats
+        stats["{}-{}".format(gateway, rate_limit_class.name)] = {
+            "tokens_consumed": rate_limiter_stats.tokens_consumed,
+            "throttled": rate_limiter_stats.throttled,
+            "wait_seconds": round(rate_limiter_stats.wait_seconds, 3),
+            "max_wait_seconds": round(rate_limiter_stats.max_wait_seconds, 3),
+        }
+
+    return stats
@@ -0,0 +1,25 @@
+import dataclasses
+import decimal
+import typing
+
+import requests
+import simplejson
+
+
+@dataclasses.dataclass(frozen=True)
+class ParsedResponse:
+    status_code: int
+    data: typing.Any
+    content: bytes
+
+
+def parse_response(response: requests.Response) -> ParsedResponse:
+    """
+    Decodes JSON body of the response, with floats as decimals. Raises
+    simplejson.JSONDecodeError if the body is not valid JSON.
+    """
+    return ParsedResponse(
+        status_code=response.status_code,
+        data=simplejson.loads(response.content, parse_float=decimal.Decimal),
+        content=response.content,
+    )
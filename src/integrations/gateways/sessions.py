@@ -0,0 +1,79 @@
+import threading
+import typing
+
+import requests
+from requests import adapters
+
+from django.conf import settings
+
+_sessions: typing.Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url: str) -> requests.Session:
+    """
+    Returns process wide session for the API host, so that TCP and TLS
+    connections are kept alive and reused between requests.
+    """
+    session = _sessions.get(base_url)
+    if session:
+        return session
+
+    with _sessions_lock:
+        if base_url not in _sessions:
+            _sessions[base_url] = _create_session()
+
+        return _sessions[base_url]
+
+
+def get_timeout() -> typing.Tuple[float, float]:
+    return (
+        settings.GATEWAY_HTTP_CONNECT_TIMEOUT,
+        settings.GATEWAY_HTTP_READ_TIMEOUT,
+    )
+
+
+def get_pool_stats() -> typing.Dict[str, typing.Dict[str, int]]:
+    stats = {}
+    for base_url, session in list(_sessions.items()):
+        pool_manager = session.get_adapter(url=base_url).poolmanager
+        host_stats = {"connections_created": 0, "requests": 0}
+        for pool_key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(pool_key)
+            if not pool:
+                continue
+
+            host_stats["connections_created"] += pool.num_connections
+            host_stats["requests"] += pool.num_requests
+
+        host_stats["connections_reused"] = max(
+            0, host_stats["requests"] - host_stats["connections_created"]
+        )
+        stats[base_url] = host_stats
+
+    return stats
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+
+        _sessions.clear()
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = adapters.HTTPAdapter(
+        pool_connections=settings.GATEWAY_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.GATEWAY_HTTP_POOL_MAXSIZE,
+        pool_block=settings.GATEWAY_HTTP_POOL_BLOCK,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if not settings.GATEWAY_HTTP_KEEP_ALIVE:
+        session.headers["Connection"] = "close"
+
+    return session
@@ -1,7 +1,10 @@
 import abc
 import decimal
 import typing
+from concurrent import futures
 
+from common import tracing
+from common import utils as common_utils
 from src import enums
 from src.integrations.providers import messages
 
@@ -57,18 +60,92 @@ class BaseProvider(object):
     def get_offer(self, offer_id: str) -> messages.Offer:
         raise NotImplementedError
 
-    @abc.abstractmethod
     def get_all_offers(
         self,
         offer_type: enums.OfferType,
         currency: enums.CryptoCurrency,
         conversion_currency: enums.FiatCurrency,
-        payment_method: enums.PaymentMethod,
         min_price: decimal.Decimal,
         max_price: decimal.Decimal,
+        payment_method: typing.Optional[enums.PaymentMethod] = None,
     ) -> typing.List[messages.Offer]:
+        return list(
+            self.iter_all_offers(
+                offer_type=offer_type,
+                currency=currency,
+                conversion_currency=conversion_currency,
+                min_price=min_price,
+                max_price=max_price,
+                payment_method=payment_method,
+            )
+        )
+
+    @abc.abstractmethod
+    def iter_all_offers(
+        self,
+        offer_type: enums.OfferType,
+        currency: enums.CryptoCurrency,
+        conversion_currency: enums.FiatCurrency,
+        min_price: decimal.Decimal,
+        max_price: decimal.Decimal,
+        payment_method: typing.Optional[enums.PaymentMethod] = None,
+    ) -> typing.Iterator[messages.Offer]:
+        """
+        Yields offers as listing pages are received and validated, without
+        holding the whole listing in memory.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
     def update_offer_price(self, offer_id: str, price: decimal.Decimal) -> bool:
         raise NotImplementedError
+
+    def update_offer_prices(
+        self, offer_prices: typing.Dict[str, decimal.Decimal], max_workers: int
+    ) -> typing.Dict[str, messages.OfferPriceUpdateResult]:
+        """
+        Updates prices of many offers and returns the result of each update.
+        Offers are updated one request each, up to `max_workers` at a time;
+        providers with a batch price update endpoint override this. A failed
+        update is returned with its error, it does not fail other updates.
+        """
+
+        def _update_offer_price(offer_id: str) -> messages.OfferPriceUpdateResult:
+            with tracing.span(
+                "provider.update_offer_price",
+                provider=self.provider.name,
+                offer_id=offer_id,
+            ) as update_span:
+                try:
+                    result = messages.OfferPriceUpdateResult(
+                        is_updated=bool(
+                            self.update_offer_price(
+                                offer_id=offer_id, price=offer_prices[offer_id]
+                            )
+                        )
+                    )
+                except Exception as e:
+                    result = messages.OfferPriceUpdateResult(
+                        is_updated=False,
+                        error=common_utils.get_exception_message(exception=e)
+                        or e.__class__.__name__,
+                    )
+                update_span.set_attribute("updated", result.is_updated)
+                return result
+
+        if max_workers <= 1 or len(offer_prices) <= 1:
+            return {
+                offer_id: _update_offer_price(offer_id=offer_id)
+                for offer_id in offer_prices
+            }
+
+        with futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(offer_prices)),
+            thread_name_prefix="{}-price-update".format(self.provider.name.lower()),
+        ) as executor:
+            return dict(
+                zip(
+                    offer_prices,
+                    executor.map(tracing.propagate(_update_offer_price), offer_prices),
+                )
+            )
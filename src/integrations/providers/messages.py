@@ -14,6 +14,17 @@ class AuthenticationToken:
 
 @dataclasses.dataclass
 class Offer:
+    # Deep markets hold many offers per cycle, slots keep them compact.
+    __slots__ = (
+        "offer_id",
+        "currency",
+        "conversion_currency",
+        "price",
+        "type",
+        "payment_method",
+        "owner_last_seen_timestamp",
+    )
+
     offer_id: str
     currency: enums.CryptoCurrency
     conversion_currency: enums.FiatCurrency
@@ -21,3 +32,10 @@ class Offer:
     type: enums.OfferType
     payment_method: typing.Optional[enums.PaymentMethod]
     owner_last_seen_timestamp: typing.Optional[decimal.Decimal]
+
+
+@dataclasses.dataclass
+class OfferPriceUpdateResult:
+    is_updated: bool
+    # Message of the error the price update failed with.
+    error: typing.Optional[str] = None
@@ -3,6 +3,7 @@ import decimal
 import logging
 import typing
 
+from common import tracing
 from common import utils as common_utils
 from src import enums
 from src.integrations.gateways.noones import client as noones_client
@@ -10,6 +11,7 @@ from src.integrations.gateways.noones import exceptions as noones_client_excepti
 from src.integrations.providers import base as base_provider, messages
 from src.integrations.providers import messages as provider_mesages
 from src.integrations.providers import exceptions as provider_exceptions
+from src.integrations.providers import validators as provider_validators
 from src.integrations.providers.noones import schemas
 
 logger = logging.getLogger(__name__)
@@ -78,9 +80,14 @@ class NoonesProvider(base_provider.BaseProvider):
             logger.exception("{} {}.".format(self._LOG_PREFIX, msg))
             raise provider_exceptions.ProviderClientError(msg)
 
-        validated_offer = common_utils.validate_data_schema(
-            data=response, schema=schemas.Offer()
-        )
+        with tracing.span(
+            "provider.validate_offer",
+            provider=self.provider.name,
+            offer_id=offer_id,
+        ):
+            validated_offer = common_utils.validate_data_schema(
+                data=response, schema=schemas.Offer()
+            )
         if not validated_offer:
             msg = "Offer (offer_id={}) response data is not valid (raw_response_data={})".format(
                 offer_id, response
@@ -90,7 +97,7 @@ class NoonesProvider(base_provider.BaseProvider):
 
         return self._construct_offer_data(data=validated_offer)
 
-    def get_all_offers(
+    def iter_all_offers(
         self,
         offer_type: enums.OfferType,
         currency: enums.CryptoCurrency,
@@ -98,16 +105,41 @@ class NoonesProvider(base_provider.BaseProvider):
         min_price: decimal.Decimal,
         max_price: decimal.Decimal,
         payment_method: typing.Optional[enums.PaymentMethod] = None,
-    ) -> typing.List[messages.Offer]:
+    ) -> typing.Iterator[messages.Offer]:
+        offer_pages = self.get_rest_api_client().iter_all_offers(
+            offer_type=offer_type,
+            crypto_currency=currency,
+            conversion_currency=conversion_currency,
+            payment_method=payment_method,
+            fiat_fixed_price_min=min_price,
+            fiat_fixed_price_max=max_price,
+        )
+        invalid_offers_count = 0
         try:
-            response = self.get_rest_api_client().get_all_offers(
-                offer_type=offer_type,
-                crypto_currency=currency,
-                conversion_currency=conversion_currency,
-                payment_method=payment_method,
-                fiat_fixed_price_min=min_price,
-                fiat_fixed_price_max=max_price,
-            )
+            for offers_data in offer_pages:
+                # Offers are validated page by page, the span must not stay
+                # open while the consumer handles yielded offers.
+                with tracing.span(
+                    "provider.validate_offers",
+                    provider=self.provider.name,
+                    offer_type=offer_type.name,
+                    currency=currency.name,
+                    conversion_currency=conversion_currency.name,
+                    offers=len(offers_data),
+                ) as validation_span:
+                    offers = []
+                    for offer_data in offers_data:
+                        offer = provider_validators.validate_offer(data=offer_data)
+                        if not offer:
+                            invalid_offers_count += 1
+                            continue
+
+                        offers.append(offer)
+                    validation_span.set_attribute(
+                        "invalid_offers", len(offers_data) - len(offers)
+                    )
+
+                yield from offers
         except noones_client_exceptions.NoonesAPIException as e:
             msg = "Exception occurred while getting all offers (offer_type={}, currency={}, conversion_currency={}, payment_method={}, min_price={}, max_price={}). Error: {}".format(
                 offer_type.name,
@@ -120,19 +152,17 @@ class NoonesProvider(base_provider.BaseProvider):
             )
             logger.exception("{} {}.".format(self._LOG_PREFIX, msg))
             raise provider_exceptions.ProviderClientError(msg)
-
-        validated_offers = common_utils.validate_data_schema(
-            data={"offers": response}, schema=schemas.Offers()
-        )
-        if not validated_offers:
-            msg = "Offers data is not valid"
-            logger.error("{} {}.".format(self._LOG_PREFIX, msg))
-            raise provider_exceptions.ProviderDataValidationError(msg)
-
-        return [
-            self._construct_offer_data(data=offer_data)
-            for offer_data in validated_offers["offers"]
-        ]
+        finally:
+            if invalid_offers_count:
+                logger.warning(
+                    "{} Skipped invalid offers (count={}, offer_type={}, currency={}, conversion_currency={}).".format(
+                        self._LOG_PREFIX,
+                        invalid_offers_count,
+                        offer_type.name,
+                        currency.name,
+                        conversion_currency.name,
+                    )
+                )
 
     def update_offer_price(self, offer_id: str, price: decimal.Decimal) -> bool:
         try:
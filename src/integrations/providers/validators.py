@@ -0,0 +1,85 @@
+import decimal
+import typing
+
+from src import enums
+from src.integrations.providers import messages
+
+# Listing values are looked up directly instead of constructing enums per offer.
+_OFFER_TYPES = {offer_type.value: offer_type for offer_type in enums.OfferType}
+_CRYPTO_CURRENCIES = {
+    crypto_currency.value: crypto_currency for crypto_currency in enums.CryptoCurrency
+}
+_FIAT_CURRENCIES = {
+    fiat_currency.value: fiat_currency for fiat_currency in enums.FiatCurrency
+}
+
+
+def validate_offer(data: typing.Any) -> typing.Optional[messages.Offer]:
+    """
+    Validates a raw offer listing record with the same rules as the `Offer`
+    schema and constructs the offer message directly from it. Returns None if
+    the record is invalid, so that one bad record does not fail the listing.
+    """
+    if not isinstance(data, dict):
+        return None
+
+    offer_id = data.get("offer_id")
+    offer_type = data.get("offer_type")
+    crypto_currency_code = data.get("crypto_currency_code")
+    fiat_currency_code = data.get("fiat_currency_code")
+    payment_method_slug = data.get("payment_method_slug")
+    if not (
+            isinstance(offer_id, str)
+            and isinstance(offer_type, str)
+            and isinstance(crypto_currency_code, str)
+            and isinstance(fiat_currency_code, str)
+            and isinstance(payment_method_slug, str)
+    ):
+        return None
+
+    price = _to_decimal(value=data.get("fiat_price_per_crypto"))
+    if price is None:
+        return None
+
+    owner_last_seen_timestamp = data.get("last_seen_timestamp")
+    if owner_last_seen_timestamp is not None:
+        owner_last_seen_timestamp = _to_decimal(value=owner_last_seen_timestamp)
+        if owner_last_seen_timestamp is None:
+            return None
+
+    offer_type = _OFFER_TYPES.get(offer_type)
+    currency = _CRYPTO_CURRENCIES.get(crypto_currency_code)
+    conversion_currency = _FIAT_CURRENCIES.get(fiat_currency_code)
+    if offer_type is None or currency is None or conversion_currency is None:
+        return None
+
+    return messages.Offer(
+        offer_id=offer_id,
+        type=offer_type,
+        currency=currency,
+        conversion_currency=conversion_currency,
+        price=price,
+        payment_method=enums.PaymentMethod.convert_from_payment_slug(
+            slug=payment_method_slug
+        ),
+        owner_last_seen_timestamp=owner_last_seen_timestamp,
+    )
+
+
+def _to_decimal(value: typing.Any) -> typing.Optional[decimal.Decimal]:
+    # Same as marshmallow Decimal field: booleans, NaN and infinity are invalid.
+    if value is None or value is True or value is False:
+        return None
+
+    if isinstance(value, decimal.Decimal):
+        number = value
+    else:
+        try:
+            number = decimal.Decimal(str(value))
+        except (TypeError, ValueError, decimal.InvalidOperation):
+            return None
+
+    if not number.is_finite():
+        return None
+
+    return number
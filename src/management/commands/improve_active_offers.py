@@ -1,12 +1,23 @@
+import functools
 import logging
+import multiprocessing
+import signal
+import threading
 import typing
 
+from django import db
+from django.conf import settings
+from django.core import management
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 from django.core.management.base import CommandParser
 
-from common import utils as common_utils
 from src import enums
 from src.services import offer_improver as offer_improver_services
+from src.services import offer_improver_daemon as offer_improver_daemon_services
+from src.services import offer_scheduler as offer_scheduler_services
+from src.services import offer_shards as offer_shard_services
+from src.services import provider_runner as provider_runner_services
 from src.integrations.providers import factory as provider_factory
 
 logger = logging.getLogger(__name__)
@@ -14,8 +25,14 @@ logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = """
-            Improves all active offers.
+            Improves all active offers, of all providers unless one is given.
+            ex. python manage.py improve_active_offers
             ex. python manage.py improve_active_offers --provider=PAXFUL
+            ex. python manage.py improve_active_offers --provider=PAXFUL --workers=4
+            ex. python manage.py improve_active_offers --daemon --interval=30
+            ex. python manage.py improve_active_offers --provider=PAXFUL --daemon --adaptive
+            ex. python manage.py improve_active_offers --daemon --sharded
+            ex. python manage.py improve_active_offers --daemon --processes=4
             """
 
     log_prefix = "[IMPROVE-ACTIVE-OFFERS]"
@@ -23,35 +40,230 @@ class Command(BaseCommand):
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument(
             "--provider",
-            required=True,
+            required=False,
             type=str,
+            default=None,
             choices=[offer_provider.name for offer_provider in enums.OfferProvider],
-            help="One of offer providers specified in OfferProvider enum.",
+            help="One of offer providers specified in OfferProvider enum. Defaults to all of them, improved concurrently.",
+        )
+        parser.add_argument(
+            "--workers",
+            required=False,
+            type=int,
+            default=None,
+            help="Number of offers improved concurrently per provider. Capped by provider max workers setting.",
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            default=False,
+            help="Stay resident and run improvement cycles on an interval until SIGINT/SIGTERM.",
+        )
+        parser.add_argument(
+            "--interval",
+            required=False,
+            type=float,
+            default=None,
+            help="Seconds between daemon cycle starts. Defaults to provider daemon interval setting.",
+        )
+        parser.add_argument(
+            "--adaptive",
+            action="store_true",
+            default=False,
+            help="In daemon mode, reprice each market as often as its best competitor price moves.",
+        )
+        parser.add_argument(
+            "--sharded",
+            action="store_true",
+            default=False,
+            help="In daemon mode, improve only offers of shards leased by this worker, so that many processes and hosts can share the offers.",
+        )
+        parser.add_argument(
+            "--processes",
+            required=False,
+            type=int,
+            default=None,
+            help="In daemon mode, run this many sharded worker processes on this host.",
         )
 
     def handle(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        if (kwargs["sharded"] or kwargs["processes"]) and not kwargs["daemon"]:
+            # A single cycle starts before other workers have joined, the first
+            # worker would lease all shards and the others would improve none.
+            raise CommandError("--sharded and --processes require --daemon.")
+
+        if kwargs["processes"] and kwargs["processes"] > 1:
+            self._run_processes(
+                processes=kwargs["processes"],
+                options={
+                    "provider": kwargs["provider"],
+                    "workers": kwargs["workers"],
+                    "daemon": kwargs["daemon"],
+                    "interval": kwargs["interval"],
+                    "adaptive": kwargs["adaptive"],
+                    "sharded": True,
+                },
+            )
+            return
+
+        offer_providers = (
+            [enums.OfferProvider[kwargs["provider"]]]
+            if kwargs["provider"]
+            else list(enums.OfferProvider)
+        )
+        logger.info(
+            "{} Started command '{}' (providers={}).".format(
+                self.log_prefix,
+                __name__.split(".")[-1],
+                [offer_provider.name for offer_provider in offer_providers],
+            )
+        )
+
+        stop_event = threading.Event()
+        if kwargs["daemon"]:
+            # Signals are only delivered to the main thread, daemons of all
+            # providers stop on the same event.
+            signal.signal(signal.SIGINT, lambda *_: self._stop(stop_event=stop_event))
+            signal.signal(signal.SIGTERM, lambda *_: self._stop(stop_event=stop_event))
+
+        provider_runner_services.run_for_providers(
+            providers=offer_providers,
+            run=functools.partial(
+                self._improve_provider_offers,
+                max_workers=kwargs["workers"],
+                daemon=kwargs["daemon"],
+                interval_seconds=kwargs["interval"],
+                adaptive=kwargs["adaptive"],
+                sharded=kwargs["sharded"] or bool(kwargs["processes"]),
+                stop_event=stop_event,
+            ),
+            log_prefix=self.log_prefix,
+        )
+
         logger.info(
-            "{} Started command '{}' (provider={}).".format(
-                self.log_prefix, __name__.split(".")[-1], kwargs["provider"]
+            "{} Finished command '{}' (providers={}).".format(
+                self.log_prefix,
+                __name__.split(".")[-1],
+                [offer_provider.name for offer_provider in offer_providers],
             )
         )
 
+    def _improve_provider_offers(
+        self,
+        offer_provider: enums.OfferProvider,
+        max_workers: typing.Optional[int],
+        daemon: bool,
+        interval_seconds: typing.Optional[float],
+        adaptive: bool,
+        sharded: bool,
+        stop_event: threading.Event,
+    ) -> None:
+        offer_shard_coordinator = None
+        if sharded:
+            offer_shard_coordinator = offer_shard_services.OfferShardCoordinator(
+                provider=offer_provider,
+                shard_count=settings.OFFER_SHARD_COUNT,
+                shard_key=enums.OfferShardKey[settings.OFFER_SHARD_KEY],
+                max_workers=settings.OFFER_SHARD_MAX_WORKERS,
+                lease_ttl_seconds=settings.OFFER_SHARD_LEASE_TTL_SECONDS,
+                heartbeat_interval_seconds=settings.OFFER_SHARD_HEARTBEAT_INTERVAL_SECONDS,
+            )
+            offer_shard_coordinator.start()
+
         try:
-            offer_improver_services.OfferImproverService(
+            offer_improver_service = offer_improver_services.OfferImproverService(
                 provider_client=provider_factory.ProviderFactory().create(
-                    provider=enums.OfferProvider[kwargs["provider"]]
-                )
-            ).improve_internal_active_offers()
-        except Exception as e:
-            logger.exception(
-                "{} Unexpected exception occurred while improving all active internal offers. Error: {}.".format(
-                    self.log_prefix,
-                    common_utils.get_exception_message(exception=e),
-                )
+                    provider=offer_provider
+                ),
+                max_workers=max_workers,
+                offer_shard_coordinator=offer_shard_coordinator,
             )
+            if daemon:
+                self._run_daemon(
+                    offer_improver_service=offer_improver_service,
+                    interval_seconds=interval_seconds,
+                    adaptive=adaptive,
+                    stop_event=stop_event,
+                )
+            else:
+                offer_improver_service.improve_internal_active_offers()
+        finally:
+            if offer_shard_coordinator:
+                offer_shard_coordinator.stop()
 
+    def _run_processes(self, processes: int, options: typing.Dict) -> None:
         logger.info(
-            "{} Finished command '{}' (provider={}).".format(
-                self.log_prefix, __name__.split(".")[-1], kwargs["provider"]
+            "{} Starting {} sharded worker processes (options={}).".format(
+                self.log_prefix, processes, options
+            )
+        )
+        # Forked workers must not share DB connections of this process.
+        db.connections.close_all()
+        context = multiprocessing.get_context("fork")
+        worker_processes = [
+            context.Process(
+                target=_run_worker_process,
+                kwargs={"options": options},
+                name="offer-improver-worker-{}".format(index),
             )
+            for index in range(processes)
+        ]
+        for worker_process in worker_processes:
+            worker_process.start()
+
+        def _terminate(*_: typing.Any) -> None:
+            logger.info("{} Stopping worker processes.".format(self.log_prefix))
+            for worker_process in worker_processes:
+                if worker_process.is_alive():
+                    worker_process.terminate()
+
+        signal.signal(signal.SIGINT, _terminate)
+        signal.signal(signal.SIGTERM, _terminate)
+        for worker_process in worker_processes:
+            worker_process.join()
+            logger.info(
+                "{} Worker process finished (name={}, exitcode={}).".format(
+                    self.log_prefix, worker_process.name, worker_process.exitcode
+                )
+            )
+
+    def _stop(self, stop_event: threading.Event) -> None:
+        logger.info("{} Stopping daemons.".format(self.log_prefix))
+        stop_event.set()
+
+    @staticmethod
+    def _run_daemon(
+        offer_improver_service: offer_improver_services.OfferImproverService,
+        interval_seconds: typing.Optional[float],
+        adaptive: bool,
+        stop_event: threading.Event,
+    ) -> None:
+        interval_seconds = (
+            interval_seconds
+            or settings.OFFER_IMPROVER_DAEMON_INTERVAL_SECONDS[
+                offer_improver_service.provider.name
+            ]
         )
+        offer_scheduler = None
+        if adaptive:
+            offer_scheduler = offer_scheduler_services.AdaptiveOfferScheduler(
+                provider=offer_improver_service.provider,
+                initial_interval_seconds=interval_seconds,
+                min_interval_seconds=settings.OFFER_SCHEDULER_MIN_INTERVAL_SECONDS,
+                max_interval_seconds=settings.OFFER_SCHEDULER_MAX_INTERVAL_SECONDS,
+                decrease_factor=settings.OFFER_SCHEDULER_DECREASE_FACTOR,
+                increase_factor=settings.OFFER_SCHEDULER_INCREASE_FACTOR,
+            )
+
+        offer_improver_daemon_services.OfferImproverDaemon(
+            offer_improver_service=offer_improver_service,
+            interval_seconds=interval_seconds,
+            jitter_seconds=settings.OFFER_IMPROVER_DAEMON_JITTER_SECONDS,
+            max_backoff_seconds=settings.OFFER_IMPROVER_DAEMON_MAX_BACKOFF_SECONDS,
+            stop_event=stop_event,
+            offer_scheduler=offer_scheduler,
+        ).run()
+
+
+def _run_worker_process(options: typing.Dict) -> None:
+    management.call_command("improve_active_offers", **options)
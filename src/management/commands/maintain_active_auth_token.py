@@ -4,17 +4,18 @@ import typing
 from django.core.management.base import BaseCommand
 from django.core.management.base import CommandParser
 
-from common import utils as common_utils
 from src import enums
 from src.integrations.providers import factory as provider_factory
 from src.services import authentication as authentication_services
+from src.services import provider_runner as provider_runner_services
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     help = """
-            Maintains active authentication token pool.
+            Maintains active authentication token pool, of all providers unless one is given.
+            ex. python manage.py maintain_active_auth_token
             ex. python manage.py maintain_active_auth_token  --provider=PAXFUL
             """
 
@@ -23,41 +24,47 @@ class Command(BaseCommand):
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument(
             "--provider",
-            required=True,
+            required=False,
             type=str,
+            default=None,
             choices=[offer_provider.name for offer_provider in enums.OfferProvider],
-            help="One of offer providers specified in OfferProvider enum.",
+            help="One of offer providers specified in OfferProvider enum. Defaults to all of them.",
         )
 
     def handle(self, *args: typing.Any, **kwargs: typing.Any) -> None:
-        offer_provider = enums.OfferProvider[kwargs["provider"]]
+        offer_providers = (
+            [enums.OfferProvider[kwargs["provider"]]]
+            if kwargs["provider"]
+            else list(enums.OfferProvider)
+        )
         logger.info(
-            "{} Started command '{}' (provider={}).".format(
+            "{} Started command '{}' (providers={}).".format(
                 self.log_prefix,
                 __name__.split(".")[-1],
-                offer_provider.name,
+                [offer_provider.name for offer_provider in offer_providers],
             )
         )
 
-        try:
-            authentication_services.AuthenticationService(
-                provider_client=provider_factory.AuthenticationProviderFactory().create(
-                    provider=offer_provider
-                )
-            ).maintain_active_authentication_token()
-        except Exception as e:
-            logger.exception(
-                "{} Unexpected exception occurred while maintaining active authentication token (provider={}). Error: {}.".format(
-                    self.log_prefix,
-                    offer_provider.name,
-                    common_utils.get_exception_message(exception=e),
-                )
-            )
+        provider_runner_services.run_for_providers(
+            providers=offer_providers,
+            run=self._maintain_active_authentication_token,
+            log_prefix=self.log_prefix,
+        )
 
         logger.info(
-            "{} Finished command '{}' (provider={}).".format(
+            "{} Finished command '{}' (providers={}).".format(
                 self.log_prefix,
                 __name__.split(".")[-1],
-                offer_provider.name,
+                [offer_provider.name for offer_provider in offer_providers],
             )
         )
+
+    @staticmethod
+    def _maintain_active_authentication_token(
+        offer_provider: enums.OfferProvider,
+    ) -> None:
+        authentication_services.AuthenticationService(
+            provider_client=provider_factory.AuthenticationProviderFactory().create(
+                provider=offer_provider
+            )
+        ).maintain_active_authentication_token()
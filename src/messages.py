@@ -1,11 +1,76 @@
+import decimal
+import typing
 from dataclasses import dataclass
 
 from src import enums
+from src.integrations.providers import messages as provider_messages
 
 
-@dataclass
+@dataclass(frozen=True)
 class OfferSearchParameters:
     offer_type: enums.OfferType
     currency: enums.CryptoCurrency
     conversion_currency: enums.FiatCurrency
-    payment_method: enums.PaymentMethod
+    payment_method: typing.Optional[enums.PaymentMethod]
+
+
+@dataclass(frozen=True)
+class OfferImprovementResult:
+    offer_id: str
+    search_parameters: OfferSearchParameters
+    competitor_offer_price: typing.Optional[decimal.Decimal]
+    updated_offer_price: typing.Optional[decimal.Decimal]
+
+
+@dataclass(frozen=True)
+class ImprovedOffer:
+    internal_offer: provider_messages.Offer
+    competitor_offer: provider_messages.Offer
+    updated_price: decimal.Decimal
+
+
+@dataclass(frozen=True)
+class CurrencyOfferConfig:
+    amount_to_increase_offer: decimal.Decimal
+    search_price_upper_margin: decimal.Decimal
+    search_price_lower_margin: decimal.Decimal
+    owner_last_seen_max_time: decimal.Decimal
+
+
+@dataclass(frozen=True)
+class MarketDiff:
+    added_offer_ids: typing.FrozenSet[str]
+    removed_offer_ids: typing.FrozenSet[str]
+    repriced_offer_ids: typing.FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class OfferPriceDecision:
+    search_parameters: OfferSearchParameters
+    market_price: decimal.Decimal
+    competitor_offer_id: typing.Optional[str]
+    competitor_offer_price: typing.Optional[decimal.Decimal]
+    offer_price: typing.Optional[decimal.Decimal]
+    decided_at: float
+
+
+@dataclass(frozen=True)
+class InternalOfferState:
+    offer: provider_messages.Offer
+    # Monotonic time the offer was last fetched from provider.
+    synced_at: float
+
+
+@dataclass(frozen=True)
+class OfferPriceUpdate:
+    internal_offer: provider_messages.Offer
+    competitor_offer: provider_messages.Offer
+    search_parameters: OfferSearchParameters
+    market_price: decimal.Decimal
+    price: decimal.Decimal
+
+
+@dataclass(frozen=True)
+class Lease:
+    cache_key: str
+    fencing_token: int
@@ -30,6 +30,8 @@ class Offer(django_db_models.Model):
     payment_method = django_db_models.CharField(max_length=255, null=False)
     provider = django_db_models.SmallIntegerField(null=True)
     provider_name = django_db_models.CharField(max_length=255, null=True)
+    # Highest lease fencing token that wrote offer history, older are rejected.
+    fencing_token = django_db_models.BigIntegerField(null=False, default=0)
 
     created_at = django_db_models.DateTimeField(auto_now_add=True)
     updated_at = django_db_models.DateTimeField(auto_now_add=True)
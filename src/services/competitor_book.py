@@ -0,0 +1,147 @@
+import bisect
+import decimal
+import threading
+import typing
+
+from src import enums
+from src.integrations.providers import messages as provider_messages
+
+
+class CompetitorBook(object):
+    """
+    Competitor offers of a single market. The first lookup scans all offers
+    once. Markets searched again, e.g. by several internal offers, are sorted
+    by price on the second lookup, so that later lookups walk outwards from
+    the market price instead of filtering every offer.
+    """
+
+    def __init__(self, offers: typing.Iterable[provider_messages.Offer]) -> None:
+        self._offers = list(offers)
+        self._sorted_offers: typing.Optional[typing.List[provider_messages.Offer]] = None
+        self._prices: typing.Optional[typing.List[decimal.Decimal]] = None
+        self._lookup_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._offers)
+
+    def get_offer_prices(self) -> typing.Dict[str, decimal.Decimal]:
+        return {offer.offer_id: offer.price for offer in self._offers}
+
+    def get_best_offer(
+            self,
+            market_price: decimal.Decimal,
+            excluded_offer_id: str,
+            min_owner_last_seen_timestamp: decimal.Decimal,
+            payment_methods: typing.Optional[typing.FrozenSet[enums.PaymentMethod]],
+    ) -> typing.Optional[provider_messages.Offer]:
+        """
+        Returns the highest priced relevant offer at or below market price, or
+        if there is none, the lowest priced relevant offer above market price.
+        Among offers with the same price the first one in original order wins.
+        """
+        with self._lock:
+            self._lookup_count += 1
+            if self._lookup_count == 2:
+                # Sort is stable, offers with the same price keep their order.
+                self._sorted_offers = sorted(
+                    self._offers, key=lambda offer: offer.price
+                )
+                self._prices = [offer.price for offer in self._sorted_offers]
+            sorted_offers = self._sorted_offers
+            prices = self._prices
+
+        if sorted_offers is None:
+            return self._scan_best_offer(
+                market_price=market_price,
+                excluded_offer_id=excluded_offer_id,
+                min_owner_last_seen_timestamp=min_owner_last_seen_timestamp,
+                payment_methods=payment_methods,
+            )
+
+        split_index = bisect.bisect_right(prices, market_price)
+
+        best_offer = None
+        for index in range(split_index - 1, -1, -1):
+            offer = sorted_offers[index]
+            if best_offer is not None and offer.price != best_offer.price:
+                break
+
+            if self._is_relevant(
+                offer=offer,
+                excluded_offer_id=excluded_offer_id,
+                min_owner_last_seen_timestamp=min_owner_last_seen_timestamp,
+                payment_methods=payment_methods,
+            ):
+                best_offer = offer
+
+        if best_offer is not None:
+            return best_offer
+
+        for index in range(split_index, len(sorted_offers)):
+            offer = sorted_offers[index]
+            if self._is_relevant(
+                offer=offer,
+                excluded_offer_id=excluded_offer_id,
+                min_owner_last_seen_timestamp=min_owner_last_seen_timestamp,
+                payment_methods=payment_methods,
+            ):
+                return offer
+
+        return None
+
+    def _scan_best_offer(
+            self,
+            market_price: decimal.Decimal,
+            excluded_offer_id: str,
+            min_owner_last_seen_timestamp: decimal.Decimal,
+            payment_methods: typing.Optional[typing.FrozenSet[enums.PaymentMethod]],
+    ) -> typing.Optional[provider_messages.Offer]:
+        best_offer_below_market_price = None
+        best_offer_above_market_price = None
+        for offer in self._offers:
+            if not self._is_relevant(
+                offer=offer,
+                excluded_offer_id=excluded_offer_id,
+                min_owner_last_seen_timestamp=min_owner_last_seen_timestamp,
+                payment_methods=payment_methods,
+            ):
+                continue
+
+            if offer.price > market_price:
+                if (
+                        best_offer_above_market_price is None
+                        or offer.price < best_offer_above_market_price.price
+                ):
+                    best_offer_above_market_price = offer
+            elif (
+                    best_offer_below_market_price is None
+                    or offer.price > best_offer_below_market_price.price
+            ):
+                best_offer_below_market_price = offer
+
+        if best_offer_below_market_price is not None:
+            return best_offer_below_market_price
+
+        return best_offer_above_market_price
+
+    @staticmethod
+    def _is_relevant(
+            offer: provider_messages.Offer,
+            excluded_offer_id: str,
+            min_owner_last_seen_timestamp: decimal.Decimal,
+            payment_methods: typing.Optional[typing.FrozenSet[enums.PaymentMethod]],
+    ) -> bool:
+        if offer.offer_id == excluded_offer_id:
+            return False
+
+        if (
+                offer.owner_last_seen_timestamp is None
+                or offer.owner_last_seen_timestamp < min_owner_last_seen_timestamp
+        ):
+            return False
+
+        if payment_methods is not None and offer.payment_method not in payment_methods:
+            return False
+
+        return True
@@ -1,5 +1,7 @@
 import datetime
+import decimal
 import logging
+import threading
 import typing
 
 from django.core.cache import cache
@@ -7,11 +9,24 @@ from django.core.cache import cache
 from src import constants
 from src import enums
 from src import exceptions
+from src import messages
 from src import models
 
 logger = logging.getLogger(__name__)
 _LOG_PREFIX = "[CONFIG]"
 
+# In-process snapshot of typed currency offer configs, dropped whenever
+# currency config version in cache changes.
+_currency_offer_configs: typing.Dict[
+    typing.Tuple[enums.OfferProvider, enums.CryptoCurrency],
+    messages.CurrencyOfferConfig,
+] = {}
+_currency_offer_configs_version: typing.Optional[int] = None
+# Incremented whenever snapshots are dropped, so that a config loaded before
+# is not stored after.
+_currency_offer_configs_generation = 0
+_currency_offer_configs_lock = threading.Lock()
+
 
 def set_currency_offer_config(
     currency: enums.CryptoCurrency,
@@ -44,64 +59,112 @@ def set_currency_offer_config(
             _LOG_PREFIX, currency_config.id
         )
     )
-    cache.set(
-        key=constants.CURRENCY_CONFIG_CACHE_NAME.format(
-            config_name=config_name,
-            currency=currency.name,
-            provider=offer_provider.name,
-        ),
-        value=config_value,
-        timeout=constants.CACHE_MAX_TTL,
-    )
-    logger.info(
-        "{} Currency offer config (config_name={}) set to cache.".format(
-            _LOG_PREFIX, config_name
-        )
-    )
+    _bump_currency_offer_configs_version()
     return currency_config
 
 
-def get_currency_offer_config(
+def get_currency_offer_config_snapshot(
     currency: enums.CryptoCurrency,
     offer_provider: enums.OfferProvider,
-    config_name: str,
-) -> str:
-    if config_name not in constants.CURRENCY_CONFIGS:
-        msg = "Currency config name is not one of supported configs"
-        logger.error("{} {}.".format(_LOG_PREFIX, msg))
-        raise exceptions.CurrencyConfigNotSupportedError(msg)
+) -> messages.CurrencyOfferConfig:
+    """
+    Returns all offer configs of the currency as decimals. Configs are read from
+    DB once and kept in process until refresh_currency_offer_config_snapshots
+    notices that any currency config was changed.
+    """
+    with _currency_offer_configs_lock:
+        currency_offer_config = _currency_offer_configs.get((offer_provider, currency))
+        generation = _currency_offer_configs_generation
+    if currency_offer_config:
+        return currency_offer_config
 
-    config_value = cache.get(
-        key=constants.CURRENCY_CONFIG_CACHE_NAME.format(
-            config_name=config_name,
-            currency=currency.name,
-            provider=offer_provider.name,
-        ),
-        default=None,
+    currency_offer_config = _load_currency_offer_config(
+        currency=currency, offer_provider=offer_provider
     )
-    if not config_value:
-        config_value = models.CurrencyConfig.objects.get(
-            currency=currency.value, name=config_name, provider=offer_provider.value
-        ).value
+    with _currency_offer_configs_lock:
+        if generation == _currency_offer_configs_generation:
+            _currency_offer_configs[(offer_provider, currency)] = currency_offer_config
+
+    return currency_offer_config
+
+
+def refresh_currency_offer_config_snapshots() -> None:
+    global _currency_offer_configs_version, _currency_offer_configs_generation
+
+    version = cache.get(key=constants.CURRENCY_CONFIG_VERSION_CACHE_KEY, default=0)
+    with _currency_offer_configs_lock:
+        if version == _currency_offer_configs_version:
+            return
+
+        if _currency_offer_configs:
+            logger.info(
+                "{} Currency offer configs changed, dropping snapshots (version={}->{}).".format(
+                    _LOG_PREFIX, _currency_offer_configs_version, version
+                )
+            )
+
+        _currency_offer_configs.clear()
+        _currency_offer_configs_generation += 1
+        _currency_offer_configs_version = version
+
 
-    if not config_value:
+def get_all_currency_configs() -> typing.List[models.CurrencyConfig]:
+    return models.CurrencyConfig.objects.all()
+
+
+def _load_currency_offer_config(
+    currency: enums.CryptoCurrency,
+    offer_provider: enums.OfferProvider,
+) -> messages.CurrencyOfferConfig:
+    config_values = dict(
+        models.CurrencyConfig.objects.filter(
+            currency=currency.value,
+            provider=offer_provider.value,
+            name__in=constants.CURRENCY_CONFIGS,
+        ).values_list("name", "value")
+    )
+    missing_config_names = [
+        config_name
+        for config_name in constants.CURRENCY_CONFIGS
+        if not config_values.get(config_name)
+    ]
+    if missing_config_names:
         raise exceptions.CurrencyOfferConfigNotFoundError(
-            "Currency offer config not found (currency={}, config_name={})".format(
-                currency.name, config_name
+            "Currency offer config not found (currency={}, config_names={})".format(
+                currency.name, missing_config_names
             )
         )
 
-    cache.set(
-        key=constants.CURRENCY_CONFIG_CACHE_NAME.format(
-            config_name=config_name,
-            currency=currency.name,
-            provider=offer_provider.name,
-        ),
-        value=config_value,
-        timeout=constants.CACHE_MAX_TTL,
+    try:
+        currency_offer_config = messages.CurrencyOfferConfig(
+            **{
+                config_name: decimal.Decimal(config_values[config_name])
+                for config_name in constants.CURRENCY_CONFIGS
+            }
+        )
+    except decimal.InvalidOperation:
+        msg = "Currency offer config is not a decimal (currency={}, configs={})".format(
+            currency.name, config_values
+        )
+        logger.error("{} {}.".format(_LOG_PREFIX, msg))
+        raise exceptions.CurrencyOfferConfigInvalidError(msg)
+
+    logger.info(
+        "{} Loaded currency offer config snapshot (currency={}, provider={}, config={}).".format(
+            _LOG_PREFIX, currency.name, offer_provider.name, currency_offer_config
+        )
     )
-    return config_value
+    return currency_offer_config
 
 
-def get_all_currency_configs() -> typing.List[models.CurrencyConfig]:
-    return models.CurrencyConfig.objects.all()
+def _bump_currency_offer_configs_version() -> None:
+    global _currency_offer_configs_generation
+
+    if not cache.add(
+        key=constants.CURRENCY_CONFIG_VERSION_CACHE_KEY, value=1, timeout=None
+    ):
+        cache.incr(key=constants.CURRENCY_CONFIG_VERSION_CACHE_KEY)
+
+    with _currency_offer_configs_lock:
+        _currency_offer_configs.clear()
+        _currency_offer_configs_generation += 1
@@ -0,0 +1,141 @@
+import typing
+
+from django.core.cache import cache
+
+from common import utils as common_utils
+from src import messages
+
+# Deletes keys still holding the given values, returns the number deleted.
+_COMPARE_AND_DELETE_SCRIPT = """
+local deleted = 0
+for index, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[index] then
+        deleted = deleted + redis.call('DEL', key)
+    end
+end
+return deleted
+"""
+
+# Extends TTL of the key while it holds the given value, returns 1 if extended.
+_COMPARE_AND_TOUCH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def acquire_lease(
+        cache_key: str,
+        fencing_token_cache_key: str,
+        timeout: float,
+        get_last_fencing_token: typing.Optional[typing.Callable[[], int]] = None,
+) -> typing.Optional[messages.Lease]:
+    """
+    Acquires the lease unless someone else holds it. Every lease gets a fencing
+    token greater than all tokens issued before under the same token key, so
+    that writes of a holder whose lease expired meanwhile can be rejected.
+    When the token counter is missing from cache, it restarts from
+    `get_last_fencing_token`, so that tokens stay above the ones already
+    stored elsewhere.
+    """
+    if cache.get(key=fencing_token_cache_key) is None:
+        cache.add(
+            key=fencing_token_cache_key,
+            value=get_last_fencing_token() if get_last_fencing_token else 0,
+            timeout=None,
+        )
+    fencing_token = cache.incr(key=fencing_token_cache_key)
+    if not cache.add(key=cache_key, value=fencing_token, timeout=timeout):
+        return None
+
+    return messages.Lease(cache_key=cache_key, fencing_token=fencing_token)
+
+
+def get_held_leases(
+        leases: typing.Iterable[messages.Lease],
+) -> typing.List[messages.Lease]:
+    """
+    Returns leases that are still held, i.e. neither expired nor taken over.
+    """
+    leases = list(leases)
+    if not leases:
+        return []
+
+    fencing_tokens = cache.get_many(keys=[lease.cache_key for lease in leases])
+    return [
+        lease
+        for lease in leases
+        if fencing_tokens.get(lease.cache_key) == lease.fencing_token
+    ]
+
+
+def renew_leases(
+        leases: typing.Iterable[messages.Lease], timeout: float
+) -> typing.List[messages.Lease]:
+    """
+    Extends leases that are still held by `timeout` and returns them. Leases
+    that expired or were taken over are not renewed.
+    """
+    return [
+        lease
+        for lease in leases
+        if compare_and_touch(
+            cache_key=lease.cache_key, value=lease.fencing_token, timeout=timeout
+        )
+    ]
+
+
+def release_leases(leases: typing.Iterable[messages.Lease]) -> None:
+    compare_and_delete(
+        values={lease.cache_key: lease.fencing_token for lease in leases}
+    )
+
+
+def compare_and_delete(values: typing.Dict[str, typing.Any]) -> int:
+    """
+    Deletes each cache key that still holds its value, so that a key taken
+    over by someone else after it expired is kept. Keys are compared and
+    deleted atomically on redis. Returns the number of deleted keys.
+    """
+    if not values:
+        return 0
+
+    redis_connection = common_utils.get_redis_connection()
+    if redis_connection is None:
+        # Other caches, e.g. in development, are local to the process.
+        cached_values = cache.get_many(keys=list(values))
+        cache_keys = [
+            cache_key
+            for cache_key, value in values.items()
+            if cache_key in cached_values and cached_values[cache_key] == value
+        ]
+        cache.delete_many(keys=cache_keys)
+        return len(cache_keys)
+
+    cache_keys = list(values)
+    return redis_connection.register_script(_COMPARE_AND_DELETE_SCRIPT)(
+        keys=[cache.client.make_key(cache_key) for cache_key in cache_keys],
+        args=[cache.client.encode(values[cache_key]) for cache_key in cache_keys],
+    )
+
+
+def compare_and_touch(cache_key: str, value: typing.Any, timeout: float) -> bool:
+    """
+    Sets a new timeout of the cache key only while it holds the value, i.e.
+    renews a lease unless it expired or was taken over meanwhile. Key is
+    compared and touched atomically on redis.
+    """
+    redis_connection = common_utils.get_redis_connection()
+    if redis_connection is None:
+        if cache.get(key=cache_key) != value:
+            return False
+
+        return bool(cache.touch(key=cache_key, timeout=timeout))
+
+    return bool(
+        redis_connection.register_script(_COMPARE_AND_TOUCH_SCRIPT)(
+            keys=[cache.client.make_key(cache_key)],
+            args=[cache.client.encode(value), max(1, int(timeout * 1000))],
+        )
+    )
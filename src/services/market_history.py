@@ -0,0 +1,117 @@
+import decimal
+import logging
+import threading
+import time
+import typing
+
+from src import enums
+from src import messages
+
+logger = logging.getLogger(__name__)
+
+
+class MarketHistory(object):
+    """
+    Competitor offers of each market and price decisions of each internal offer
+    remembered between improvement cycles, so that a cycle can tell what moved
+    since the previous one.
+    """
+
+    def __init__(
+            self, provider: enums.OfferProvider, decision_max_age_seconds: float
+    ) -> None:
+        self._decision_max_age_seconds = decision_max_age_seconds
+        self._log_prefix = "[{}-MARKET-HISTORY]".format(provider.name)
+        self._market_offer_prices: typing.Dict[
+            messages.OfferSearchParameters, typing.Dict[str, decimal.Decimal]
+        ] = {}
+        self._offer_price_decisions: typing.Dict[
+            str, messages.OfferPriceDecision
+        ] = {}
+        self._lock = threading.Lock()
+
+    def update_market(
+            self,
+            search_parameters: messages.OfferSearchParameters,
+            offer_prices: typing.Dict[str, decimal.Decimal],
+    ) -> typing.Optional[messages.MarketDiff]:
+        """
+        Remembers competitor offer prices of the market and returns how they
+        changed since the market was last seen, or None if it was not.
+        """
+        with self._lock:
+            previous_offer_prices = self._market_offer_prices.get(search_parameters)
+            self._market_offer_prices[search_parameters] = offer_prices
+
+        if previous_offer_prices is None:
+            return None
+
+        market_diff = messages.MarketDiff(
+            added_offer_ids=frozenset(offer_prices.keys() - previous_offer_prices.keys()),
+            removed_offer_ids=frozenset(
+                previous_offer_prices.keys() - offer_prices.keys()
+            ),
+            repriced_offer_ids=frozenset(
+                offer_id
+                for offer_id in offer_prices.keys() & previous_offer_prices.keys()
+                if offer_prices[offer_id] != previous_offer_prices[offer_id]
+            ),
+        )
+        logger.info(
+            "{} Market changed (offer_type={}, currency={}, conversion_currency={}, offers={}, added={}, removed={}, repriced={}).".format(
+                self._log_prefix,
+                search_parameters.offer_type.name,
+                search_parameters.currency.name,
+                search_parameters.conversion_currency.name,
+                len(offer_prices),
+                len(market_diff.added_offer_ids),
+                len(market_diff.removed_offer_ids),
+                len(market_diff.repriced_offer_ids),
+            )
+        )
+        return market_diff
+
+    def get_listed_offer_price(
+            self, search_parameters: messages.OfferSearchParameters, offer_id: str
+    ) -> typing.Optional[decimal.Decimal]:
+        """
+        Returns price of the offer as last listed in the market, or None if the
+        market was not fetched whole or the offer was not listed in it.
+        """
+        offer_prices = self._market_offer_prices.get(search_parameters)
+        if offer_prices is None:
+            return None
+
+        return offer_prices.get(offer_id)
+
+    def get_offer_price_decision(
+            self, offer_id: str
+    ) -> typing.Optional[messages.OfferPriceDecision]:
+        offer_price_decision = self._offer_price_decisions.get(offer_id)
+        if (
+                not offer_price_decision
+                or time.monotonic() - offer_price_decision.decided_at
+                >= self._decision_max_age_seconds
+        ):
+            return None
+
+        return offer_price_decision
+
+    def set_offer_price_decision(
+            self, offer_id: str, offer_price_decision: messages.OfferPriceDecision
+    ) -> None:
+        with self._lock:
+            self._offer_price_decisions[offer_id] = offer_price_decision
+
+    def discard_offer_price_decision(self, offer_id: str) -> None:
+        with self._lock:
+            self._offer_price_decisions.pop(offer_id, None)
+
+    def discard_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for offer_id, offer_price_decision in list(
+                    self._offer_price_decisions.items()
+            ):
+                if now - offer_price_decision.decided_at >= self._decision_max_age_seconds:
+                    del self._offer_price_decisions[offer_id]
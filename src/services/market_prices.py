@@ -0,0 +1,245 @@
+import decimal
+import logging
+import threading
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common import utils as common_utils
+from src import constants
+from src import enums
+from src import exceptions
+from src.integrations.gateways.cmc import (
+    client as cmc_api_client,
+    exceptions as cmc_api_exceptions,
+)
+from src.services import leases as lease_services
+
+logger = logging.getLogger(__name__)
+_LOG_PREFIX = "[MARKET-PRICES]"
+
+CurrencyPair = typing.Tuple[enums.CryptoCurrency, enums.FiatCurrency]
+
+
+def get_currency_market_price(
+    crypto_currency: enums.CryptoCurrency,
+    convert_to_fiat_currency: enums.FiatCurrency,
+) -> decimal.Decimal:
+    return prefetch_currency_market_prices(
+        currency_pairs=[(crypto_currency, convert_to_fiat_currency)]
+    )[(crypto_currency, convert_to_fiat_currency)]
+
+
+def prefetch_currency_market_prices(
+    currency_pairs: typing.Iterable[CurrencyPair],
+) -> typing.Dict[CurrencyPair, decimal.Decimal]:
+    """
+    Returns market prices of all currency pairs. Stale prices are returned as is
+    and refreshed in background. Only prices missing in cache, or older than
+    max staleness, are fetched before returning, by a single process at a time.
+    """
+    currency_pairs = set(currency_pairs)
+    cache_keys = {
+        currency_pair: _get_cache_key(currency_pair=currency_pair)
+        for currency_pair in currency_pairs
+    }
+    cached_prices = cache.get_many(keys=list(cache_keys.values()))
+
+    now = time.time()
+    market_prices = {}
+    stale_currency_pairs = set()
+    for currency_pair, cache_key in cache_keys.items():
+        cached_price = cached_prices.get(cache_key)
+        if not isinstance(cached_price, dict):
+            continue
+
+        market_prices[currency_pair] = cached_price["price"]
+        if now - cached_price["fetched_at"] > constants.CMC_CURRENCY_MARKET_PRICE_CACHE_TTL:
+            stale_currency_pairs.add(currency_pair)
+
+    if stale_currency_pairs:
+        _refresh_in_background(currency_pairs=stale_currency_pairs)
+
+    missing_currency_pairs = currency_pairs - set(market_prices)
+    if missing_currency_pairs:
+        market_prices.update(_load(currency_pairs=missing_currency_pairs))
+
+    return market_prices
+
+
+def _load(
+    currency_pairs: typing.Set[CurrencyPair],
+) -> typing.Dict[CurrencyPair, decimal.Decimal]:
+    lock_tokens = _acquire_refresh_locks(currency_pairs=currency_pairs)
+    market_prices = {}
+    if lock_tokens:
+        market_prices.update(_refresh(lock_tokens=lock_tokens))
+
+    # Other process is refreshing the rest, wait for its result.
+    waiting_currency_pairs = currency_pairs - set(lock_tokens)
+    deadline = time.monotonic() + constants.CMC_CURRENCY_MARKET_PRICE_REFRESH_WAIT_SECONDS
+    while waiting_currency_pairs and time.monotonic() < deadline:
+        time.sleep(0.1)
+        cached_prices = cache.get_many(
+            keys=[
+                _get_cache_key(currency_pair=currency_pair)
+                for currency_pair in waiting_currency_pairs
+            ]
+        )
+        for currency_pair in list(waiting_currency_pairs):
+            cached_price = cached_prices.get(_get_cache_key(currency_pair=currency_pair))
+            if isinstance(cached_price, dict):
+                market_prices[currency_pair] = cached_price["price"]
+                waiting_currency_pairs.remove(currency_pair)
+
+    unavailable_currency_pairs = currency_pairs - set(market_prices)
+    if unavailable_currency_pairs:
+        msg = "Market prices are not available (currency_pairs={})".format(
+            _format_currency_pairs(currency_pairs=unavailable_currency_pairs)
+        )
+        logger.error("{} {}.".format(_LOG_PREFIX, msg))
+        raise exceptions.CMCMarketPriceUnavailableError(msg)
+
+    return market_prices
+
+
+def _refresh_in_background(currency_pairs: typing.Set[CurrencyPair]) -> None:
+    lock_tokens = _acquire_refresh_locks(currency_pairs=currency_pairs)
+    if not lock_tokens:
+        return
+
+    def _refresh_safely() -> None:
+        try:
+            _refresh(lock_tokens=lock_tokens)
+        except Exception as e:
+            logger.exception(
+                "{} Unable to refresh stale market prices (currency_pairs={}). Error: {}.".format(
+                    _LOG_PREFIX,
+                    _format_currency_pairs(currency_pairs=set(lock_tokens)),
+                    common_utils.get_exception_message(exception=e),
+                )
+            )
+
+    threading.Thread(
+        target=_refresh_safely, name="market-price-refresh", daemon=True
+    ).start()
+
+
+def _refresh(
+    lock_tokens: typing.Dict[CurrencyPair, str],
+) -> typing.Dict[CurrencyPair, decimal.Decimal]:
+    try:
+        market_prices = _fetch_currency_market_prices(currency_pairs=set(lock_tokens))
+        fetched_at = time.time()
+        cache.set_many(
+            data={
+                _get_cache_key(currency_pair=currency_pair): {
+                    "price": market_price,
+                    "fetched_at": fetched_at,
+                }
+                for currency_pair, market_price in market_prices.items()
+            },
+            timeout=settings.CMC_CURRENCY_MARKET_PRICE_MAX_STALENESS_SECONDS,
+        )
+    finally:
+        _release_refresh_locks(lock_tokens=lock_tokens)
+
+    return market_prices
+
+
+def _fetch_currency_market_prices(
+    currency_pairs: typing.Set[CurrencyPair],
+) -> typing.Dict[CurrencyPair, decimal.Decimal]:
+    crypto_currencies = sorted(
+        {crypto_currency for crypto_currency, _ in currency_pairs},
+        key=lambda currency: currency.name,
+    )
+    fiat_currencies = sorted(
+        {fiat_currency for _, fiat_currency in currency_pairs},
+        key=lambda currency: currency.name,
+    )
+    logger.info(
+        "{} Fetching market prices (crypto_currencies={}, fiat_currencies={}).".format(
+            _LOG_PREFIX,
+            [currency.name for currency in crypto_currencies],
+            [currency.name for currency in fiat_currencies],
+        )
+    )
+
+    market_prices = {}
+    chunk_size = settings.COIN_MARKET_CAP_MAX_CONVERTS_PER_REQUEST
+    for chunk_start in range(0, len(fiat_currencies), chunk_size):
+        convert_to = fiat_currencies[chunk_start : chunk_start + chunk_size]
+        try:
+            market_price_response = cmc_api_client.CoinMarketCapClient().get_market_prices(
+                currencies=crypto_currencies, convert_to=convert_to
+            )
+        except cmc_api_exceptions.CoinMarketCapException as e:
+            msg = "Unable to get market prices (crypto_currencies={}, conversion_currencies={}). Error: {}".format(
+                [currency.name for currency in crypto_currencies],
+                [currency.name for currency in convert_to],
+                common_utils.get_exception_message(exception=e),
+            )
+            logger.exception("{} {}.".format(_LOG_PREFIX, msg))
+            raise exceptions.CMCClientError(msg)
+
+        for crypto_currency in crypto_currencies:
+            quotes = market_price_response[crypto_currency.name][0]["quote"]
+            for fiat_currency in convert_to:
+                if (crypto_currency, fiat_currency) in currency_pairs:
+                    market_prices[(crypto_currency, fiat_currency)] = quotes[
+                        fiat_currency.name
+                    ]["price"]
+
+    return market_prices
+
+
+def _acquire_refresh_locks(
+    currency_pairs: typing.Set[CurrencyPair],
+) -> typing.Dict[CurrencyPair, str]:
+    lock_tokens = {}
+    for currency_pair in currency_pairs:
+        lock_token = uuid.uuid4().hex
+        if cache.add(
+            key=_get_refresh_lock_cache_key(currency_pair=currency_pair),
+            value=lock_token,
+            timeout=constants.CMC_CURRENCY_MARKET_PRICE_REFRESH_LOCK_TTL,
+        ):
+            lock_tokens[currency_pair] = lock_token
+
+    return lock_tokens
+
+
+def _release_refresh_locks(lock_tokens: typing.Dict[CurrencyPair, str]) -> None:
+    lease_services.compare_and_delete(
+        values={
+            _get_refresh_lock_cache_key(currency_pair=currency_pair): lock_token
+            for currency_pair, lock_token in lock_tokens.items()
+        }
+    )
+
+
+def _get_cache_key(currency_pair: CurrencyPair) -> str:
+    crypto_currency, fiat_currency = currency_pair
+    return constants.CMC_CURRENCY_MARKET_PRICE_CACHE_KEY.format(
+        crypto_currency=crypto_currency.name,
+        conversion_fiat_currency=fiat_currency.name,
+    )
+
+
+def _get_refresh_lock_cache_key(currency_pair: CurrencyPair) -> str:
+    crypto_currency, fiat_currency = currency_pair
+    return constants.CMC_CURRENCY_MARKET_PRICE_REFRESH_LOCK_CACHE_KEY.format(
+        crypto_currency=crypto_currency.name,
+        conversion_fiat_currency=fiat_currency.name,
+    )
+
+
+def _format_currency_pairs(currency_pairs: typing.Set[CurrencyPair]) -> typing.List[str]:
+    return sorted(
+        "{}-{}".format(crypto_currency.name, fiat_currency.name)
+        for crypto_currency, fiat_currency in currency_pairs
+    )
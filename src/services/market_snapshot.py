@@ -0,0 +1,98 @@
+import decimal
+import logging
+import threading
+import typing
+
+from src import messages
+from src.services import competitor_book as competitor_book_services
+from src.services import market_history as market_history_services
+from src.integrations.providers import base as base_provider
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot(object):
+    """
+    Competitor offers of a single improvement cycle, fetched once per search key
+    and shared between all internal offers searching the same market.
+    """
+
+    def __init__(
+            self,
+            provider_client: base_provider.BaseProvider,
+            market_history: typing.Optional[market_history_services.MarketHistory] = None,
+    ) -> None:
+        self._provider_client = provider_client
+        self._market_history = market_history
+        self._log_prefix = "[{}-MARKET-SNAPSHOT]".format(
+            self._provider_client.provider.name
+        )
+        self._competitor_books: typing.Dict[
+            messages.OfferSearchParameters, competitor_book_services.CompetitorBook
+        ] = {}
+        self._search_locks: typing.Dict[
+            messages.OfferSearchParameters, threading.Lock
+        ] = {}
+        self._lock = threading.Lock()
+        self._fetch_count = 0
+        self._hit_count = 0
+
+    @property
+    def fetch_count(self) -> int:
+        return self._fetch_count
+
+    @property
+    def hit_count(self) -> int:
+        return self._hit_count
+
+    def get_competitor_book(
+            self,
+            search_parameters: messages.OfferSearchParameters,
+            min_price: decimal.Decimal,
+            max_price: decimal.Decimal,
+    ) -> competitor_book_services.CompetitorBook:
+        with self._lock:
+            search_lock = self._search_locks.setdefault(
+                search_parameters, threading.Lock()
+            )
+
+        # Only one worker fetches a market, the others wait for its result.
+        with search_lock:
+            if search_parameters in self._competitor_books:
+                with self._lock:
+                    self._hit_count += 1
+                return self._competitor_books[search_parameters]
+
+            logger.info(
+                "{} Fetching competitor offers (offer_type={}, currency={}, conversion_currency={}, payment_method={}, min_price={}, max_price={}).".format(
+                    self._log_prefix,
+                    search_parameters.offer_type.name,
+                    search_parameters.currency.name,
+                    search_parameters.conversion_currency.name,
+                    search_parameters.payment_method.name
+                    if search_parameters.payment_method
+                    else None,
+                    min_price,
+                    max_price,
+                )
+            )
+            competitor_book = competitor_book_services.CompetitorBook(
+                offers=self._provider_client.iter_all_offers(
+                    offer_type=search_parameters.offer_type,
+                    currency=search_parameters.currency,
+                    conversion_currency=search_parameters.conversion_currency,
+                    payment_method=search_parameters.payment_method,
+                    min_price=min_price,
+                    max_price=max_price,
+                )
+            )
+            with self._lock:
+                self._fetch_count += 1
+            self._competitor_books[search_parameters] = competitor_book
+            if self._market_history:
+                self._market_history.update_market(
+                    search_parameters=search_parameters,
+                    offer_prices=competitor_book.get_offer_prices(),
+                )
+
+        return competitor_book
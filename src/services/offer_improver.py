@@ -1,46 +1,104 @@
+import dataclasses
 import datetime
 import decimal
 import logging
+import threading
+import time
 import typing
+from concurrent import futures
 
+from django import db
 from django.conf import settings
 from django.core import mail
-from django.core.cache import cache
+from django.db import models as django_db_models
+from django.db import transaction
 
+from common import tracing
 from common import utils as common_utils
 from src import constants
 from src import enums
-from src import exceptions
+from src import messages
 from src import models
+from src.services import competitor_book as competitor_book_services
 from src.services import config as config_services
+from src.services import leases as lease_services
+from src.services import market_history as market_history_services
+from src.services import market_prices as market_price_services
+from src.services import market_snapshot as market_snapshot_services
+from src.services import offer_shards as offer_shard_services
+from src.services import offer_states as offer_state_services
 from src.integrations.providers import base as base_provider
 from src.integrations.providers import messages as provider_messages
-from src.integrations.gateways.cmc import (
-    client as cmc_api_client,
-    exceptions as cmc_api_exceptions,
-)
+from src.integrations.gateways import rate_limits as gateway_rate_limits
+from src.integrations.gateways import sessions as gateway_sessions
 
 logger = logging.getLogger(__name__)
 
+_BANK_PAYMENT_METHODS = frozenset(
+    [
+        enums.PaymentMethod.BANK_TRANSFER,
+        enums.PaymentMethod.OTHER_BANK_TRANSFER,
+        enums.PaymentMethod.DOMESTIC_WIRE_TRANSFER,
+    ]
+)
+
 
 class OfferImproverService(object):
-    def __init__(self, provider_client: base_provider.BaseProvider) -> None:
+    def __init__(
+            self,
+            provider_client: base_provider.BaseProvider,
+            max_workers: typing.Optional[int] = None,
+            offer_shard_coordinator: typing.Optional[
+                offer_shard_services.OfferShardCoordinator
+            ] = None,
+    ) -> None:
         self._provider_client = provider_client
+        self._offer_shard_coordinator = offer_shard_coordinator
         self._log_prefix = "[{}-OFFER-SERVICE]".format(
             self._provider_client.provider.name
         )
+        self._max_workers = self._get_max_workers(max_workers=max_workers)
+        self._market_snapshot: typing.Optional[
+            market_snapshot_services.MarketSnapshot
+        ] = None
+        self._pending_improved_offers: typing.Optional[
+            typing.List[messages.ImprovedOffer]
+        ] = None
+        self._pending_price_updates: typing.Optional[
+            typing.List[messages.OfferPriceUpdate]
+        ] = None
+        # Row ids of offers saved in the cycle, cleared when a cycle starts.
+        self._offer_db_ids: typing.Dict[str, int] = {}
+        self._market_prices: typing.Optional[
+            typing.Dict[market_price_services.CurrencyPair, decimal.Decimal]
+        ] = None
+        self._market_history = market_history_services.MarketHistory(
+            provider=self._provider_client.provider,
+            decision_max_age_seconds=settings.OFFER_PRICE_DECISION_MAX_AGE_SECONDS,
+        )
+        self._offer_states = offer_state_services.InternalOfferStates(
+            provider=self._provider_client.provider,
+            reconcile_interval_seconds=settings.OFFER_STATE_RECONCILE_INTERVAL_SECONDS,
+        )
+        self._offer_leases: typing.Dict[str, messages.Lease] = {}
+        self._offer_leases_renewed_at = 0.0
+        self._unchanged_market_skips = 0
+        self._offer_syncs = 0
+        self._offer_lease_skips = 0
+        self._lost_offer_leases = 0
+        self._skipped_cycles = 0
+        self._lock = threading.Lock()
+
+    @property
+    def provider(self) -> enums.OfferProvider:
+        return self._provider_client.provider
 
     def improve_internal_active_offers(self) -> None:
         logger.info(
             "{} Started improving internal active offers.".format(self._log_prefix)
         )
-        internal_active_offers = models.Offer.objects.filter(
-            owner_type=enums.OfferOwnerType.INTERNAL.value,
-            status=enums.OfferStatus.ACTIVE.value,
-            provider=self._provider_client.provider.value,
-        )
-
-        if not internal_active_offers:
+        offer_ids = self.get_internal_active_offer_ids()
+        if not offer_ids:
             logger.info(
                 "{} Not found active internal offers to improve. Exiting.".format(
                     self._log_prefix
@@ -49,57 +107,230 @@ class OfferImproverService(object):
             return
 
         logger.info(
-            "{} Found {} active internal offers to improve.".format(
-                self._log_prefix, internal_active_offers.count()
+            "{} Found {} active internal offers to improve (max_workers={}).".format(
+                self._log_prefix, len(offer_ids), self._max_workers
             )
         )
-        for internal_active_offer in internal_active_offers:
-            try:
-                self.improve_offer(offer_id=internal_active_offer.offer_id)
-            except Exception as e:
-                msg = "Exception occurred while improving offer (offer_id={}). Error: {}".format(
-                    internal_active_offer.offer_id,
-                    common_utils.get_exception_message(exception=e),
-                )
-                logger.exception("{} {}.".format(self._log_prefix, msg))
-                mail.send_mail(
-                    from_email=settings.EMAIL_HOST_USER,
-                    subject="ERROR",
-                    message=msg,
-                    recipient_list=settings.LOGGING_EMAIL_RECIPIENT_LIST,
-                    fail_silently=False,
-                )
-                continue
-
+        self.improve_offers(offer_ids=offer_ids)
         logger.info(
             "{} Finished improving internal active offers.".format(self._log_prefix)
         )
 
+    def get_internal_active_offer_ids(self) -> typing.List[str]:
+        offers = models.Offer.objects.filter(
+            owner_type=enums.OfferOwnerType.INTERNAL.value,
+            status=enums.OfferStatus.ACTIVE.value,
+            provider=self._provider_client.provider.value,
+        )
+        if self._offer_shard_coordinator:
+            return self._get_owned_offer_ids(offers=offers)
+
+        return list(offers.values_list("offer_id", flat=True))
+
+    def improve_offers(
+            self, offer_ids: typing.List[str]
+    ) -> typing.Dict[str, typing.Optional[messages.OfferImprovementResult]]:
+        if self._offer_shard_coordinator:
+            # Shards may have moved to other workers since offers were listed.
+            owned_offer_ids = set(
+                self._get_owned_offer_ids(
+                    offers=models.Offer.objects.filter(
+                        offer_id__in=offer_ids,
+                        provider=self._provider_client.provider.value,
+                    )
+                )
+            )
+            offer_ids = [
+                offer_id for offer_id in offer_ids if offer_id in owned_offer_ids
+            ]
+            # Shard leases already keep other workers away from these offers.
+            return self._improve_offers_in_cycle(offer_ids=offer_ids)
+
+        cycle_lease = self._acquire_lease(
+            cache_key=constants.OFFER_CYCLE_LEASE_CACHE_KEY.format(
+                provider=self._provider_client.provider.name
+            ),
+            timeout=settings.OFFER_CYCLE_LEASE_TTL_SECONDS,
+        )
+        if not cycle_lease:
+            self._skipped_cycles += 1
+            logger.warning(
+                "{} Improvement cycle is running elsewhere, skipping (offers={}, skipped_cycles={}).".format(
+                    self._log_prefix, len(offer_ids), self._skipped_cycles
+                )
+            )
+            return {}
+
+        try:
+            return self._improve_offers_in_cycle(offer_ids=offer_ids)
+        finally:
+            lease_services.release_leases(leases=[cycle_lease])
+
     def improve_offer(
             self,
             offer_id: str,
-    ):
+    ) -> typing.Optional[messages.OfferImprovementResult]:
+        """
+        Improves the offer while holding its lease. Returns None if the offer
+        is leased by another run. Within a cycle the lease is kept until
+        improved offers are saved, otherwise it is released right away.
+        """
+        with tracing.span(
+                "offer_improver.improve_offer",
+                provider=self._provider_client.provider.name,
+                offer_id=offer_id,
+        ) as offer_span:
+            offer_lease = self._acquire_lease(
+                cache_key=constants.OFFER_LEASE_CACHE_KEY.format(
+                    provider=self._provider_client.provider.name, offer_id=offer_id
+                ),
+                timeout=settings.OFFER_LEASE_TTL_SECONDS,
+            )
+            if not offer_lease:
+                with self._lock:
+                    self._offer_lease_skips += 1
+                logger.warning(
+                    "{} Offer (offer_id={}) is being improved elsewhere. Skipping.".format(
+                        self._log_prefix, offer_id
+                    )
+                )
+                offer_span.set_attribute("skipped", True)
+                return None
+
+            with self._lock:
+                self._offer_leases[offer_id] = offer_lease
+                is_in_cycle = self._pending_improved_offers is not None
+
+            try:
+                return self._improve_offer(offer_id=offer_id)
+            finally:
+                if is_in_cycle:
+                    self._renew_offer_leases_if_due()
+                else:
+                    self._release_offer_leases(offer_ids=[offer_id])
+
+    def _improve_offers_in_cycle(
+            self, offer_ids: typing.List[str]
+    ) -> typing.Dict[str, typing.Optional[messages.OfferImprovementResult]]:
+        with tracing.span(
+                "offer_improver.improve_offers",
+                provider=self._provider_client.provider.name,
+                offers=len(offer_ids),
+        ):
+            self._market_snapshot = market_snapshot_services.MarketSnapshot(
+                provider_client=self._provider_client,
+                market_history=self._market_history,
+            )
+            self._market_history.discard_expired()
+            self._offer_states.discard_expired()
+            self._unchanged_market_skips = 0
+            self._offer_syncs = 0
+            self._offer_lease_skips = 0
+            self._lost_offer_leases = 0
+            self._offer_leases_renewed_at = time.monotonic()
+            self._pending_improved_offers = []
+            self._pending_price_updates = []
+            self._offer_db_ids = {}
+            config_services.refresh_currency_offer_config_snapshots()
+            self._market_prices = self._prefetch_currency_market_prices(
+                offer_ids=offer_ids
+            )
+            try:
+                results = self._improve_offers(offer_ids=offer_ids)
+                self._dispatch_price_updates(results=results)
+                return results
+            finally:
+                self._market_prices = None
+                self._pending_price_updates = None
+                self._flush_improved_offers()
+                with self._lock:
+                    offer_ids_to_release = list(self._offer_leases)
+                self._release_offer_leases(offer_ids=offer_ids_to_release)
+                logger.info(
+                    "{} Market snapshot stats (markets_fetched={}, markets_reused={}, unchanged_market_skips={}, offer_syncs={}).".format(
+                        self._log_prefix,
+                        self._market_snapshot.fetch_count,
+                        self._market_snapshot.hit_count,
+                        self._unchanged_market_skips,
+                        self._offer_syncs,
+                    )
+                )
+                self._market_snapshot = None
+                logger.info(
+                    "{} HTTP connection pool stats (stats={}).".format(
+                        self._log_prefix, gateway_sessions.get_pool_stats()
+                    )
+                )
+                logger.info(
+                    "{} Gateway rate limit stats (stats={}).".format(
+                        self._log_prefix, gateway_rate_limits.get_stats()
+                    )
+                )
+                logger.info(
+                    "{} Lease stats (offer_lease_skips={}, lost_offer_leases={}, skipped_cycles={}).".format(
+                        self._log_prefix,
+                        self._offer_lease_skips,
+                        self._lost_offer_leases,
+                        self._skipped_cycles,
+                    )
+                )
+
+    def _improve_offer(self, offer_id: str) -> messages.OfferImprovementResult:
         logger.info(
             "{} Started improving offer (offer_id={}).".format(
                 self._log_prefix, offer_id
             )
         )
-        internal_offer = self._provider_client.get_offer(offer_id=offer_id)
-        competitor_offer = self._get_best_competitor_offer(
-            internal_offer=internal_offer
-        )
+        unchanged_market_result = self._get_unchanged_market_result(offer_id=offer_id)
+        if unchanged_market_result:
+            return unchanged_market_result
+
+        internal_offer = self._offer_states.get_offer(offer_id=offer_id)
+        is_offer_state_cached = internal_offer is not None
+        if not is_offer_state_cached:
+            internal_offer = self._sync_internal_offer(offer_id=offer_id)
+
+        (
+            search_parameters,
+            currency_market_price,
+            competitor_offer,
+        ) = self._search_competitor_offer(internal_offer=internal_offer)
+        if is_offer_state_cached and self._is_offer_listed_at_other_price(
+                internal_offer=internal_offer, search_parameters=search_parameters
+        ):
+            internal_offer = self._sync_internal_offer(offer_id=offer_id)
+            (
+                search_parameters,
+                currency_market_price,
+                competitor_offer,
+            ) = self._search_competitor_offer(internal_offer=internal_offer)
+
         if not competitor_offer:
             logger.error(
                 "{} Competitor offer not found. Exiting.".format(self._log_prefix)
             )
-            return
-
-        offer_price_to_update = competitor_offer.price + decimal.Decimal(
-            config_services.get_currency_offer_config(
-                currency=competitor_offer.currency,
-                config_name="amount_to_increase_offer",
-                offer_provider=self._provider_client.provider,
+            self._set_offer_price_decision(
+                offer_id=offer_id,
+                search_parameters=search_parameters,
+                market_price=currency_market_price,
+                competitor_offer=None,
+                offer_price=internal_offer.price,
             )
+            return messages.OfferImprovementResult(
+                offer_id=offer_id,
+                search_parameters=search_parameters,
+                competitor_offer_price=None,
+                updated_offer_price=None,
+            )
+
+        offer_price_to_update = self._get_offer_price_to_update(
+            competitor_offer=competitor_offer
+        )
+        result = messages.OfferImprovementResult(
+            offer_id=offer_id,
+            search_parameters=search_parameters,
+            competitor_offer_price=competitor_offer.price,
+            updated_offer_price=None,
         )
 
         if internal_offer.price == offer_price_to_update:
@@ -112,7 +343,35 @@ class OfferImproverService(object):
                     competitor_offer.offer_id,
                 )
             )
-            return
+            self._set_offer_price_decision(
+                offer_id=offer_id,
+                search_parameters=search_parameters,
+                market_price=currency_market_price,
+                competitor_offer=competitor_offer,
+                offer_price=offer_price_to_update,
+            )
+            return result
+
+        price_update = messages.OfferPriceUpdate(
+            internal_offer=internal_offer,
+            competitor_offer=competitor_offer,
+            search_parameters=search_parameters,
+            market_price=currency_market_price,
+            price=offer_price_to_update,
+        )
+        with self._lock:
+            if self._pending_price_updates is not None:
+                self._pending_price_updates.append(price_update)
+                logger.info(
+                    "{} Queued update of offer (offer_id={}) with best competitor offer (offer_id={}) with {} {}.".format(
+                        self._log_prefix,
+                        offer_id,
+                        competitor_offer.offer_id,
+                        offer_price_to_update,
+                        internal_offer.conversion_currency.name,
+                    )
+                )
+                return result
 
         logger.info(
             "{} Updating offer (offer_id={}) with best competitor offer (offer_id={}) with {} {}.".format(
@@ -123,177 +382,735 @@ class OfferImproverService(object):
                 internal_offer.conversion_currency.name,
             )
         )
+        if not self._get_held_price_updates(price_updates=[price_update]):
+            self._apply_price_update(price_update=price_update, is_updated=False)
+            return result
+
+        with tracing.span(
+                "provider.update_offer_price",
+                provider=self._provider_client.provider.name,
+                offer_id=offer_id,
+        ):
+            updated_offer = self._provider_client.update_offer_price(
+                offer_id=offer_id, price=offer_price_to_update
+            )
+        if not self._apply_price_update(
+                price_update=price_update, is_updated=bool(updated_offer)
+        ):
+            return result
+
+        return dataclasses.replace(result, updated_offer_price=offer_price_to_update)
+
+    def _improve_offers(
+            self, offer_ids: typing.List[str]
+    ) -> typing.Dict[str, typing.Optional[messages.OfferImprovementResult]]:
+        if self._max_workers == 1:
+            return {
+                offer_id: self._improve_offer_safely(offer_id=offer_id)
+                for offer_id in offer_ids
+            }
+
+        with futures.ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="{}-offer-improver".format(
+                    self._provider_client.provider.name.lower()
+                ),
+        ) as executor:
+            future_to_offer_id = {
+                executor.submit(
+                    tracing.propagate(self._improve_offer_in_thread), offer_id
+                ): offer_id
+                for offer_id in offer_ids
+            }
+            return {
+                future_to_offer_id[future]: future.result()
+                for future in futures.as_completed(future_to_offer_id)
+            }
+
+    def _dispatch_price_updates(
+            self,
+            results: typing.Dict[str, typing.Optional[messages.OfferImprovementResult]],
+    ) -> None:
+        """
+        Updates prices of all offers repriced in the cycle together, and fills
+        the updated prices into their results.
+        """
+        with self._lock:
+            price_updates = self._pending_price_updates
+            self._pending_price_updates = None
+
+        if not price_updates:
+            return
+
+        held_price_updates = self._get_held_price_updates(price_updates=price_updates)
+        for price_update in price_updates:
+            if price_update not in held_price_updates:
+                self._apply_price_update(price_update=price_update, is_updated=False)
+        price_updates = held_price_updates
+        if not price_updates:
+            return
+
+        logger.info(
+            "{} Updating prices of {} offers (max_workers={}).".format(
+                self._log_prefix, len(price_updates), self._max_workers
+            )
+        )
+        try:
+            with tracing.span(
+                    "provider.update_offer_prices",
+                    provider=self._provider_client.provider.name,
+                    offers=len(price_updates),
+            ):
+                update_results = self._provider_client.update_offer_prices(
+                    offer_prices={
+                        price_update.internal_offer.offer_id: price_update.price
+                        for price_update in price_updates
+                    },
+                    max_workers=self._max_workers,
+                )
+        except Exception as e:
+            logger.exception(
+                "{} Unable to update offer prices (offers={}). Error: {}.".format(
+                    self._log_prefix,
+                    len(price_updates),
+                    common_utils.get_exception_message(exception=e),
+                )
+            )
+            update_results = {}
 
-        updated_offer = self._provider_client.update_offer_price(
-            offer_id=offer_id, price=offer_price_to_update
+        for price_update in price_updates:
+            offer_id = price_update.internal_offer.offer_id
+            update_result = update_results.get(offer_id)
+            if update_result and update_result.error is not None:
+                msg = "Exception occurred while updating offer price (offer_id={}, price={}). Error: {}".format(
+                    offer_id, price_update.price, update_result.error
+                )
+                logger.error("{} {}.".format(self._log_prefix, msg))
+                self._send_error_email(offer_id=offer_id, msg=msg)
+            if (
+                    self._apply_price_update(
+                        price_update=price_update,
+                        is_updated=bool(update_result and update_result.is_updated),
+                    )
+                    and results.get(offer_id)
+            ):
+                results[offer_id] = dataclasses.replace(
+                    results[offer_id], updated_offer_price=price_update.price
+                )
+
+    def _get_held_price_updates(
+            self, price_updates: typing.List[messages.OfferPriceUpdate]
+    ) -> typing.List[messages.OfferPriceUpdate]:
+        """
+        Returns updates of offers whose leases are still held, and renews the
+        leases for the rest of the cycle. Leases may have expired and been
+        taken by another run while the cycle was slow.
+        """
+        with self._lock:
+            offer_leases = {
+                price_update.internal_offer.offer_id: self._offer_leases.get(
+                    price_update.internal_offer.offer_id
+                )
+                for price_update in price_updates
+            }
+        held_leases = lease_services.renew_leases(
+            leases=[lease for lease in offer_leases.values() if lease],
+            timeout=settings.OFFER_LEASE_TTL_SECONDS,
         )
-        if not updated_offer:
-            logger.error(
-                "{} Offer (offer_id={}) is not updated successfully. Exiting.".format(
+        held_price_updates = []
+        for price_update in price_updates:
+            offer_id = price_update.internal_offer.offer_id
+            if offer_leases[offer_id] in held_leases:
+                held_price_updates.append(price_update)
+                continue
+
+            with self._lock:
+                self._lost_offer_leases += 1
+            logger.warning(
+                "{} Lost lease of offer (offer_id={}). Skipping price update.".format(
                     self._log_prefix, offer_id
                 )
             )
+
+        return held_price_updates
+
+    def _acquire_lease(
+            self, cache_key: str, timeout: float
+    ) -> typing.Optional[messages.Lease]:
+        return lease_services.acquire_lease(
+            cache_key=cache_key,
+            fencing_token_cache_key=constants.OFFER_LEASE_FENCING_TOKEN_CACHE_KEY.format(
+                provider=self._provider_client.provider.name
+            ),
+            timeout=timeout,
+            get_last_fencing_token=self._get_last_fencing_token,
+        )
+
+    def _get_last_fencing_token(self) -> int:
+        return (
+            models.Offer.objects.filter(
+                provider=self._provider_client.provider.value
+            ).aggregate(
+                fencing_token=django_db_models.Max("fencing_token")
+            )["fencing_token"]
+            or 0
+        )
+
+    def _renew_offer_leases_if_due(self) -> None:
+        """
+        Renews leases of offers improved so far in the cycle once a third of
+        their TTL passed. The leases are held until price updates and offer
+        histories are written at the end of the cycle.
+        """
+        with self._lock:
+            if (
+                    time.monotonic() - self._offer_leases_renewed_at
+                    < settings.OFFER_LEASE_TTL_SECONDS / 3
+            ):
+                return
+
+            self._offer_leases_renewed_at = time.monotonic()
+            offer_leases = list(self._offer_leases.values())
+
+        try:
+            held_leases = lease_services.renew_leases(
+                leases=offer_leases, timeout=settings.OFFER_LEASE_TTL_SECONDS
+            )
+        except Exception as e:
+            # Leases not renewed now are renewed before price updates.
+            logger.warning(
+                "{} Unable to renew offer leases (count={}). Error: {}.".format(
+                    self._log_prefix,
+                    len(offer_leases),
+                    common_utils.get_exception_message(exception=e),
+                )
+            )
             return
 
+        logger.info(
+            "{} Renewed offer leases (renewed={}, lost={}).".format(
+                self._log_prefix, len(held_leases), len(offer_leases) - len(held_leases)
+            )
+        )
+
+    def _release_offer_leases(self, offer_ids: typing.List[str]) -> None:
+        with self._lock:
+            offer_leases = [
+                self._offer_leases.pop(offer_id)
+                for offer_id in offer_ids
+                if offer_id in self._offer_leases
+            ]
+
+        try:
+            lease_services.release_leases(leases=offer_leases)
+        except Exception as e:
+            # Leases not released expire on their own.
+            logger.exception(
+                "{} Unable to release offer leases (count={}). Error: {}.".format(
+                    self._log_prefix,
+                    len(offer_leases),
+                    common_utils.get_exception_message(exception=e),
+                )
+            )
+
+    def _apply_price_update(
+            self, price_update: messages.OfferPriceUpdate, is_updated: bool
+    ) -> bool:
+        internal_offer = price_update.internal_offer
+        if not is_updated:
+            logger.error(
+                "{} Offer (offer_id={}) is not updated successfully. Exiting.".format(
+                    self._log_prefix, internal_offer.offer_id
+                )
+            )
+            self._market_history.discard_offer_price_decision(
+                offer_id=internal_offer.offer_id
+            )
+            self._offer_states.discard_offer(
+                offer_id=internal_offer.offer_id, reason="price update failed"
+            )
+            return False
+
         logger.info(
             "{} Updated offer (offer_id={}) with best competitor offer (offer_id={}) with {} {}.".format(
                 self._log_prefix,
-                offer_id,
-                competitor_offer.offer_id,
-                offer_price_to_update,
+                internal_offer.offer_id,
+                price_update.competitor_offer.offer_id,
+                price_update.price,
                 internal_offer.conversion_currency.name,
             )
         )
+        self._offer_states.set_offer_price(
+            offer_id=internal_offer.offer_id, price=price_update.price
+        )
+        self._set_offer_price_decision(
+            offer_id=internal_offer.offer_id,
+            search_parameters=price_update.search_parameters,
+            market_price=price_update.market_price,
+            competitor_offer=price_update.competitor_offer,
+            offer_price=price_update.price,
+        )
 
         self._post_process_offer(
             internal_offer=internal_offer,
-            competitor_offer=competitor_offer,
-            updated_price=offer_price_to_update,
+            competitor_offer=price_update.competitor_offer,
+            updated_price=price_update.price,
         )
         logger.info(
             "{} Finished improving offer (offer_id={}).".format(
-                self._log_prefix, offer_id
+                self._log_prefix, internal_offer.offer_id
             )
         )
+        return True
 
-    def _get_best_competitor_offer(
-            self,
-            internal_offer: provider_messages.Offer,
-    ) -> typing.Optional[provider_messages.Offer]:
-        currency_market_price = self._get_currency_market_price(
-            crypto_currency=internal_offer.currency,
-            convert_to_fiat_currency=internal_offer.conversion_currency,
-        )
+    def _improve_offer_in_thread(
+            self, offer_id: str
+    ) -> typing.Optional[messages.OfferImprovementResult]:
+        try:
+            return self._improve_offer_safely(offer_id=offer_id)
+        finally:
+            # Worker threads get their own DB connections, close them
+            # the same way Django does at the end of a request.
+            db.close_old_connections()
 
-        competitor_offer_max_price = currency_market_price + currency_market_price * (
-                decimal.Decimal(
-                    config_services.get_currency_offer_config(
-                        # TODO: This has to be extended to be per provider
-                        currency=internal_offer.currency,
-                        config_name="search_price_upper_margin",
-                        offer_provider=self._provider_client.provider,
-                    )
+    def _improve_offer_safely(
+            self, offer_id: str
+    ) -> typing.Optional[messages.OfferImprovementResult]:
+        try:
+            return self.improve_offer(offer_id=offer_id)
+        except Exception as e:
+            msg = "Exception occurred while improving offer (offer_id={}). Error: {}".format(
+                offer_id,
+                common_utils.get_exception_message(exception=e),
+            )
+            logger.exception("{} {}.".format(self._log_prefix, msg))
+            self._send_error_email(offer_id=offer_id, msg=msg)
+
+        return None
+
+    def _send_error_email(self, offer_id: str, msg: str) -> None:
+        try:
+            mail.send_mail(
+                from_email=settings.EMAIL_HOST_USER,
+                subject="ERROR",
+                message=msg,
+                recipient_list=settings.LOGGING_EMAIL_RECIPIENT_LIST,
+                fail_silently=False,
+            )
+        except Exception as e:
+            logger.exception(
+                "{} Unable to send error email (offer_id={}). Error: {}.".format(
+                    self._log_prefix,
+                    offer_id,
+                    common_utils.get_exception_message(exception=e),
                 )
-                / decimal.Decimal("100")
-        )
+            )
 
-        competitor_offer_min_price = currency_market_price - currency_market_price * (
-                decimal.Decimal(
-                    config_services.get_currency_offer_config(
-                        currency=internal_offer.currency,
-                        config_name="search_price_lower_margin",
-                        offer_provider=self._provider_client.provider,
+    def _get_owned_offer_ids(
+            self, offers: db.models.QuerySet
+    ) -> typing.List[str]:
+        owned_shards = self._offer_shard_coordinator.get_owned_shards()
+        offer_ids = []
+        owned_offer_ids = []
+        for (
+                offer_db_id,
+                offer_id,
+                offer_type,
+                currency,
+                conversion_currency,
+        ) in offers.values_list(
+            "id", "offer_id", "offer_type", "currency", "conversion_currency"
+        ):
+            offer_ids.append(offer_id)
+            if (
+                    self._offer_shard_coordinator.get_shard(
+                        offer_db_id=offer_db_id,
+                        offer_type=offer_type,
+                        currency=currency,
+                        conversion_currency=conversion_currency,
                     )
-                )
-                / decimal.Decimal("100")
+                    in owned_shards
+            ):
+                owned_offer_ids.append(offer_id)
+
+        logger.info(
+            "{} Selected offers of owned shards (shards={}, offers={}, owned_offers={}).".format(
+                self._log_prefix, len(owned_shards), len(offer_ids), len(owned_offer_ids)
+            )
+        )
+        return owned_offer_ids
+
+    def _get_max_workers(self, max_workers: typing.Optional[int]) -> int:
+        provider_max_workers = settings.OFFER_IMPROVER_PROVIDER_MAX_WORKERS.get(
+            self._provider_client.provider.name,
+            settings.OFFER_IMPROVER_MAX_WORKERS,
         )
-        competitor_offers = self._provider_client.get_all_offers(
+        return max(
+            1,
+            min(
+                max_workers or settings.OFFER_IMPROVER_MAX_WORKERS,
+                provider_max_workers,
+            ),
+        )
+
+    @staticmethod
+    def _get_search_parameters(
+            internal_offer: provider_messages.Offer,
+    ) -> messages.OfferSearchParameters:
+        return messages.OfferSearchParameters(
             offer_type=internal_offer.type,
             currency=internal_offer.currency,
             conversion_currency=internal_offer.conversion_currency,
             payment_method=internal_offer.payment_method
             if not settings.OFFER_SEARCH_ALL_BANK_PAYMENT_METHODS
             else None,
+        )
+
+    def _sync_internal_offer(self, offer_id: str) -> provider_messages.Offer:
+        with tracing.span(
+                "provider.get_offer",
+                provider=self._provider_client.provider.name,
+                offer_id=offer_id,
+        ):
+            internal_offer = self._provider_client.get_offer(offer_id=offer_id)
+        self._offer_states.set_synced_offer(offer=internal_offer)
+        with self._lock:
+            self._offer_syncs += 1
+        return internal_offer
+
+    def _search_competitor_offer(
+            self, internal_offer: provider_messages.Offer
+    ) -> typing.Tuple[
+        messages.OfferSearchParameters,
+        decimal.Decimal,
+        typing.Optional[provider_messages.Offer],
+    ]:
+        search_parameters = self._get_search_parameters(internal_offer=internal_offer)
+        currency_market_price = self._get_currency_market_price(
+            crypto_currency=internal_offer.currency,
+            convert_to_fiat_currency=internal_offer.conversion_currency,
+        )
+        competitor_offer = self._get_best_competitor_offer(
+            offer_id=internal_offer.offer_id,
+            search_parameters=search_parameters,
+            currency_market_price=currency_market_price,
+        )
+        return search_parameters, currency_market_price, competitor_offer
+
+    def _is_offer_listed_at_other_price(
+            self,
+            internal_offer: provider_messages.Offer,
+            search_parameters: messages.OfferSearchParameters,
+    ) -> bool:
+        """
+        Market is fetched after the offer was last updated, so a listed price
+        other than the cached one means the offer was changed elsewhere.
+        """
+        listed_offer_price = self._market_history.get_listed_offer_price(
+            search_parameters=search_parameters, offer_id=internal_offer.offer_id
+        )
+        if listed_offer_price is None or listed_offer_price == internal_offer.price:
+            return False
+
+        logger.warning(
+            "{} Offer (offer_id={}) is listed at {} instead of cached {}, reconciling.".format(
+                self._log_prefix,
+                internal_offer.offer_id,
+                listed_offer_price,
+                internal_offer.price,
+            )
+        )
+        self._offer_states.discard_offer(
+            offer_id=internal_offer.offer_id, reason="listed price mismatch"
+        )
+        return True
+
+    def _get_unchanged_market_result(
+            self, offer_id: str
+    ) -> typing.Optional[messages.OfferImprovementResult]:
+        """
+        Returns result without repricing when neither the market price nor the
+        best competitor offer moved since the previous decision for the offer,
+        so that the offer is neither fetched nor updated.
+        """
+        if not self._market_snapshot:
+            return None
+
+        offer_price_decision = self._market_history.get_offer_price_decision(
+            offer_id=offer_id
+        )
+        if not offer_price_decision:
+            return None
+
+        search_parameters = offer_price_decision.search_parameters
+        currency_market_price = self._get_currency_market_price(
+            crypto_currency=search_parameters.currency,
+            convert_to_fiat_currency=search_parameters.conversion_currency,
+        )
+        if currency_market_price != offer_price_decision.market_price:
+            return None
+
+        competitor_offer = self._get_best_competitor_offer(
+            offer_id=offer_id,
+            search_parameters=search_parameters,
+            currency_market_price=currency_market_price,
+        )
+        if not competitor_offer:
+            if offer_price_decision.competitor_offer_id is not None:
+                return None
+        elif (
+                competitor_offer.offer_id != offer_price_decision.competitor_offer_id
+                or competitor_offer.price != offer_price_decision.competitor_offer_price
+                or self._get_offer_price_to_update(competitor_offer=competitor_offer)
+                != offer_price_decision.offer_price
+        ):
+            return None
+
+        listed_offer_price = self._market_history.get_listed_offer_price(
+            search_parameters=search_parameters, offer_id=offer_id
+        )
+        if (
+                listed_offer_price is not None
+                and listed_offer_price != offer_price_decision.offer_price
+        ):
+            return None
+
+        logger.info(
+            "{} Market did not move since last decision (offer_id={}, market_price={}, competitor_offer_id={}, offer_price={}). Exiting.".format(
+                self._log_prefix,
+                offer_id,
+                currency_market_price,
+                offer_price_decision.competitor_offer_id,
+                offer_price_decision.offer_price,
+            )
+        )
+        with self._lock:
+            self._unchanged_market_skips += 1
+        return messages.OfferImprovementResult(
+            offer_id=offer_id,
+            search_parameters=search_parameters,
+            competitor_offer_price=offer_price_decision.competitor_offer_price,
+            updated_offer_price=None,
+        )
+
+    def _set_offer_price_decision(
+            self,
+            offer_id: str,
+            search_parameters: messages.OfferSearchParameters,
+            market_price: decimal.Decimal,
+            competitor_offer: typing.Optional[provider_messages.Offer],
+            offer_price: typing.Optional[decimal.Decimal],
+    ) -> None:
+        self._market_history.set_offer_price_decision(
+            offer_id=offer_id,
+            offer_price_decision=messages.OfferPriceDecision(
+                search_parameters=search_parameters,
+                market_price=market_price,
+                competitor_offer_id=competitor_offer.offer_id
+                if competitor_offer
+                else None,
+                competitor_offer_price=competitor_offer.price
+                if competitor_offer
+                else None,
+                offer_price=offer_price,
+                decided_at=time.monotonic(),
+            ),
+        )
+
+    def _get_offer_price_to_update(
+            self, competitor_offer: provider_messages.Offer
+    ) -> decimal.Decimal:
+        return (
+            competitor_offer.price
+            + self._get_currency_offer_config(
+                currency=competitor_offer.currency
+            ).amount_to_increase_offer
+        )
+
+    def _get_best_competitor_offer(
+            self,
+            offer_id: str,
+            search_parameters: messages.OfferSearchParameters,
+            currency_market_price: decimal.Decimal,
+    ) -> typing.Optional[provider_messages.Offer]:
+        with tracing.span(
+                "offer_improver.select_competitor_offer",
+                offer_id=offer_id,
+                **self._get_market_span_attributes(search_parameters=search_parameters),
+        ) as selection_span:
+            competitor_offer = self._select_competitor_offer(
+                offer_id=offer_id,
+                search_parameters=search_parameters,
+                currency_market_price=currency_market_price,
+            )
+            selection_span.set_attribute(
+                "competitor_offer_id",
+                competitor_offer.offer_id if competitor_offer else None,
+            )
+            return competitor_offer
+
+    def _select_competitor_offer(
+            self,
+            offer_id: str,
+            search_parameters: messages.OfferSearchParameters,
+            currency_market_price: decimal.Decimal,
+    ) -> typing.Optional[provider_messages.Offer]:
+        currency_offer_config = self._get_currency_offer_config(
+            currency=search_parameters.currency
+        )
+
+        competitor_offer_max_price = currency_market_price + currency_market_price * (
+                currency_offer_config.search_price_upper_margin / decimal.Decimal("100")
+        )
+
+        competitor_offer_min_price = currency_market_price - currency_market_price * (
+                currency_offer_config.search_price_lower_margin / decimal.Decimal("100")
+        )
+        competitor_book = self._get_competitor_book(
+            search_parameters=search_parameters,
             max_price=competitor_offer_max_price,
             min_price=competitor_offer_min_price,
         )
-        if not competitor_offers:
+        competitor_offer = competitor_book.get_best_offer(
+            market_price=currency_market_price,
+            excluded_offer_id=offer_id,
+            min_owner_last_seen_timestamp=decimal.Decimal(
+                datetime.datetime.now().timestamp()
+            )
+            - currency_offer_config.owner_last_seen_max_time * 60,
+            # TEMPORARY UNTIL CONFIRMED WITH CLIENT
+            payment_methods=_BANK_PAYMENT_METHODS
+            if settings.OFFER_SEARCH_ALL_BANK_PAYMENT_METHODS
+            else None,
+        )
+
+        if not competitor_offer:
             logger.info(
                 "{} No competitor offers found (crypto_currency={}, convert_to_fiat_currency={}, offer_type={}, max_price={}, min_price={}).".format(
                     self._log_prefix,
-                    internal_offer.currency.name,
-                    internal_offer.conversion_currency.name,
-                    internal_offer.type.name,
+                    search_parameters.currency.name,
+                    search_parameters.conversion_currency.name,
+                    search_parameters.offer_type.name,
                     competitor_offer_max_price,
                     competitor_offer_min_price,
                 )
             )
-            return
 
-        relevant_offers_above_market_price = []
-        relevant_offers_below_market_price = []
-        for offer in competitor_offers:
-            if offer.offer_id == internal_offer.offer_id:
-                continue
+        return competitor_offer
 
-            if (
-                    decimal.Decimal(datetime.datetime.now().timestamp())
-                    - offer.owner_last_seen_timestamp
-            ) / 60 > decimal.Decimal(
-                config_services.get_currency_offer_config(
-                    currency=internal_offer.currency,
-                    config_name="owner_last_seen_max_time",
-                    offer_provider=self._provider_client.provider,
-                )
-            ):
-                continue
-
-            # TEMPORARY UNTIL CONFIRMED WITH CLIENT
-            if (
-                    settings.OFFER_SEARCH_ALL_BANK_PAYMENT_METHODS
-                    and offer.payment_method
-                    not in [
-                enums.PaymentMethod.BANK_TRANSFER,
-                enums.PaymentMethod.OTHER_BANK_TRANSFER,
-                enums.PaymentMethod.DOMESTIC_WIRE_TRANSFER,
-            ]
-            ):
-                continue
+    def _get_currency_offer_config(
+            self, currency: enums.CryptoCurrency
+    ) -> messages.CurrencyOfferConfig:
+        with tracing.span(
+                "config.get_currency_offer_config_snapshot",
+                provider=self._provider_client.provider.name,
+                currency=currency.name,
+        ):
+            return config_services.get_currency_offer_config_snapshot(
+                currency=currency, offer_provider=self._provider_client.provider
+            )
 
-            if offer.price > currency_market_price:
-                relevant_offers_above_market_price.append(offer)
-            else:
-                relevant_offers_below_market_price.append(offer)
+    def _get_market_span_attributes(
+            self, search_parameters: messages.OfferSearchParameters
+    ) -> typing.Dict[str, typing.Optional[str]]:
+        return {
+            "provider": self._provider_client.provider.name,
+            "offer_type": search_parameters.offer_type.name,
+            "currency": search_parameters.currency.name,
+            "conversion_currency": search_parameters.conversion_currency.name,
+            "payment_method": search_parameters.payment_method.name
+            if search_parameters.payment_method
+            else None,
+        }
 
-        if relevant_offers_below_market_price:
-            return max(
-                relevant_offers_below_market_price, key=lambda offer: offer.price
+    def _get_competitor_book(
+            self,
+            search_parameters: messages.OfferSearchParameters,
+            min_price: decimal.Decimal,
+            max_price: decimal.Decimal,
+    ) -> competitor_book_services.CompetitorBook:
+        if self._market_snapshot:
+            return self._market_snapshot.get_competitor_book(
+                search_parameters=search_parameters,
+                min_price=min_price,
+                max_price=max_price,
             )
 
-        return min(relevant_offers_above_market_price, key=lambda offer: offer.price)
+        return competitor_book_services.CompetitorBook(
+            offers=self._provider_client.iter_all_offers(
+                offer_type=search_parameters.offer_type,
+                currency=search_parameters.currency,
+                conversion_currency=search_parameters.conversion_currency,
+                payment_method=search_parameters.payment_method,
+                min_price=min_price,
+                max_price=max_price,
+            )
+        )
 
     def _get_currency_market_price(
             self,
             crypto_currency: enums.CryptoCurrency,
             convert_to_fiat_currency: enums.FiatCurrency,
     ) -> decimal.Decimal:
-        market_price = cache.get(
-            key=constants.CMC_CURRENCY_MARKET_PRICE_CACHE_KEY.format(
-                crypto_currency=crypto_currency.name,
-                conversion_fiat_currency=convert_to_fiat_currency.name,
-            ),
-            default=None,
-        )
+        with tracing.span(
+                "market_prices.get_currency_market_price",
+                provider=self._provider_client.provider.name,
+                currency=crypto_currency.name,
+                conversion_currency=convert_to_fiat_currency.name,
+        ) as market_price_span:
+            market_prices = self._market_prices
+            is_prefetched = bool(
+                market_prices
+                and (crypto_currency, convert_to_fiat_currency) in market_prices
+            )
+            market_price_span.set_attribute("prefetched", is_prefetched)
+            if is_prefetched:
+                return market_prices[(crypto_currency, convert_to_fiat_currency)]
 
-        if not market_price:
-            try:
-                market_price_response = (
-                    cmc_api_client.CoinMarketCapClient().get_market_price(
-                        currency=crypto_currency, convert_to=convert_to_fiat_currency
-                    )
+            return market_price_services.get_currency_market_price(
+                crypto_currency=crypto_currency,
+                convert_to_fiat_currency=convert_to_fiat_currency,
+            )
+
+    def _prefetch_currency_market_prices(
+            self, offer_ids: typing.List[str]
+    ) -> typing.Dict[market_price_services.CurrencyPair, decimal.Decimal]:
+        currency_pairs: typing.Set[market_price_services.CurrencyPair] = set()
+        try:
+            # Unknown currencies in DB fail the prefetch only, offers fall back
+            # to looking up their market prices one by one.
+            currency_pairs = {
+                (
+                    enums.CryptoCurrency[currency],
+                    enums.FiatCurrency[conversion_currency],
+                )
+                for currency, conversion_currency in models.Offer.objects.filter(
+                    offer_id__in=offer_ids,
+                    provider=self._provider_client.provider.value,
                 )
-            except cmc_api_exceptions.CoinMarketCapException as e:
-                msg = "Unable to get market price (crypto_currency={}, conversion_currency={}). Error: {}.".format(
-                    crypto_currency.name,
-                    convert_to_fiat_currency.name,
+                .values_list("currency", "conversion_currency")
+                .distinct()
+            }
+            with tracing.span(
+                    "market_prices.prefetch_currency_market_prices",
+                    provider=self._provider_client.provider.name,
+                    currency_pairs=len(currency_pairs),
+            ):
+                return market_price_services.prefetch_currency_market_prices(
+                    currency_pairs=currency_pairs
+                )
+        except Exception as e:
+            logger.exception(
+                "{} Unable to prefetch market prices (currency_pairs={}). Error: {}.".format(
+                    self._log_prefix,
+                    [
+                        "{}-{}".format(crypto_currency.name, fiat_currency.name)
+                        for crypto_currency, fiat_currency in currency_pairs
+                    ],
                     common_utils.get_exception_message(exception=e),
                 )
-                logger.exception("{} {}.".format(self._log_prefix, msg))
-                raise exceptions.CMCClientError(msg)
-
-            market_price = market_price_response[crypto_currency.name][0]["quote"][
-                convert_to_fiat_currency.name
-            ]["price"]
-            cache.set(
-                key=constants.CMC_CURRENCY_MARKET_PRICE_CACHE_KEY.format(
-                    crypto_currency=crypto_currency.name,
-                    conversion_fiat_currency=convert_to_fiat_currency.name,
-                ),
-                value=market_price,
-                timeout=constants.CMC_CURRENCY_MARKET_PRICE_CACHE_TTL,
             )
-
-        return market_price
+            return {}
 
     def _post_process_offer(
             self,
@@ -301,54 +1118,228 @@ class OfferImproverService(object):
             competitor_offer: provider_messages.Offer,
             updated_price: decimal.Decimal,
     ) -> None:
-        logger.info(
-            "{} Started post processing internal offer (offer_id={}).".format(
-                self._log_prefix, internal_offer.offer_id
-            )
+        improved_offer = messages.ImprovedOffer(
+            internal_offer=internal_offer,
+            competitor_offer=competitor_offer,
+            updated_price=updated_price,
         )
+        with self._lock:
+            if self._pending_improved_offers is not None:
+                self._pending_improved_offers.append(improved_offer)
+                logger.info(
+                    "{} Queued post processing of internal offer (offer_id={}).".format(
+                        self._log_prefix, internal_offer.offer_id
+                    )
+                )
+                return
 
-        if not models.Offer.objects.filter(
-                offer_id=competitor_offer.offer_id,
-                provider=self._provider_client.provider.value,
-        ).exists():
-            competitor_offer_db = models.Offer.objects.create(
-                offer_id=competitor_offer.offer_id,
-                owner_type=enums.OfferOwnerType.COMPETITOR.value,
-                owner_type_name=enums.OfferOwnerType.COMPETITOR.name,
-                status=enums.OfferStatus.ACTIVE.value,
-                status_name=enums.OfferStatus.ACTIVE.name,
-                offer_type=competitor_offer.type.value,
-                offer_type_name=competitor_offer.type.name,
-                currency=competitor_offer.currency.name,
-                conversion_currency=competitor_offer.conversion_currency.name,
-                payment_method=competitor_offer.payment_method.value,
-                provider=self._provider_client.provider.value,
-                provider_name=self._provider_client.provider.name,
-            )
-            logger.info(
-                "{} Created competitor offer (id={}).".format(
-                    self._log_prefix,
-                    competitor_offer_db.id,
+        self._save_improved_offers(improved_offers=[improved_offer])
+
+    def _flush_improved_offers(self) -> None:
+        with self._lock:
+            improved_offers = self._pending_improved_offers
+            self._pending_improved_offers = None
+
+        if not improved_offers:
+            return
+
+        if len(improved_offers) > 1:
+            try:
+                self._save_improved_offers(improved_offers=improved_offers)
+                return
+            except Exception as e:
+                logger.exception(
+                    "{} Unable to save improved offers, saving them one by one (count={}). Error: {}.".format(
+                        self._log_prefix,
+                        len(improved_offers),
+                        common_utils.get_exception_message(exception=e),
+                    )
                 )
-            )
 
-        offer_history = models.OfferHistory.objects.create(
-            offer=models.Offer.objects.get(
-                offer_id=internal_offer.offer_id,
-                provider=self._provider_client.provider.value,
-            ),
-            competitor_offer=models.Offer.objects.get(
-                offer_id=competitor_offer.offer_id,
-                provider=self._provider_client.provider.value,
-            ),
-            original_offer_price=internal_offer.price,
-            updated_offer_price=updated_price,
-            competitor_offer_price=competitor_offer.price,
-            provider=self._provider_client.provider.value,
-            provider_name=self._provider_client.provider.name,
+        # One by one, so that a bad offer loses only its own offer history.
+        for improved_offer in improved_offers:
+            try:
+                self._save_improved_offers(improved_offers=[improved_offer])
+            except Exception as e:
+                msg = "Exception occurred while saving improved offer (offer_id={}). Error: {}".format(
+                    improved_offer.internal_offer.offer_id,
+                    common_utils.get_exception_message(exception=e),
+                )
+                logger.exception("{} {}.".format(self._log_prefix, msg))
+                self._send_error_email(
+                    offer_id=improved_offer.internal_offer.offer_id, msg=msg
+                )
+
+    def _save_improved_offers(
+            self, improved_offers: typing.List[messages.ImprovedOffer]
+    ) -> None:
+        """
+        Saves offer histories of improved offers in one transaction. Ids of
+        competitor offers created here are remembered only once it commits,
+        a rolled back row must not be referenced by later histories.
+        """
+        logger.info(
+            "{} Started post processing internal offers (offer_ids={}).".format(
+                self._log_prefix,
+                [
+                    improved_offer.internal_offer.offer_id
+                    for improved_offer in improved_offers
+                ],
+            )
         )
+        with tracing.span(
+                "offer_improver.save_improved_offers",
+                provider=self._provider_client.provider.name,
+                offers=len(improved_offers),
+        ):
+            created_offer_db_ids = {}
+            history_offer_ids = []
+            with transaction.atomic():
+                self._load_offer_db_ids(
+                    offer_ids={
+                        offer_id
+                        for improved_offer in improved_offers
+                        for offer_id in (
+                            improved_offer.internal_offer.offer_id,
+                            improved_offer.competitor_offer.offer_id,
+                        )
+                    }
+                )
+
+                competitor_offers_to_create = {}
+                for improved_offer in improved_offers:
+                    competitor_offer = improved_offer.competitor_offer
+                    if competitor_offer.offer_id not in self._offer_db_ids:
+                        competitor_offers_to_create[competitor_offer.offer_id] = models.Offer(
+                            offer_id=competitor_offer.offer_id,
+                            owner_type=enums.OfferOwnerType.COMPETITOR.value,
+                            owner_type_name=enums.OfferOwnerType.COMPETITOR.name,
+                            status=enums.OfferStatus.ACTIVE.value,
+                            status_name=enums.OfferStatus.ACTIVE.name,
+                            offer_type=competitor_offer.type.value,
+                            offer_type_name=competitor_offer.type.name,
+                            currency=competitor_offer.currency.name,
+                            conversion_currency=competitor_offer.conversion_currency.name,
+                            payment_method=competitor_offer.payment_method.value,
+                            provider=self._provider_client.provider.value,
+                            provider_name=self._provider_client.provider.name,
+                        )
+
+                if competitor_offers_to_create:
+                    with tracing.span(
+                            "db.create_competitor_offers",
+                            provider=self._provider_client.provider.name,
+                            offers=len(competitor_offers_to_create),
+                    ):
+                        competitor_offers_db = models.Offer.objects.bulk_create(
+                            list(competitor_offers_to_create.values())
+                        )
+                    for competitor_offer_db in competitor_offers_db:
+                        created_offer_db_ids[competitor_offer_db.offer_id] = competitor_offer_db.id
+                    logger.info(
+                        "{} Created competitor offers (ids={}).".format(
+                            self._log_prefix,
+                            [
+                                competitor_offer_db.id
+                                for competitor_offer_db in competitor_offers_to_create.values()
+                            ],
+                        )
+                    )
+
+                offer_histories = []
+                for improved_offer in improved_offers:
+                    internal_offer_db_id = self._offer_db_ids.get(
+                        improved_offer.internal_offer.offer_id
+                    )
+                    if not internal_offer_db_id:
+                        logger.error(
+                            "{} Internal offer (offer_id={}) not found in DB. Skipping offer history.".format(
+                                self._log_prefix, improved_offer.internal_offer.offer_id
+                            )
+                        )
+                        continue
+
+                    if not self._fence_offer_write(
+                            offer_id=improved_offer.internal_offer.offer_id,
+                            offer_db_id=internal_offer_db_id,
+                    ):
+                        continue
+
+                    competitor_offer_id = improved_offer.competitor_offer.offer_id
+                    offer_histories.append(
+                        models.OfferHistory(
+                            offer_id=internal_offer_db_id,
+                            competitor_offer_id=created_offer_db_ids.get(
+                                competitor_offer_id
+                            )
+                            or self._offer_db_ids[competitor_offer_id],
+                            original_offer_price=improved_offer.internal_offer.price,
+                            updated_offer_price=improved_offer.updated_price,
+                            competitor_offer_price=improved_offer.competitor_offer.price,
+                            provider=self._provider_client.provider.value,
+                            provider_name=self._provider_client.provider.name,
+                        )
+                    )
+                    history_offer_ids.append(improved_offer.internal_offer.offer_id)
+
+                with tracing.span(
+                        "db.create_offer_histories",
+                        provider=self._provider_client.provider.name,
+                        offer_histories=len(offer_histories),
+                ):
+                    models.OfferHistory.objects.bulk_create(offer_histories)
+
+            self._offer_db_ids.update(created_offer_db_ids)
+
         logger.info(
-            "{} Created offer history (offer_id={}, offer_history_id={}).".format(
-                self._log_prefix, internal_offer.offer_id, offer_history.id
+            "{} Created offer histories (offer_ids={}).".format(
+                self._log_prefix, history_offer_ids
+            )
+        )
+
+    def _fence_offer_write(self, offer_id: str, offer_db_id: int) -> bool:
+        """
+        Records the fencing token of the offer lease on the offer. Returns
+        False if a newer lease already wrote the offer, i.e. this run lost the
+        lease meanwhile.
+        """
+        with self._lock:
+            offer_lease = self._offer_leases.get(offer_id)
+        if not offer_lease:
+            return True
+
+        with tracing.span(
+                "db.fence_offer_write",
+                provider=self._provider_client.provider.name,
+                offer_id=offer_id,
+        ):
+            is_fenced = models.Offer.objects.filter(
+                id=offer_db_id, fencing_token__lte=offer_lease.fencing_token
+            ).update(fencing_token=offer_lease.fencing_token)
+        if is_fenced:
+            return True
+
+        with self._lock:
+            self._lost_offer_leases += 1
+        logger.warning(
+            "{} Offer (offer_id={}) was written with a newer lease (fencing_token={}). Skipping offer history.".format(
+                self._log_prefix, offer_id, offer_lease.fencing_token
             )
         )
+        return False
+
+    def _load_offer_db_ids(self, offer_ids: typing.Set[str]) -> None:
+        unknown_offer_ids = offer_ids - set(self._offer_db_ids)
+        if not unknown_offer_ids:
+            return
+
+        # Latest row wins when an offer id is present more than once.
+        for offer_id, offer_db_id in (
+                models.Offer.objects.filter(
+                    offer_id__in=unknown_offer_ids,
+                    provider=self._provider_client.provider.value,
+                )
+                .order_by("id")
+                .values_list("offer_id", "id")
+        ):
+            self._offer_db_ids[offer_id] = offer_db_id
@@ -0,0 +1,192 @@
+import logging
+import random
+import threading
+import time
+import typing
+
+from django import db
+
+from common import utils as common_utils
+from src.services import offer_improver as offer_improver_services
+from src.services import offer_scheduler as offer_scheduler_services
+
+logger = logging.getLogger(__name__)
+
+
+class OfferImproverDaemon(object):
+    """
+    Runs improvement cycles of a single provider on an interval, keeping the
+    service, its provider client and pooled connections alive between cycles.
+    """
+
+    def __init__(
+            self,
+            offer_improver_service: offer_improver_services.OfferImproverService,
+            interval_seconds: float,
+            jitter_seconds: float,
+            max_backoff_seconds: float,
+            stop_event: typing.Optional[threading.Event] = None,
+            offer_scheduler: typing.Optional[
+                offer_scheduler_services.AdaptiveOfferScheduler
+            ] = None,
+    ) -> None:
+        self._offer_improver_service = offer_improver_service
+        self._offer_scheduler = offer_scheduler
+        self._interval_seconds = interval_seconds
+        self._jitter_seconds = jitter_seconds
+        self._max_backoff_seconds = max_backoff_seconds
+        self._stop_event = stop_event or threading.Event()
+        self._log_prefix = "[{}-OFFER-IMPROVER-DAEMON]".format(
+            self._offer_improver_service.provider.name
+        )
+
+    def run(self) -> None:
+        logger.info(
+            "{} Started daemon (interval_seconds={}, jitter_seconds={}, max_backoff_seconds={}, adaptive={}).".format(
+                self._log_prefix,
+                self._interval_seconds,
+                self._jitter_seconds,
+                self._max_backoff_seconds,
+                bool(self._offer_scheduler),
+            )
+        )
+        if self._offer_scheduler:
+            self._run_scheduled()
+        else:
+            self._run_cycles()
+
+        logger.info("{} Stopped daemon.".format(self._log_prefix))
+
+    def stop(self) -> None:
+        logger.info("{} Stopping daemon.".format(self._log_prefix))
+        self._stop_event.set()
+
+    def _run_cycles(self) -> None:
+        scheduled_at = time.monotonic()
+        consecutive_failures = 0
+        while not self._stop_event.is_set():
+            if self._stop_event.wait(timeout=max(0.0, scheduled_at - time.monotonic())):
+                break
+
+            started_at = time.monotonic()
+            try:
+                self._offer_improver_service.improve_internal_active_offers()
+                consecutive_failures = 0
+            except Exception as e:
+                consecutive_failures += 1
+                logger.exception(
+                    "{} Improvement cycle failed (consecutive_failures={}). Error: {}.".format(
+                        self._log_prefix,
+                        consecutive_failures,
+                        common_utils.get_exception_message(exception=e),
+                    )
+                )
+            finally:
+                db.close_old_connections()
+
+            finished_at = time.monotonic()
+            logger.info(
+                "{} Finished improvement cycle (duration_seconds={:.3f}, start_drift_seconds={:.3f}).".format(
+                    self._log_prefix, finished_at - started_at, started_at - scheduled_at
+                )
+            )
+
+            scheduled_at = started_at + self._get_next_delay(
+                consecutive_failures=consecutive_failures
+            )
+            if scheduled_at < finished_at:
+                logger.warning(
+                    "{} Improvement cycle overran its interval by {:.3f} seconds.".format(
+                        self._log_prefix, finished_at - scheduled_at
+                    )
+                )
+                scheduled_at = finished_at
+
+    def _run_scheduled(self) -> None:
+        """
+        Improves only offers that are due according to the adaptive scheduler.
+        Active offers are re-read from DB once per daemon interval.
+        """
+        offers_synced_at = None
+        consecutive_failures = 0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            due_offer_ids = []
+            try:
+                if (
+                        offers_synced_at is None
+                        or now - offers_synced_at >= self._interval_seconds
+                ):
+                    self._offer_scheduler.sync_offers(
+                        offer_ids=self._offer_improver_service.get_internal_active_offer_ids(),
+                        now=now,
+                    )
+                    offers_synced_at = now
+                    logger.info(
+                        "{} Scheduler stats (stats={}).".format(
+                            self._log_prefix, self._offer_scheduler.get_stats()
+                        )
+                    )
+
+                due_offer_ids = self._offer_scheduler.pop_due_offers(now=now)
+                if due_offer_ids:
+                    started_at = time.monotonic()
+                    results = self._offer_improver_service.improve_offers(
+                        offer_ids=due_offer_ids
+                    )
+                    finished_at = time.monotonic()
+                    for offer_id in due_offer_ids:
+                        self._offer_scheduler.record_result(
+                            offer_id=offer_id,
+                            result=results.get(offer_id),
+                            now=finished_at,
+                        )
+                    logger.info(
+                        "{} Improved due offers (offers={}, duration_seconds={:.3f}).".format(
+                            self._log_prefix,
+                            len(due_offer_ids),
+                            finished_at - started_at,
+                        )
+                    )
+                consecutive_failures = 0
+            except Exception as e:
+                consecutive_failures += 1
+                logger.exception(
+                    "{} Scheduled improvement failed (consecutive_failures={}). Error: {}.".format(
+                        self._log_prefix,
+                        consecutive_failures,
+                        common_utils.get_exception_message(exception=e),
+                    )
+                )
+                for offer_id in due_offer_ids:
+                    self._offer_scheduler.record_result(
+                        offer_id=offer_id, result=None, now=time.monotonic()
+                    )
+                self._stop_event.wait(
+                    timeout=self._get_next_delay(
+                        consecutive_failures=consecutive_failures
+                    )
+                )
+                continue
+            finally:
+                db.close_old_connections()
+
+            now = time.monotonic()
+            timeout = self._interval_seconds - (now - offers_synced_at)
+            seconds_until_next_due = self._offer_scheduler.seconds_until_next_due(
+                now=now
+            )
+            if seconds_until_next_due is not None:
+                timeout = min(timeout, seconds_until_next_due)
+
+            self._stop_event.wait(timeout=max(0.0, timeout))
+
+    def _get_next_delay(self, consecutive_failures: int) -> float:
+        delay = self._interval_seconds
+        if consecutive_failures:
+            delay = min(
+                self._interval_seconds * 2 ** consecutive_failures,
+                self._max_backoff_seconds,
+            )
+
+        return delay + random.uniform(0, self._jitter_seconds)
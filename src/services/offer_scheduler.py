@@ -0,0 +1,186 @@
+import dataclasses
+import decimal
+import heapq
+import itertools
+import logging
+import typing
+
+from src import enums
+from src import messages
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class MarketSchedule:
+    interval_seconds: float
+    best_competitor_price: typing.Optional[decimal.Decimal] = None
+    adjusted_at: typing.Optional[float] = None
+
+
+class AdaptiveOfferScheduler(object):
+    """
+    Priority queue of internal offers keyed by next due time. Offers of a market
+    whose best competitor price moved are rescheduled sooner, offers of quiet
+    markets later, within [min_interval_seconds, max_interval_seconds].
+    """
+
+    def __init__(
+            self,
+            provider: enums.OfferProvider,
+            initial_interval_seconds: float,
+            min_interval_seconds: float,
+            max_interval_seconds: float,
+            decrease_factor: float,
+            increase_factor: float,
+    ) -> None:
+        self._initial_interval_seconds = initial_interval_seconds
+        self._min_interval_seconds = min_interval_seconds
+        self._max_interval_seconds = max_interval_seconds
+        self._decrease_factor = decrease_factor
+        self._increase_factor = increase_factor
+        self._log_prefix = "[{}-OFFER-SCHEDULER]".format(provider.name)
+
+        self._queue: typing.List[typing.Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        # Latest queue entry per offer, older entries are skipped when popped.
+        self._offer_entries: typing.Dict[str, int] = {}
+        self._offer_markets: typing.Dict[str, messages.OfferSearchParameters] = {}
+        self._markets: typing.Dict[messages.OfferSearchParameters, MarketSchedule] = {}
+
+    def sync_offers(self, offer_ids: typing.Iterable[str], now: float) -> None:
+        offer_ids = set(offer_ids)
+        for offer_id in offer_ids - set(self._offer_entries):
+            self._schedule(offer_id=offer_id, due_at=now)
+            logger.info(
+                "{} Scheduled new offer (offer_id={}).".format(self._log_prefix, offer_id)
+            )
+
+        for offer_id in set(self._offer_entries) - offer_ids:
+            del self._offer_entries[offer_id]
+            self._offer_markets.pop(offer_id, None)
+            logger.info(
+                "{} Unscheduled offer (offer_id={}).".format(self._log_prefix, offer_id)
+            )
+
+    def pop_due_offers(self, now: float) -> typing.List[str]:
+        due_offer_ids = []
+        while self._queue and self._queue[0][0] <= now:
+            _, entry, offer_id = heapq.heappop(self._queue)
+            if self._offer_entries.get(offer_id) != entry:
+                continue
+
+            due_offer_ids.append(offer_id)
+
+        return due_offer_ids
+
+    def seconds_until_next_due(self, now: float) -> typing.Optional[float]:
+        while self._queue:
+            due_at, entry, offer_id = self._queue[0]
+            if self._offer_entries.get(offer_id) == entry:
+                return max(0.0, due_at - now)
+
+            heapq.heappop(self._queue)
+
+        return None
+
+    def record_result(
+            self,
+            offer_id: str,
+            result: typing.Optional[messages.OfferImprovementResult],
+            now: float,
+    ) -> None:
+        if offer_id not in self._offer_entries:
+            return
+
+        if result:
+            self._offer_markets[offer_id] = result.search_parameters
+            market_schedule = self._adjust_market_schedule(
+                search_parameters=result.search_parameters,
+                best_competitor_price=result.competitor_offer_price,
+                now=now,
+            )
+            interval_seconds = market_schedule.interval_seconds
+        elif offer_id in self._offer_markets:
+            interval_seconds = self._markets[
+                self._offer_markets[offer_id]
+            ].interval_seconds
+        else:
+            interval_seconds = self._initial_interval_seconds
+
+        self._schedule(offer_id=offer_id, due_at=now + interval_seconds)
+
+    def get_stats(self) -> typing.Dict:
+        return {
+            "scheduled_offers": len(self._offer_entries),
+            "market_intervals_seconds": {
+                self._format_market(search_parameters=search_parameters): round(
+                    market_schedule.interval_seconds, 3
+                )
+                for search_parameters, market_schedule in self._markets.items()
+            },
+        }
+
+    def _adjust_market_schedule(
+            self,
+            search_parameters: messages.OfferSearchParameters,
+            best_competitor_price: typing.Optional[decimal.Decimal],
+            now: float,
+    ) -> MarketSchedule:
+        market_schedule = self._markets.get(search_parameters)
+        if not market_schedule:
+            market_schedule = MarketSchedule(
+                interval_seconds=self._initial_interval_seconds,
+                best_competitor_price=best_competitor_price,
+                adjusted_at=now,
+            )
+            self._markets[search_parameters] = market_schedule
+            return market_schedule
+
+        previous_interval_seconds = market_schedule.interval_seconds
+        if best_competitor_price != market_schedule.best_competitor_price:
+            decision = "price_changed"
+            market_schedule.interval_seconds = max(
+                self._min_interval_seconds,
+                market_schedule.interval_seconds * self._decrease_factor,
+            )
+        elif now - market_schedule.adjusted_at >= market_schedule.interval_seconds:
+            # Offers of one market are usually evaluated together, lengthen
+            # the interval once per interval rather than once per offer.
+            decision = "price_unchanged"
+            market_schedule.interval_seconds = min(
+                self._max_interval_seconds,
+                market_schedule.interval_seconds * self._increase_factor,
+            )
+        else:
+            return market_schedule
+
+        market_schedule.best_competitor_price = best_competitor_price
+        market_schedule.adjusted_at = now
+        logger.info(
+            "{} Adjusted market interval (market={}, decision={}, best_competitor_price={}, interval_seconds={:.3f}->{:.3f}).".format(
+                self._log_prefix,
+                self._format_market(search_parameters=search_parameters),
+                decision,
+                best_competitor_price,
+                previous_interval_seconds,
+                market_schedule.interval_seconds,
+            )
+        )
+        return market_schedule
+
+    def _schedule(self, offer_id: str, due_at: float) -> None:
+        entry = next(self._counter)
+        self._offer_entries[offer_id] = entry
+        heapq.heappush(self._queue, (due_at, entry, offer_id))
+
+    @staticmethod
+    def _format_market(search_parameters: messages.OfferSearchParameters) -> str:
+        return "{}-{}-{}-{}".format(
+            search_parameters.offer_type.name,
+            search_parameters.currency.name,
+            search_parameters.conversion_currency.name,
+            search_parameters.payment_method.name
+            if search_parameters.payment_method
+            else "ALL",
+        )
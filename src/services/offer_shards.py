@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import typing
+import uuid
+
+from django.core.cache import cache
+
+from common import utils as common_utils
+from src import constants
+from src import enums
+from src import exceptions
+from src.services import leases as lease_services
+
+logger = logging.getLogger(__name__)
+
+
+class OfferShardCoordinator(object):
+    """
+    Coordinates internal offers of a provider between improver workers, in one
+    or many processes and hosts. Offers are split into virtual shards by market
+    or by offer. Every live worker holds a slot, and each shard is assigned to
+    the slot with the highest hash of the pair (rendezvous hashing), so a worker
+    joining or leaving only moves its own shards. A worker improves a shard
+    only while holding its lease, so no offer is repriced by two workers at
+    once. Leases are renewed by a heartbeat thread and expire with a dead
+    worker, after which the shards are taken over by the workers they are
+    assigned to.
+    """
+
+    def __init__(
+            self,
+            provider: enums.OfferProvider,
+            shard_count: int,
+            shard_key: enums.OfferShardKey,
+            max_workers: int,
+            lease_ttl_seconds: float,
+            heartbeat_interval_seconds: float,
+    ) -> None:
+        self._provider = provider
+        self._shard_count = shard_count
+        self._shard_key = shard_key
+        self._max_workers = max_workers
+        self._lease_ttl_seconds = lease_ttl_seconds
+        self._heartbeat_interval_seconds = heartbeat_interval_seconds
+        self._worker_id = "{}:{}:{}".format(
+            socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8]
+        )
+        self._log_prefix = "[{}-OFFER-SHARDS]".format(provider.name)
+        self._slot: typing.Optional[int] = None
+        self._assigned_shards: typing.FrozenSet[int] = frozenset()
+        self._leased_shards: typing.Set[int] = set()
+        self._stop_event = threading.Event()
+        self._heartbeat_thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def shard_key(self) -> enums.OfferShardKey:
+        return self._shard_key
+
+    def start(self) -> None:
+        self._heartbeat()
+        self._heartbeat_thread = threading.Thread(
+            target=self._run_heartbeats,
+            name="{}-offer-shards".format(self._provider.name.lower()),
+            daemon=True,
+        )
+        self._heartbeat_thread.start()
+        logger.info(
+            "{} Started worker (worker_id={}, slot={}, shards={}).".format(
+                self._log_prefix,
+                self._worker_id,
+                self._slot,
+                sorted(self._leased_shards),
+            )
+        )
+
+    def stop(self) -> None:
+        """
+        Releases all leases and the slot, so that other workers take over the
+        shards without waiting for leases to expire.
+        """
+        self._stop_event.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join()
+
+        with self._lock:
+            for shard in self._leased_shards:
+                self._release(cache_key=self._get_lease_cache_key(shard=shard))
+            self._leased_shards.clear()
+
+        if self._slot is not None:
+            self._release(cache_key=self._get_slot_cache_key(slot=self._slot))
+            self._slot = None
+
+        logger.info(
+            "{} Stopped worker (worker_id={}).".format(self._log_prefix, self._worker_id)
+        )
+
+    def get_owned_shards(self) -> typing.FrozenSet[int]:
+        """
+        Returns shards this worker may improve now. Must be called between
+        improvement cycles: leases of shards reassigned to other workers are
+        only released here, so that they are not released mid cycle.
+        """
+        with self._lock:
+            for shard in self._leased_shards - self._assigned_shards:
+                self._release(cache_key=self._get_lease_cache_key(shard=shard))
+                self._leased_shards.discard(shard)
+                logger.info(
+                    "{} Released reassigned shard (shard={}).".format(
+                        self._log_prefix, shard
+                    )
+                )
+
+            return frozenset(self._leased_shards & self._assigned_shards)
+
+    def get_shard(
+            self,
+            offer_db_id: int,
+            offer_type: str,
+            currency: str,
+            conversion_currency: str,
+    ) -> int:
+        if self._shard_key == enums.OfferShardKey.OFFER:
+            key = str(offer_db_id)
+        else:
+            key = "{}:{}:{}".format(offer_type, currency, conversion_currency)
+
+        return _hash(value=key) % self._shard_count
+
+    def _run_heartbeats(self) -> None:
+        while not self._stop_event.wait(timeout=self._heartbeat_interval_seconds):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                logger.exception(
+                    "{} Heartbeat failed (worker_id={}). Error: {}.".format(
+                        self._log_prefix,
+                        self._worker_id,
+                        common_utils.get_exception_message(exception=e),
+                    )
+                )
+
+    def _heartbeat(self) -> None:
+        if self._slot is None or not self._renew(
+                cache_key=self._get_slot_cache_key(slot=self._slot)
+        ):
+            self._slot = self._claim_slot()
+
+        slot_cache_keys = [
+            self._get_slot_cache_key(slot=slot) for slot in range(self._max_workers)
+        ]
+        live_slot_cache_keys = cache.get_many(keys=slot_cache_keys)
+        live_slots = [
+            slot
+            for slot, slot_cache_key in enumerate(slot_cache_keys)
+            if slot_cache_key in live_slot_cache_keys
+        ]
+        if self._slot not in live_slots:
+            live_slots.append(self._slot)
+
+        assigned_shards = frozenset(
+            shard
+            for shard in range(self._shard_count)
+            if _get_shard_slot(shard=shard, slots=live_slots) == self._slot
+        )
+
+        with self._lock:
+            self._assigned_shards = assigned_shards
+            for shard in list(self._leased_shards):
+                if not self._renew(cache_key=self._get_lease_cache_key(shard=shard)):
+                    self._leased_shards.discard(shard)
+                    logger.warning(
+                        "{} Lost shard lease (shard={}).".format(self._log_prefix, shard)
+                    )
+
+            acquired_shards = []
+            for shard in assigned_shards - self._leased_shards:
+                if cache.add(
+                        key=self._get_lease_cache_key(shard=shard),
+                        value=self._worker_id,
+                        timeout=self._lease_ttl_seconds,
+                ):
+                    self._leased_shards.add(shard)
+                    acquired_shards.append(shard)
+
+        if acquired_shards:
+            logger.info(
+                "{} Acquired shards (live_workers={}, assigned={}, acquired={}).".format(
+                    self._log_prefix,
+                    len(live_slots),
+                    len(assigned_shards),
+                    sorted(acquired_shards),
+                )
+            )
+
+    def _claim_slot(self) -> int:
+        for slot in range(self._max_workers):
+            if cache.add(
+                    key=self._get_slot_cache_key(slot=slot),
+                    value=self._worker_id,
+                    timeout=self._lease_ttl_seconds,
+            ):
+                return slot
+
+        msg = "All {} worker slots are taken (provider={})".format(
+            self._max_workers, self._provider.name
+        )
+        logger.error("{} {}.".format(self._log_prefix, msg))
+        raise exceptions.OfferShardWorkerLimitError(msg)
+
+    def _renew(self, cache_key: str) -> bool:
+        return lease_services.compare_and_touch(
+            cache_key=cache_key, value=self._worker_id, timeout=self._lease_ttl_seconds
+        )
+
+    def _release(self, cache_key: str) -> None:
+        lease_services.compare_and_delete(values={cache_key: self._worker_id})
+
+    def _get_slot_cache_key(self, slot: int) -> str:
+        return constants.OFFER_SHARD_WORKER_SLOT_CACHE_KEY.format(
+            provider=self._provider.name, slot=slot
+        )
+
+    def _get_lease_cache_key(self, shard: int) -> str:
+        return constants.OFFER_SHARD_LEASE_CACHE_KEY.format(
+            provider=self._provider.name, shard=shard
+        )
+
+
+def _get_shard_slot(shard: int, slots: typing.List[int]) -> int:
+    return max(slots, key=lambda slot: _hash(value="{}:{}".format(slot, shard)))
+
+
+def _hash(value: str) -> int:
+    # Built-in hash is salted per process, workers must agree on shards.
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
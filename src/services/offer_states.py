@@ -0,0 +1,77 @@
+import dataclasses
+import decimal
+import logging
+import threading
+import time
+import typing
+
+from src import enums
+from src import messages
+from src.integrations.providers import messages as provider_messages
+
+logger = logging.getLogger(__name__)
+
+
+class InternalOfferStates(object):
+    """
+    Internal offers as last fetched from provider, with prices updated by the
+    improver applied on top, so that offers are fetched only to reconcile the
+    state periodically or after it is found not to match the provider.
+    """
+
+    def __init__(
+            self, provider: enums.OfferProvider, reconcile_interval_seconds: float
+    ) -> None:
+        self._reconcile_interval_seconds = reconcile_interval_seconds
+        self._log_prefix = "[{}-OFFER-STATES]".format(provider.name)
+        self._offer_states: typing.Dict[str, messages.InternalOfferState] = {}
+        self._lock = threading.Lock()
+
+    def get_offer(self, offer_id: str) -> typing.Optional[provider_messages.Offer]:
+        """
+        Returns the offer, or None if it is unknown or due for reconciliation.
+        """
+        offer_state = self._offer_states.get(offer_id)
+        if (
+                not offer_state
+                or time.monotonic() - offer_state.synced_at
+                >= self._reconcile_interval_seconds
+        ):
+            return None
+
+        return offer_state.offer
+
+    def set_synced_offer(self, offer: provider_messages.Offer) -> None:
+        with self._lock:
+            self._offer_states[offer.offer_id] = messages.InternalOfferState(
+                offer=offer, synced_at=time.monotonic()
+            )
+
+    def set_offer_price(self, offer_id: str, price: decimal.Decimal) -> None:
+        # Sync time is kept, a price we set ourselves does not reconcile the offer.
+        with self._lock:
+            offer_state = self._offer_states.get(offer_id)
+            if not offer_state:
+                return
+
+            self._offer_states[offer_id] = dataclasses.replace(
+                offer_state, offer=dataclasses.replace(offer_state.offer, price=price)
+            )
+
+    def discard_offer(self, offer_id: str, reason: str) -> None:
+        with self._lock:
+            offer_state = self._offer_states.pop(offer_id, None)
+
+        if offer_state:
+            logger.info(
+                "{} Discarded offer state (offer_id={}, reason={}).".format(
+                    self._log_prefix, offer_id, reason
+                )
+            )
+
+    def discard_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for offer_id, offer_state in list(self._offer_states.items()):
+                if now - offer_state.synced_at >= self._reconcile_interval_seconds:
+                    del self._offer_states[offer_id]
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+import typing
+
+from django import db
+
+from common import utils as common_utils
+from src import enums
+
+logger = logging.getLogger(__name__)
+
+
+def run_for_providers(
+        providers: typing.Sequence[enums.OfferProvider],
+        run: typing.Callable[[enums.OfferProvider], None],
+        log_prefix: str,
+) -> typing.Dict[enums.OfferProvider, bool]:
+    """
+    Runs `run` for every provider concurrently, each in its own thread, so that
+    a slow or failing provider neither delays nor stops the others. Providers
+    share process wide caches, e.g. market prices and currency configs.
+    Returns whether the run of each provider finished without exception.
+    """
+    if len(providers) == 1:
+        return {
+            providers[0]: _run_safely(
+                run=run, provider=providers[0], log_prefix=log_prefix
+            )
+        }
+
+    results = {}
+
+    def _run_in_thread(provider: enums.OfferProvider) -> None:
+        try:
+            results[provider] = _run_safely(
+                run=run, provider=provider, log_prefix=log_prefix
+            )
+        finally:
+            # Each thread has its own DB connections, nobody else closes them.
+            db.connections.close_all()
+
+    threads = [
+        threading.Thread(
+            target=_run_in_thread,
+            args=(provider,),
+            name="{}-provider-runner".format(provider.name.lower()),
+        )
+        for provider in providers
+    ]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def _run_safely(
+        run: typing.Callable[[enums.OfferProvider], None],
+        provider: enums.OfferProvider,
+        log_prefix: str,
+) -> bool:
+    started_at = time.monotonic()
+    try:
+        run(provider)
+    except Exception as e:
+        logger.exception(
+            "{} Run failed (provider={}, duration_seconds={:.3f}). Error: {}.".format(
+                log_prefix,
+                provider.name,
+                time.monotonic() - started_at,
+                common_utils.get_exception_message(exception=e),
+            )
+        )
+        return False
+
+    logger.info(
+        "{} Run finished (provider={}, duration_seconds={:.3f}).".format(
+            log_prefix, provider.name, time.monotonic() - started_at
+        )
+    )
+    return True
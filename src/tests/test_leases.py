@@ -0,0 +1,195 @@
+from unittest import mock
+
+from django import test
+from django.conf import settings
+from django.core.cache import cache
+
+from src import constants
+from src import enums
+from src import messages
+from src import models
+from src.services import leases as lease_services
+from src.services import offer_improver as offer_improver_services
+from src.tests import utils as test_utils
+
+_LEASE_CACHE_KEY = "test_lease"
+_FENCING_TOKEN_CACHE_KEY = "test_lease_fencing_token"
+
+
+@test.override_settings(CACHES=test_utils.LOCMEM_CACHES)
+class LeaseServicesTestCase(test.SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_acquire_lease_is_exclusive(self) -> None:
+        lease = self._acquire_lease()
+
+        self.assertEqual(lease, messages.Lease(_LEASE_CACHE_KEY, 1))
+        self.assertIsNone(self._acquire_lease())
+        self.assertEqual(lease_services.get_held_leases(leases=[lease]), [lease])
+
+    def test_acquire_lease_restarts_fencing_tokens_from_last_token(self) -> None:
+        lease = self._acquire_lease(get_last_fencing_token=lambda: 41)
+
+        self.assertEqual(lease.fencing_token, 42)
+
+    def test_expired_lease_is_taken_over_with_greater_fencing_token(self) -> None:
+        lease = self._acquire_lease()
+        # Lease expires.
+        cache.delete(key=_LEASE_CACHE_KEY)
+
+        new_lease = self._acquire_lease()
+
+        self.assertGreater(new_lease.fencing_token, lease.fencing_token)
+        self.assertEqual(lease_services.get_held_leases(leases=[lease]), [])
+        self.assertEqual(
+            lease_services.get_held_leases(leases=[lease, new_lease]), [new_lease]
+        )
+
+    def test_release_leases_keeps_taken_over_lease(self) -> None:
+        lease = self._acquire_lease()
+        cache.delete(key=_LEASE_CACHE_KEY)
+        new_lease = self._acquire_lease()
+
+        lease_services.release_leases(leases=[lease])
+
+        self.assertEqual(
+            lease_services.get_held_leases(leases=[new_lease]), [new_lease]
+        )
+
+        lease_services.release_leases(leases=[new_lease])
+
+        self.assertIsNone(cache.get(key=_LEASE_CACHE_KEY))
+
+    def test_renew_leases_renews_held_leases_only(self) -> None:
+        lease = self._acquire_lease()
+        cache.delete(key=_LEASE_CACHE_KEY)
+        new_lease = self._acquire_lease()
+
+        renewed_leases = lease_services.renew_leases(
+            leases=[lease, new_lease], timeout=60
+        )
+
+        self.assertEqual(renewed_leases, [new_lease])
+
+    def test_compare_and_touch_renews_held_value_only(self) -> None:
+        cache.set(key=_LEASE_CACHE_KEY, value="worker", timeout=60)
+
+        self.assertFalse(
+            lease_services.compare_and_touch(
+                cache_key=_LEASE_CACHE_KEY, value="other-worker", timeout=60
+            )
+        )
+        self.assertTrue(
+            lease_services.compare_and_touch(
+                cache_key=_LEASE_CACHE_KEY, value="worker", timeout=60
+            )
+        )
+
+    def _acquire_lease(self, get_last_fencing_token=None) -> messages.Lease:
+        return lease_services.acquire_lease(
+            cache_key=_LEASE_CACHE_KEY,
+            fencing_token_cache_key=_FENCING_TOKEN_CACHE_KEY,
+            timeout=60,
+            get_last_fencing_token=get_last_fencing_token,
+        )
+
+
+@test.override_settings(CACHES=test_utils.LOCMEM_CACHES)
+class OfferImproverLeaseTestCase(test.TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.offer_improver = offer_improver_services.OfferImproverService(
+            provider_client=test_utils.StubProvider(), max_workers=1
+        )
+        self.offer = models.Offer.objects.create(
+            offer_id="internal",
+            owner_type=enums.OfferOwnerType.INTERNAL.value,
+            owner_type_name=enums.OfferOwnerType.INTERNAL.name,
+            status=enums.OfferStatus.ACTIVE.value,
+            status_name=enums.OfferStatus.ACTIVE.name,
+            offer_type=enums.OfferType.SELL.value,
+            offer_type_name=enums.OfferType.SELL.name,
+            currency=enums.CryptoCurrency.BTC.value,
+            conversion_currency=enums.FiatCurrency.USD.value,
+            payment_method=enums.PaymentMethod.BANK_TRANSFER.value,
+            provider=enums.OfferProvider.NOONES.value,
+            provider_name=enums.OfferProvider.NOONES.name,
+            fencing_token=10,
+        )
+
+    def test_fence_offer_write_rejects_older_fencing_token(self) -> None:
+        self._set_offer_lease(offer_id="internal", fencing_token=9)
+
+        is_fenced = self.offer_improver._fence_offer_write(
+            offer_id="internal", offer_db_id=self.offer.id
+        )
+
+        self.assertFalse(is_fenced)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.fencing_token, 10)
+        self.assertEqual(self.offer_improver._lost_offer_leases, 1)
+
+    def test_fence_offer_write_records_newer_fencing_token(self) -> None:
+        self._set_offer_lease(offer_id="internal", fencing_token=11)
+
+        is_fenced = self.offer_improver._fence_offer_write(
+            offer_id="internal", offer_db_id=self.offer.id
+        )
+
+        self.assertTrue(is_fenced)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.fencing_token, 11)
+
+    def test_get_held_price_updates_skips_lost_leases(self) -> None:
+        held_lease = self.offer_improver._acquire_lease(
+            cache_key=self._get_offer_lease_cache_key(offer_id="held"), timeout=60
+        )
+        lost_lease = self.offer_improver._acquire_lease(
+            cache_key=self._get_offer_lease_cache_key(offer_id="lost"), timeout=60
+        )
+        self.offer_improver._offer_leases = {"held": held_lease, "lost": lost_lease}
+        # Lease expires and is taken over by another run.
+        cache.delete(key=lost_lease.cache_key)
+        self.offer_improver._acquire_lease(cache_key=lost_lease.cache_key, timeout=60)
+        price_updates = [
+            test_utils.get_price_update(offer_id="held"),
+            test_utils.get_price_update(offer_id="lost"),
+        ]
+
+        held_price_updates = self.offer_improver._get_held_price_updates(
+            price_updates=price_updates
+        )
+
+        self.assertEqual(held_price_updates, price_updates[:1])
+        self.assertEqual(self.offer_improver._lost_offer_leases, 1)
+
+    def test_offer_leases_are_renewed_during_cycle(self) -> None:
+        offer_lease = self.offer_improver._acquire_lease(
+            cache_key=self._get_offer_lease_cache_key(offer_id="internal"), timeout=1
+        )
+        self.offer_improver._offer_leases = {"internal": offer_lease}
+
+        with mock.patch.object(lease_services, "renew_leases") as renew_leases:
+            self.offer_improver._renew_offer_leases_if_due()
+
+        renew_leases.assert_called_once_with(
+            leases=[offer_lease], timeout=settings.OFFER_LEASE_TTL_SECONDS
+        )
+
+        with mock.patch.object(lease_services, "renew_leases") as renew_leases:
+            self.offer_improver._renew_offer_leases_if_due()
+
+        # Renewed again only after a third of the TTL.
+        renew_leases.assert_not_called()
+
+    def _set_offer_lease(self, offer_id: str, fencing_token: int) -> None:
+        self.offer_improver._offer_leases[offer_id] = messages.Lease(
+            cache_key=self._get_offer_lease_cache_key(offer_id=offer_id),
+            fencing_token=fencing_token,
+        )
+
+    def _get_offer_lease_cache_key(self, offer_id: str) -> str:
+        return constants.OFFER_LEASE_CACHE_KEY.format(
+            provider=enums.OfferProvider.NOONES.name, offer_id=offer_id
+        )
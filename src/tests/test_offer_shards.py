@@ -0,0 +1,123 @@
+from django import test
+from django.core.cache import cache
+
+from src import enums
+from src.services import offer_shards as offer_shard_services
+from src.tests import utils as test_utils
+
+_SHARD_COUNT = 64
+
+
+class ShardSlotTestCase(test.SimpleTestCase):
+    def test_joining_slot_only_takes_shards(self) -> None:
+        shard_slots = self._get_shard_slots(slots=[0, 1, 2])
+        new_shard_slots = self._get_shard_slots(slots=[0, 1, 2, 3])
+
+        for shard in range(_SHARD_COUNT):
+            if new_shard_slots[shard] != shard_slots[shard]:
+                self.assertEqual(new_shard_slots[shard], 3)
+        self.assertIn(3, new_shard_slots.values())
+
+    def test_leaving_slot_only_gives_away_its_shards(self) -> None:
+        shard_slots = self._get_shard_slots(slots=[0, 1, 2])
+        new_shard_slots = self._get_shard_slots(slots=[0, 2])
+
+        for shard in range(_SHARD_COUNT):
+            if shard_slots[shard] != 1:
+                self.assertEqual(new_shard_slots[shard], shard_slots[shard])
+
+    def test_assignment_does_not_depend_on_slot_order(self) -> None:
+        self.assertEqual(
+            self._get_shard_slots(slots=[0, 1, 2]),
+            self._get_shard_slots(slots=[2, 0, 1]),
+        )
+
+    def _get_shard_slots(self, slots):
+        return {
+            shard: offer_shard_services._get_shard_slot(shard=shard, slots=slots)
+            for shard in range(_SHARD_COUNT)
+        }
+
+
+@test.override_settings(CACHES=test_utils.LOCMEM_CACHES)
+class OfferShardCoordinatorTestCase(test.SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_single_worker_owns_all_shards(self) -> None:
+        coordinator = self._get_coordinator()
+
+        coordinator._heartbeat()
+
+        self.assertEqual(
+            coordinator.get_owned_shards(), frozenset(range(_SHARD_COUNT))
+        )
+
+    def test_joining_worker_gets_its_shards_once_released(self) -> None:
+        coordinator = self._get_coordinator()
+        coordinator._heartbeat()
+        new_coordinator = self._get_coordinator()
+
+        new_coordinator._heartbeat()
+
+        # Shards are still leased by the first worker.
+        self.assertEqual(new_coordinator.get_owned_shards(), frozenset())
+
+        coordinator._heartbeat()
+        owned_shards = coordinator.get_owned_shards()
+        new_coordinator._heartbeat()
+        new_owned_shards = new_coordinator.get_owned_shards()
+
+        self.assertTrue(new_owned_shards)
+        self.assertEqual(owned_shards & new_owned_shards, frozenset())
+        self.assertEqual(
+            owned_shards | new_owned_shards, frozenset(range(_SHARD_COUNT))
+        )
+
+    def test_shards_of_dead_worker_are_taken_over_after_lease_expiry(self) -> None:
+        coordinator = self._get_coordinator()
+        new_coordinator = self._get_coordinator()
+        for _ in range(2):
+            coordinator._heartbeat()
+            coordinator.get_owned_shards()
+            new_coordinator._heartbeat()
+        dead_shards = coordinator.get_owned_shards()
+
+        # First worker dies, its slot and leases expire.
+        cache.delete_many(
+            keys=[coordinator._get_slot_cache_key(slot=coordinator._slot)]
+            + [coordinator._get_lease_cache_key(shard=shard) for shard in dead_shards]
+        )
+        new_coordinator._heartbeat()
+
+        self.assertEqual(
+            new_coordinator.get_owned_shards(), frozenset(range(_SHARD_COUNT))
+        )
+        for shard in dead_shards:
+            self.assertFalse(
+                coordinator._renew(cache_key=coordinator._get_lease_cache_key(shard=shard))
+            )
+
+    def test_stop_keeps_leases_taken_over_by_other_worker(self) -> None:
+        coordinator = self._get_coordinator()
+        coordinator._heartbeat()
+        shard_cache_key = coordinator._get_lease_cache_key(shard=0)
+        cache.delete(key=shard_cache_key)
+        cache.add(key=shard_cache_key, value="other-worker", timeout=60)
+
+        coordinator.stop()
+
+        self.assertEqual(cache.get(key=shard_cache_key), "other-worker")
+        self.assertIsNone(
+            cache.get(key=coordinator._get_lease_cache_key(shard=1))
+        )
+
+    def _get_coordinator(self) -> offer_shard_services.OfferShardCoordinator:
+        return offer_shard_services.OfferShardCoordinator(
+            provider=enums.OfferProvider.NOONES,
+            shard_count=_SHARD_COUNT,
+            shard_key=enums.OfferShardKey.MARKET,
+            max_workers=4,
+            lease_ttl_seconds=60,
+            heartbeat_interval_seconds=60,
+        )
@@ -0,0 +1,66 @@
+import typing
+
+from django import test
+
+from src.integrations.gateways import pagination
+
+_TOTAL_COUNT = 1000
+_SERVED_PAGE_SIZE = 100
+_LIMIT = 300
+
+
+class PaginatedDataTestCase(test.SimpleTestCase):
+    def test_pages_without_total_count_until_empty_page(self) -> None:
+        fetched_offsets = []
+
+        items = self._get_items(
+            fetch_page=self._get_fetch_page(
+                fetched_offsets=fetched_offsets, with_total_count=False
+            )
+        )
+
+        self.assertEqual(items, list(range(_TOTAL_COUNT)))
+        self.assertEqual(fetched_offsets, list(range(0, _TOTAL_COUNT + 1, 100)))
+
+    def test_pages_by_total_count_with_short_pages(self) -> None:
+        fetched_offsets = []
+
+        items = self._get_items(
+            fetch_page=self._get_fetch_page(
+                fetched_offsets=fetched_offsets, with_total_count=True
+            )
+        )
+
+        self.assertEqual(items, list(range(_TOTAL_COUNT)))
+        self.assertEqual(sorted(fetched_offsets), list(range(0, _TOTAL_COUNT, 100)))
+
+    def _get_items(
+        self, fetch_page: typing.Callable[[int, int], typing.Dict]
+    ) -> typing.List[int]:
+        items = []
+        for page in pagination.iter_paginated_data(
+            fetch_page=fetch_page,
+            data_field="offers",
+            limit=_LIMIT,
+            max_workers=4,
+            log_prefix="[test]",
+        ):
+            items.extend(page)
+
+        return items
+
+    def _get_fetch_page(
+        self, fetched_offsets: typing.List[int], with_total_count: bool
+    ) -> typing.Callable[[int, int], typing.Dict]:
+        def _fetch_page(offset: int, limit: int) -> typing.Dict:
+            # API serves fewer items than requested.
+            fetched_offsets.append(offset)
+            offers = list(
+                range(offset, min(offset + min(limit, _SERVED_PAGE_SIZE), _TOTAL_COUNT))
+            )
+            data = {"offers": offers, "count": len(offers)}
+            if with_total_count:
+                data["totalCount"] = _TOTAL_COUNT
+            return data
+
+        return _fetch_page
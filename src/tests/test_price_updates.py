@@ -0,0 +1,62 @@
+import decimal
+
+from django import test
+from django.core import mail
+from django.core.cache import cache
+
+from src.services import offer_improver as offer_improver_services
+from src.tests import utils as test_utils
+
+_OFFER_IDS = ["a", "b", "c"]
+
+
+@test.override_settings(CACHES=test_utils.LOCMEM_CACHES)
+class OfferPriceUpdatesTestCase(test.TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.provider_client = test_utils.StubProvider()
+        self.provider_client.failing_offer_ids = {"b"}
+
+    def test_failed_update_does_not_fail_other_updates_of_batch(self) -> None:
+        update_results = self.provider_client.update_offer_prices(
+            offer_prices={offer_id: decimal.Decimal("996") for offer_id in _OFFER_IDS},
+            max_workers=3,
+        )
+
+        self.assertEqual(
+            {
+                offer_id: update_result.is_updated
+                for offer_id, update_result in update_results.items()
+            },
+            {"a": True, "b": False, "c": True},
+        )
+        self.assertIsNone(update_results["a"].error)
+        self.assertEqual(update_results["b"].error, "Offer price update failed")
+        self.assertEqual(set(self.provider_client.updated_offer_prices), {"a", "c"})
+
+    def test_dispatch_keeps_updated_offers_and_reports_failed_offer(self) -> None:
+        offer_improver = offer_improver_services.OfferImproverService(
+            provider_client=self.provider_client, max_workers=3
+        )
+        price_updates = [
+            test_utils.get_price_update(offer_id=offer_id) for offer_id in _OFFER_IDS
+        ]
+        for offer_id in _OFFER_IDS:
+            offer_improver._offer_leases[offer_id] = offer_improver._acquire_lease(
+                cache_key="test_offer_lease_{}".format(offer_id), timeout=60
+            )
+        offer_improver._pending_price_updates = price_updates
+        # Histories of improved offers are only queued, not saved.
+        offer_improver._pending_improved_offers = []
+
+        offer_improver._dispatch_price_updates(results={})
+
+        self.assertEqual(
+            [
+                improved_offer.internal_offer.offer_id
+                for improved_offer in offer_improver._pending_improved_offers
+            ],
+            ["a", "c"],
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("offer_id=b", mail.outbox[0].body)
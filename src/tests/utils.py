@@ -0,0 +1,84 @@
+import decimal
+import typing
+
+from src import enums
+from src import messages
+from src.integrations.providers import base as base_provider
+from src.integrations.providers import messages as provider_messages
+
+# Tests run against a cache local to the process instead of redis.
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "p2p-offer-bot-tests",
+    }
+}
+
+
+class StubProvider(base_provider.BaseProvider):
+    """
+    Provider serving fixed offers, without calling any provider API.
+    """
+
+    provider = enums.OfferProvider.NOONES
+    provider_api_client_class = None
+
+    def __init__(
+            self, offers: typing.Optional[typing.List[provider_messages.Offer]] = None
+    ) -> None:
+        super().__init__()
+        self._offers = {offer.offer_id: offer for offer in offers or []}
+        self.updated_offer_prices: typing.Dict[str, decimal.Decimal] = {}
+        self.failing_offer_ids: typing.Set[str] = set()
+
+    def get_offer(self, offer_id: str) -> provider_messages.Offer:
+        return self._offers[offer_id]
+
+    def iter_all_offers(
+            self,
+            offer_type: enums.OfferType,
+            currency: enums.CryptoCurrency,
+            conversion_currency: enums.FiatCurrency,
+            min_price: decimal.Decimal,
+            max_price: decimal.Decimal,
+            payment_method: typing.Optional[enums.PaymentMethod] = None,
+    ) -> typing.Iterator[provider_messages.Offer]:
+        return iter(self._offers.values())
+
+    def update_offer_price(self, offer_id: str, price: decimal.Decimal) -> bool:
+        if offer_id in self.failing_offer_ids:
+            raise RuntimeError("Offer price update failed")
+
+        self.updated_offer_prices[offer_id] = price
+        return True
+
+
+def get_offer(
+        offer_id: str,
+        price: decimal.Decimal,
+        owner_last_seen_timestamp: decimal.Decimal = decimal.Decimal("1e12"),
+) -> provider_messages.Offer:
+    return provider_messages.Offer(
+        offer_id=offer_id,
+        currency=enums.CryptoCurrency.BTC,
+        conversion_currency=enums.FiatCurrency.USD,
+        price=price,
+        type=enums.OfferType.SELL,
+        payment_method=enums.PaymentMethod.BANK_TRANSFER,
+        owner_last_seen_timestamp=owner_last_seen_timestamp,
+    )
+
+
+def get_price_update(offer_id: str) -> messages.OfferPriceUpdate:
+    return messages.OfferPriceUpdate(
+        internal_offer=get_offer(offer_id=offer_id, price=decimal.Decimal("1000")),
+        competitor_offer=get_offer(offer_id="competitor", price=decimal.Decimal("995")),
+        search_parameters=messages.OfferSearchParameters(
+            offer_type=enums.OfferType.SELL,
+            currency=enums.CryptoCurrency.BTC,
+            conversion_currency=enums.FiatCurrency.USD,
+            payment_method=None,
+        ),
+        market_price=decimal.Decimal("1000"),
+        price=decimal.Decimal("996"),
+    )